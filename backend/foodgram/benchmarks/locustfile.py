@@ -0,0 +1,138 @@
+"""
+Mixed read/write load against a running backend.
+
+    python manage.py generate_data --users 1000 --recipes 20000
+    LOCUST_USER_IDS=1-1000 locust -f benchmarks/locustfile.py \
+        --host http://127.0.0.1:9001
+
+Virtual users log in as one of the accounts named in the environment:
+LOCUST_USER_IDS is the id range generate_data printed (its users are
+user<id>@example.org), LOCUST_EMAILS a comma-separated list of other
+accounts. All of them share LOCUST_PASSWORD. Recipe, tag, author and
+ingredient ids are read from the API.
+"""
+import os
+import random
+
+from locust import HttpUser, between, task
+
+PASSWORD = os.getenv('LOCUST_PASSWORD', 'synthetic-password')
+
+
+def emails():
+    if os.getenv('LOCUST_EMAILS'):
+        return os.getenv('LOCUST_EMAILS').split(',')
+    if os.getenv('LOCUST_USER_IDS'):
+        first, last = map(int, os.getenv('LOCUST_USER_IDS').split('-'))
+        return [f'user{pk}@example.org' for pk in range(first, last + 1)]
+    raise RuntimeError('Set LOCUST_USER_IDS or LOCUST_EMAILS')
+
+
+EMAILS = emails()
+
+
+class FoodgramUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        response = self.client.post(
+            '/api/auth/token/login/',
+            json={'email': random.choice(EMAILS), 'password': PASSWORD})
+        token = response.json().get('auth_token')
+        self.client.headers['Authorization'] = f'Token {token}'
+        recipes = self.client.get('/api/recipes/?limit=50').json()
+        self.recipe_ids = [recipe['id'] for recipe in recipes['results']]
+        self.tag_ids = [tag['id'] for tag in self.client.get(
+            '/api/tags/').json()]
+        me = self.client.get('/api/users/me/').json()['id']
+        self.author_ids = list({
+            recipe['author']['id'] for recipe in recipes['results']} - {me})
+        self.ingredient_ids = [ingredient['id'] for ingredient in
+                               self.client.get('/api/ingredients/').json()]
+
+    @task(20)
+    def feed(self):
+        self.client.get(f'/api/recipes/?page={random.randint(1, 20)}',
+                        name='/api/recipes/?page=')
+
+    @task(5)
+    def feed_by_tags(self):
+        self.client.get('/api/recipes/?tags=breakfast&tags=lunch',
+                        name='/api/recipes/?tags=')
+
+    @task(10)
+    def recipe(self):
+        self.client.get(f'/api/recipes/{random.choice(self.recipe_ids)}/',
+                        name='/api/recipes/{id}/')
+
+    @task(5)
+    def tags(self):
+        self.client.get('/api/tags/')
+        self.client.get(f'/api/tags/{random.choice(self.tag_ids)}/',
+                        name='/api/tags/{id}/')
+
+    @task(5)
+    def ingredients(self):
+        self.client.get('/api/ingredients/?name=са',
+                        name='/api/ingredients/?name=')
+        self.client.get(
+            f'/api/ingredients/{random.choice(self.ingredient_ids)}/',
+            name='/api/ingredients/{id}/')
+
+    @task(3)
+    def users(self):
+        self.client.get('/api/users/')
+        self.client.get('/api/users/me/')
+        self.client.get(f'/api/users/{random.choice(self.author_ids)}/',
+                        name='/api/users/{id}/')
+
+    @task(5)
+    def subscriptions(self):
+        self.client.get('/api/users/subscriptions/')
+
+    @task(2)
+    def subscribe(self):
+        author = random.choice(self.author_ids)
+        url = f'/api/users/{author}/subscribe/'
+        self.client.post(url, name='/api/users/{id}/subscribe/')
+        self.client.delete(url, name='/api/users/{id}/subscribe/')
+
+    @task(3)
+    def favorite(self):
+        url = f'/api/recipes/{random.choice(self.recipe_ids)}/favorite/'
+        self.client.post(url, name='/api/recipes/{id}/favorite/')
+        self.client.delete(url, name='/api/recipes/{id}/favorite/')
+
+    @task(3)
+    def shopping_cart(self):
+        url = f'/api/recipes/{random.choice(self.recipe_ids)}/shopping_cart/'
+        self.client.post(url, name='/api/recipes/{id}/shopping_cart/')
+        self.client.get('/api/recipes/download_shopping_cart/')
+        self.client.delete(url, name='/api/recipes/{id}/shopping_cart/')
+
+    @task(1)
+    def create_recipe(self):
+        response = self.client.post('/api/recipes/', json={
+            'name': 'Нагрузочный рецепт',
+            'text': 'Создан нагрузочным тестом',
+            'cooking_time': 10,
+            'image': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAA'
+                     'BCAYAAAAfFcSJAAAADUlEQVR4nGNgYGBgAAAABQABpfZFQAAAAABJ'
+                     'RU5ErkJggg==',
+            'ingredients': [
+                {'id': pk, 'amount': 100}
+                for pk in random.sample(self.ingredient_ids, 2)],
+            'tags': self.tag_ids[:1],
+        })
+        if response.status_code == 201:
+            recipe = response.json()['id']
+            self.client.patch(f'/api/recipes/{recipe}/',
+                              json={'cooking_time': 15},
+                              name='/api/recipes/{id}/')
+            self.client.delete(f'/api/recipes/{recipe}/',
+                               name='/api/recipes/{id}/')
+
+    @task(1)
+    def token(self):
+        self.client.post('/api/auth/token/verify/', json={
+            'token': self.client.headers['Authorization'].split()[1]})
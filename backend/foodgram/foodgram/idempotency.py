@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that retries a request after a timeout sends the same
+Idempotency-Key header. The first request with a key runs the view and
+its response is kept in the shared cache for settings.IDEMPOTENCY_TTL
+seconds; later requests with the key get that response back, marked
+with Idempotent-Replayed, without running the view again. Keys are
+scoped per user. Entries are zlib-compressed JSON of a fingerprint of
+the request (method, path and data), the status, extra headers and the
+response data.
+
+While the first request runs the key is leased with cache.add(), so a
+retry arriving meanwhile gets 409 instead of running in parallel. A key
+sent again with a different request gets 422. Responses raised as
+exceptions (validation errors, 404) and server errors are not stored:
+the retry runs the view again.
+
+Outcomes are counted in foodgram_cache_requests_total with the cache
+label "idempotency": store, replay, conflict and mismatch.
+"""
+import functools
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import CACHE_REQUESTS
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+PREFIX = 'idempotency:'
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = ('A request with this Idempotency-Key is still '
+                      'being processed.')
+    default_code = 'idempotency_conflict'
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = ('This Idempotency-Key was used for a different '
+                      'request.')
+    default_code = 'idempotency_key_reused'
+
+
+def fingerprint(request):
+    data = json.dumps(request.data, sort_keys=True, cls=JSONEncoder,
+                      default=str)
+    return hashlib.sha256(
+        f'{request.method} {request.path}\n{data}'.encode()).hexdigest()
+
+
+def pack(request_fingerprint, response):
+    headers = {name: value for name, value in response.items()
+               if name.lower() != 'content-type'}
+    return zlib.compress(json.dumps(
+        [request_fingerprint, response.status_code, headers, response.data],
+        cls=JSONEncoder, separators=(',', ':')).encode())
+
+
+def unpack(entry):
+    return json.loads(zlib.decompress(entry))
+
+
+def replay(entry, request_fingerprint):
+    stored_fingerprint, status_code, headers, data = unpack(entry)
+    if stored_fingerprint != request_fingerprint:
+        CACHE_REQUESTS.inc('idempotency', 'mismatch')
+        raise KeyReused()
+    CACHE_REQUESTS.inc('idempotency', 'replay')
+    return Response(data, status=status_code,
+                    headers={**headers, REPLAYED_HEADER: 'true'})
+
+
+def run(handler, request, *args, key, **kwargs):
+    """The response of handler(request, ...) for this key, stored once."""
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(
+            {HEADER: f'At most {MAX_KEY_LENGTH} characters.'})
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    cache_key = f'{PREFIX}{request.user.pk}:{digest}'
+    request_fingerprint = fingerprint(request)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        return replay(entry, request_fingerprint)
+    lease_key = f'{cache_key}:lease'
+    if not cache.add(lease_key, 1, settings.IDEMPOTENCY_LEASE):
+        CACHE_REQUESTS.inc('idempotency', 'conflict')
+        raise RequestInProgress()
+    try:
+        # the first request may have stored its response and released
+        # the lease between the get() above and the add()
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return replay(entry, request_fingerprint)
+        response = handler(request, *args, **kwargs)
+        if response.status_code < 500:
+            cache.set(cache_key, pack(request_fingerprint, response),
+                      settings.IDEMPOTENCY_TTL)
+            CACHE_REQUESTS.inc('idempotency', 'store')
+    finally:
+        cache.delete(lease_key)
+    return response
+
+
+class IdempotencyMixin:
+    """
+    Honour Idempotency-Key on the actions listed in idempotent_actions.
+    The handler is wrapped after authentication, so keys are per user.
+    """
+    idempotent_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(HEADER)
+        if (key and settings.IDEMPOTENCY_TTL
+                and self.action in self.idempotent_actions):
+            method = request.method.lower()
+            # view instances live for one request, dispatch() looks the
+            # handler up after initial()
+            setattr(self, method, functools.partial(
+                run, getattr(self, method), key=key))
@@ -0,0 +1,83 @@
+"""
+Concurrency limits for expensive endpoints.
+
+An endpoint named in settings.CONCURRENCY_LIMITS gets that many slots
+in the shared cache. A request takes a free slot with cache.add() and
+gives it back when it finishes. When every slot is taken it is refused
+at once with 503 and Retry-After, instead of queueing behind the
+others and tying up one more worker. Slots expire after
+settings.CONCURRENCY_SLOT_TTL seconds, so a worker killed in the
+middle of a request does not hold one forever.
+"""
+import random
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import SHED_REQUESTS
+
+PREFIX = 'concurrency:'
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many requests to this endpoint, retry later.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        # sent as Retry-After by DRF's exception handler
+        self.wait = wait
+
+
+def acquire(name):
+    """(key, token) of a free slot of `name`, None when all are taken."""
+    keys = [f'{PREFIX}{name}:{slot}'
+            for slot in range(settings.CONCURRENCY_LIMITS[name])]
+    taken = cache.get_many(keys)
+    free = [key for key in keys if key not in taken]
+    # spread concurrent requests over the slots instead of racing for
+    # the first free one
+    random.shuffle(free)
+    token = uuid.uuid4().hex
+    for key in free:
+        if cache.add(key, token, settings.CONCURRENCY_SLOT_TTL):
+            return key, token
+    return None
+
+
+def release(slot):
+    key, token = slot
+    # the slot may have expired and been taken by another request
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+class ConcurrencyLimitMixin:
+    """
+    Shed load on the actions listed in action_concurrency_limits, a map
+    of action to a name in settings.CONCURRENCY_LIMITS. The slot is
+    taken after authentication, permissions and throttles.
+    """
+    action_concurrency_limits = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        name = self.action_concurrency_limits.get(self.action)
+        if not name or not settings.CONCURRENCY_LIMITS.get(name):
+            return
+        self.concurrency_slot = acquire(name)
+        if self.concurrency_slot is None:
+            SHED_REQUESTS.inc(name)
+            raise Overloaded(settings.CONCURRENCY_RETRY_AFTER)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.concurrency_slot = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.concurrency_slot is not None:
+                release(self.concurrency_slot)
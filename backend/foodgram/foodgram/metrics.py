@@ -0,0 +1,216 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware counts queries and database time for every
+request, collects named timings recorded with ``timer()`` (serialize,
+render) and reports them in the Server-Timing header, a structured
+log line and per-endpoint histograms exposed by ``metrics_view``.
+Histograms live in process memory, so each worker reports its own.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger('foodgram.performance')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = defaultdict(float)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Connections opened in executor threads (async views) get the
+# recorder here; the middleware covers the request thread.
+connection_created.connect(install_query_recorder)
+
+
+@contextmanager
+def timer(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            series = self._series.setdefault(
+                endpoint, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {endpoint: (list(buckets), total, count)
+                      for endpoint, (buckets, total, count)
+                      in self._series.items()}
+        for endpoint, (buckets, total, count) in sorted(series.items()):
+            label = f'endpoint="{endpoint}"'
+            for bound, value in zip(self.buckets, buckets):
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {value}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = defaultdict(int)
+
+    def inc(self, *values):
+        with self._lock:
+            self._values[values] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            label = ','.join(f'{name}="{item}"'
+                             for name, item in zip(self.labels, key))
+            lines.append(f'{self.name}{{{label}}} {value}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds', 'Total time spent on a request.')
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds', 'Time spent in SQL per request.')
+QUERY_COUNT = Histogram(
+    'foodgram_db_queries', 'SQL queries per request.', QUERY_BUCKETS)
+HISTOGRAMS = [REQUEST_DURATION, DB_DURATION, QUERY_COUNT]
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Single-flight cache lookups by outcome.', ('cache', 'outcome'))
+THROTTLED_REQUESTS = Counter(
+    'foodgram_throttled_requests_total',
+    'Requests refused by a rate limit.', ('scope',))
+SHED_REQUESTS = Counter(
+    'foodgram_shed_requests_total',
+    'Requests refused because the endpoint was at its concurrency '
+    'limit.', ('endpoint',))
+COUNTERS = [CACHE_REQUESTS, THROTTLED_REQUESTS, SHED_REQUESTS]
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match else 'unresolved'
+    return f'{request.method} {view_name}'
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for connection in connections.all():
+            install_query_recorder(None, connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+        endpoint = endpoint_name(request)
+        response['Server-Timing'] = ', '.join(
+            [f'db;dur={metrics.db_time * 1000:.1f};'
+             f'desc="{metrics.queries} queries"']
+            + [f'{name};dur={value * 1000:.1f}'
+               for name, value in metrics.timings.items()]
+            + [f'total;dur={total * 1000:.1f}'])
+        REQUEST_DURATION.observe(endpoint, total)
+        DB_DURATION.observe(endpoint, metrics.db_time)
+        QUERY_COUNT.observe(endpoint, metrics.queries)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            **{f'{name}_ms': round(value * 1000, 1)
+               for name, value in metrics.timings.items()},
+        }, ensure_ascii=False))
+        self.check_query_budget(endpoint, metrics.queries)
+        return response
+
+    @staticmethod
+    def check_query_budget(endpoint, queries):
+        budget = settings.QUERY_BUDGET
+        if not budget or queries <= budget:
+            return
+        message = f'{endpoint} ran {queries} queries, budget is {budget}'
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def metrics_view(request):
+    lines = []
+    for metric in HISTOGRAMS + COUNTERS:
+        lines.extend(metric.expose())
+    return HttpResponse('\n'.join(lines) + '\n',
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,133 @@
+"""
+Read replicas.
+
+ReplicaMiddleware picks the database a request reads from and
+ReplicaRouter applies it to every query. GET, HEAD and OPTIONS
+requests read from one of settings.DATABASE_REPLICAS, unless the same
+client wrote something during the last REPLICA_STICKY_SECONDS: then
+it keeps reading its own writes from the primary until the replicas
+have caught up. Writes, management commands and task workers always
+use the primary. Replicas lagging more than REPLICA_MAX_LAG seconds or
+failing the health check are skipped until the next check.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .throttling import client_ip
+
+logger = logging.getLogger('foodgram.replicas')
+
+# replication lag in seconds, 0 when everything received is replayed
+LAG_SQL = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+_read_alias = contextvars.ContextVar('read_alias', default=DEFAULT_DB_ALIAS)
+
+
+def read_alias():
+    """The database the current request reads from."""
+    return _read_alias.get()
+
+
+class ReplicaSet:
+    def __init__(self):
+        self.healthy = []
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def lag(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = cursor.fetchone()[0]
+        # NULL when the server is not in recovery
+        return float(lag or 0)
+
+    def check(self):
+        healthy = []
+        for alias in settings.DATABASE_REPLICAS:
+            try:
+                lag = self.lag(alias)
+            except DatabaseError:
+                logger.warning('Replica %s is unavailable', alias,
+                               exc_info=True)
+                connections[alias].close()
+                continue
+            if lag > settings.REPLICA_MAX_LAG:
+                logger.warning('Replica %s lags %.1fs behind', alias, lag)
+                continue
+            healthy.append(alias)
+        self.healthy = healthy
+        self.checked_at = time.monotonic()
+
+    def choose(self):
+        if (self.checked_at is None or time.monotonic() - self.checked_at
+                >= settings.REPLICA_CHECK_INTERVAL):
+            # one thread checks, the others keep the previous result
+            if self.lock.acquire(blocking=self.checked_at is None):
+                try:
+                    self.check()
+                finally:
+                    self.lock.release()
+        healthy = self.healthy
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+replicas = ReplicaSet()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_key(request):
+    # the client by its own address, not the gateway's, with or without
+    # a token: a client that writes with one may read anonymously
+    return f'db-primary:{client_ip(request)}'
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        key = sticky_key(request)
+        alias = DEFAULT_DB_ALIAS
+        if request.method in SAFE_METHODS and not cache.get(key):
+            alias = replicas.choose()
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        if request.method not in SAFE_METHODS:
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
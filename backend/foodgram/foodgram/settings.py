@@ -9,6 +9,11 @@ DEBUG = os.getenv('DEBUG', default='True').lower() == 'true'
 
 ALLOWED_HOSTS = os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if os.getenv('DJANGO_ALLOWED_HOSTS') else []
 
+# заголовок (в формате META) с адресом клиента, который выставляет nginx;
+# бэкенд доступен только через gateway, поэтому заголовку можно верить;
+# пусто - REMOTE_ADDR (адрес самого nginx для всех клиентов)
+REAL_IP_HEADER = os.getenv('REAL_IP_HEADER', 'HTTP_X_REAL_IP')
+
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -23,9 +28,12 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.PerformanceMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,8 +62,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# асинхронные обработчики чтения (теги, ингредиенты, рецепты) для ASGI
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', default='False').lower() == 'true'
 
 
+# DB_PGBOUNCER=True, если DB_HOST указывает на pgbouncer в режиме transaction
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', default='False').lower() == 'true'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -63,11 +79,121 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True').lower() == 'true',
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {} if DB_PGBOUNCER else {
+            'options': '-c statement_timeout={}'.format(
+                os.getenv('DB_STATEMENT_TIMEOUT', 30000)),
+        },
+    }
+}
+
+# реплики для чтения: DB_REPLICA_HOSTS=replica1,replica2:5433
+# (те же имя базы, пользователь и пароль, что и у основной)
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    replica_host, _, replica_port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+# сколько секунд после записи клиент читает с основной базы
+REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+# реплика с отставанием больше этого (сек) временно не используется
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+
+# ограничение времени запроса (мс) по классам эндпоинтов, 0 - без ограничения
+STATEMENT_TIMEOUTS = {
+    'read': int(os.getenv('DB_READ_STATEMENT_TIMEOUT', 2000)),
+    'aggregate': int(os.getenv('DB_AGGREGATE_STATEMENT_TIMEOUT', 10000)),
+}
+
+# аренды, идемпотентность и лимиты запросов опираются на атомарные add и
+# incr общего для воркеров кэша: в docker-compose это memcached
+# (PyMemcacheCache); LocMemCache по умолчанию - только для разработки
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# кэш тяжёлых ответов с защитой от одновременного пересчёта:
+# (мягкий TTL, жёсткий TTL), сек; после мягкого TTL отдаётся старое
+# значение, пока один запрос его пересчитывает; жёсткий TTL 0 - без кэша
+SINGLE_FLIGHT_TTL = {
+    'subscriptions': (
+        float(os.getenv('SUBSCRIPTIONS_CACHE_SOFT_TTL', 5)),
+        float(os.getenv('SUBSCRIPTIONS_CACHE_HARD_TTL', 60))),
+    'shopping_list': (
+        float(os.getenv('SHOPPING_LIST_CACHE_SOFT_TTL', 30)),
+        float(os.getenv('SHOPPING_LIST_CACHE_HARD_TTL', 600))),
+}
+# на сколько секунд процесс занимает пересчёт значения
+SINGLE_FLIGHT_LEASE = float(os.getenv('SINGLE_FLIGHT_LEASE', 10))
+
+# сколько секунд хранится ответ на запрос с заголовком Idempotency-Key
+# (повтор с тем же ключом получает его без выполнения запроса); 0 -
+# заголовок игнорируется
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+# сколько секунд ключ занят выполняющимся запросом
+IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', 30))
+
+# сколько запросов к тяжёлому эндпоинту выполняется одновременно, сверх
+# этого - сразу 503 с Retry-After; 0 - без ограничения
+CONCURRENCY_LIMITS = {
+    'shopping_list': int(os.getenv('SHOPPING_LIST_CONCURRENCY', 4)),
+    'subscriptions': int(os.getenv('SUBSCRIPTIONS_CONCURRENCY', 8)),
+}
+# через сколько секунд освобождается место запроса, который не вернул его
+CONCURRENCY_SLOT_TTL = int(os.getenv('CONCURRENCY_SLOT_TTL', 60))
+# Retry-After в ответе 503, сек
+CONCURRENCY_RETRY_AFTER = int(os.getenv('CONCURRENCY_RETRY_AFTER', 2))
+
+# как часто воркер сверяет версию справочников (теги, ингредиенты), сек
+REFERENCE_DATA_CHECK_INTERVAL = float(
+    os.getenv('REFERENCE_DATA_CHECK_INTERVAL', 5))
+
+# фоновые задачи: TASKS_EAGER=True выполняет их сразу в запросе (для тестов)
+TASKS_EAGER = os.getenv('TASKS_EAGER', default='False').lower() == 'true'
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', 10))
+TASKS_RETRY_MAX_DELAY = int(os.getenv('TASKS_RETRY_MAX_DELAY', 3600))
+# сколько секунд задача закреплена за воркером, прежде чем её заберёт другой
+TASKS_LEASE = int(os.getenv('TASKS_LEASE', 600))
+
+# уведомления о новых рецептах (SSE, /api/notifications/ под ASGI):
+# LocalBroker - в пределах процесса, PostgresBroker - между процессами
+# через LISTEN/NOTIFY (NOTIFICATIONS_DB_HOST - PostgreSQL в обход pgbouncer)
+NOTIFICATIONS_BROKER = os.getenv(
+    'NOTIFICATIONS_BROKER', 'recipes.notifications.LocalBroker')
+NOTIFICATIONS_DB_HOST = os.getenv('NOTIFICATIONS_DB_HOST', '')
+NOTIFICATIONS_RETRY_DELAY = int(os.getenv('NOTIFICATIONS_RETRY_DELAY', 5))
+# буфер одного соединения: сообщений и байт; при переполнении клиент
+# получает событие overflow и переподключается с Last-Event-ID
+NOTIFICATIONS_QUEUE_SIZE = int(os.getenv('NOTIFICATIONS_QUEUE_SIZE', 100))
+NOTIFICATIONS_MAX_BYTES = int(os.getenv('NOTIFICATIONS_MAX_BYTES', 65536))
+NOTIFICATIONS_HEARTBEAT = int(os.getenv('NOTIFICATIONS_HEARTBEAT', 25))
+# сколько секунд действует одноразовый билет на поток,
+# выданный POST /api/notifications/ticket/
+NOTIFICATIONS_TICKET_TTL = int(os.getenv('NOTIFICATIONS_TICKET_TTL', 30))
+
+# шрифт с кириллицей для PDF списка покупок
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
 # логировние для отработки принтов
+# (LOG_LEVEL=DEBUG при DEBUG=True выводит в консоль каждый SQL-запрос)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -78,10 +204,20 @@ LOGGING = {
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
     },
 }
 
+# /metrics - гистограммы по эндпоинтам в формате Prometheus
+METRICS_ENABLED = os.getenv(
+    'METRICS_ENABLED', default='True').lower() == 'true'
+
+# лимит SQL-запросов на запрос (0 - без лимита); в строгом режиме
+# превышение вызывает исключение, иначе пишется предупреждение в лог
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 0))
+QUERY_BUDGET_STRICT = os.getenv(
+    'QUERY_BUDGET_STRICT', default='False').lower() == 'true'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,9 +247,18 @@ USE_TZ = True
 STATIC_URL = '/backend_static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# имена с хэшем содержимого и сжатые .gz/.br копии текстовых файлов
+STATICFILES_STORAGE = 'foodgram.storage.CompressedManifestStaticFilesStorage'
+
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# закрытые файлы (PDF списков покупок) отдаёт nginx по X-Accel-Redirect
+X_ACCEL_REDIRECT = os.getenv(
+    'X_ACCEL_REDIRECT', default='False').lower() == 'true'
+# internal-location nginx, указывающий на MEDIA_ROOT
+X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/protected_media/')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -125,6 +270,21 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'recipes.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'foodgram.throttling.ScopedSlidingWindowThrottle',
+    ],
+    # лимиты по throttle_scope представлений (скользящее окно в кэше)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('LOGIN_THROTTLE_RATE', '10/min'),
+        'shopping_list': os.getenv('SHOPPING_LIST_THROTTLE_RATE', '20/min'),
+        'ingredients': os.getenv('INGREDIENTS_THROTTLE_RATE', '300/min'),
+    },
+
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
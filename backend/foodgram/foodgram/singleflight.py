@@ -0,0 +1,135 @@
+"""
+Single-flight caching of expensive computations.
+
+cached() keeps a value in the shared cache with a soft and a hard
+TTL. Until the soft TTL passes the value is served as is. Between the
+soft and the hard TTL it is stale: one caller recomputes it while
+everybody else keeps getting the stale value. After the hard TTL the
+entry is gone and callers wait for a single computation instead of
+running it side by side. Callers in one process coalesce on an
+in-memory flight, callers in different processes on a lease key taken
+with cache.add(), so the lease only spans processes when the cache
+backend is shared between them and its add() is atomic (memcached;
+throttling.check_cache() refuses the backends without one).
+
+Outcomes are counted in foodgram_cache_requests_total:
+hit, stale (served while another caller refreshes), refresh and miss
+(computed by this caller), coalesced (got the result of another
+caller's computation) and timeout (gave up waiting for another process
+and computed anyway).
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import CACHE_REQUESTS
+
+PREFIX = 'singleflight:'
+POLL_INTERVAL = 0.05
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+_flights = {}
+_lock = threading.Lock()
+
+
+def generation(scope):
+    """A counter to put into keys of values that invalidate() drops."""
+    return cache.get(f'{PREFIX}generation:{scope}', 0)
+
+
+def invalidate(scope):
+    key = f'{PREFIX}generation:{scope}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def _wait(key, lease_key):
+    """Poll for the value another process is computing."""
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_LEASE
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[1] > time.time():
+            return entry
+        if cache.get(lease_key) is None:
+            # the other process gave up, compute here
+            return None
+    return None
+
+
+def _compute(name, key, compute, stale):
+    soft_ttl, hard_ttl = settings.SINGLE_FLIGHT_TTL[name]
+    lease_key = f'{key}:lease'
+    token = uuid.uuid4().hex
+    if not cache.add(lease_key, token, settings.SINGLE_FLIGHT_LEASE):
+        if stale is not None:
+            CACHE_REQUESTS.inc(name, 'stale')
+            return stale[0]
+        entry = _wait(key, lease_key)
+        if entry is not None:
+            CACHE_REQUESTS.inc(name, 'coalesced')
+            return entry[0]
+        CACHE_REQUESTS.inc(name, 'timeout')
+        token = None
+    else:
+        CACHE_REQUESTS.inc(name, 'miss' if stale is None else 'refresh')
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + soft_ttl), hard_ttl)
+    finally:
+        if token is not None and cache.get(lease_key) == token:
+            cache.delete(lease_key)
+    return value
+
+
+def cached(name, key, compute):
+    """
+    The value of compute() cached under `key` with the TTLs of
+    settings.SINGLE_FLIGHT_TTL[name]; a hard TTL of 0 disables caching.
+    """
+    if not settings.SINGLE_FLIGHT_TTL[name][1]:
+        return compute()
+    key = f'{PREFIX}{name}:{key}'
+    entry = cache.get(key)
+    if entry is not None and entry[1] > time.time():
+        CACHE_REQUESTS.inc(name, 'hit')
+        return entry[0]
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+    if not leader:
+        if entry is not None:
+            CACHE_REQUESTS.inc(name, 'stale')
+            return entry[0]
+        CACHE_REQUESTS.inc(name, 'coalesced')
+        return flight.result()
+    try:
+        flight.value = _compute(name, key, compute, entry)
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.value
@@ -0,0 +1,106 @@
+"""
+File storages and delivery through nginx.
+
+Uploaded images are stored under a hash of their content, so a name
+never changes meaning and nginx can let browsers cache it forever;
+uploading the same picture twice stores one file. Static files are
+collected with hashed names by ManifestStaticFilesStorage, and text
+assets get .gz and .br siblings for nginx's gzip_static/brotli_static
+to send without compressing on every request. Protected files are
+handed to nginx with X-Accel-Redirect instead of being streamed by a
+Python worker.
+"""
+import gzip
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, HttpResponse
+
+try:
+    import brotli
+except ImportError:  # .br files are skipped, nginx falls back to gzip
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.map',
+                '.xml', '.yml', '.yaml')
+# smaller files do not get much from compression
+MIN_COMPRESS_SIZE = 256
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Stores files as <directory>/<sha256 of content><extension>."""
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, digest.hexdigest()[:32] + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def compress_file(path):
+    """
+    Write gzip and, when brotli is installed, brotli versions next to
+    `path`. Returns the names of the files written.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    # mtime=0 keeps the .gz byte-stable for the same input
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, mode=brotli.MODE_TEXT)
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as file:
+            file.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files with precompressed text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressible = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if (not isinstance(processed, Exception)
+                    and name.endswith(COMPRESSIBLE)):
+                compressible.add(name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        # files show up once per pass with intermediate hashed names,
+        # compress the final ones after the last pass
+        for name in sorted(compressible):
+            compress_file(self.path(name))
+            compress_file(self.path(
+                self.hashed_files[self.hash_key(self.clean_name(name))]))
+
+
+def file_response(storage, name, filename, content_type):
+    """
+    Send a stored file as an attachment, through nginx when
+    settings.X_ACCEL_REDIRECT is on.
+    """
+    if not settings.X_ACCEL_REDIRECT:
+        return FileResponse(storage.open(name), as_attachment=True,
+                            filename=filename, content_type=content_type)
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Redirect'] = settings.X_ACCEL_PREFIX + name
+    return response
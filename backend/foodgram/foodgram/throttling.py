@@ -0,0 +1,117 @@
+"""
+Sliding-window rate limits in the shared cache.
+
+DRF's SimpleRateThrottle keeps the list of request timestamps of every
+client and writes the whole list back on each request, so a scope of
+1000/hour pickles up to a thousand floats per request. Here a client
+has one integer counter per fixed window, and the rate over the last
+`duration` seconds is estimated from the current counter plus the
+previous one, weighted by the part of it still inside the window:
+
+    estimate = previous * (1 - elapsed / duration) + current
+
+A check is one incr() and one get(). The counter is incremented first,
+which is atomic in memcached and redis, and decremented back when the
+request is refused, so only allowed requests are counted, as in DRF.
+The leases of singleflight and idempotency and the slots of
+loadshedding rely on an atomic add() as well; check_cache() refuses to
+start with a backend that does not have them.
+
+Anonymous clients are told apart by client_ip(): behind nginx
+REMOTE_ADDR is the gateway for everyone, the client address comes in
+the header named by settings.REAL_IP_HEADER.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import ScopedRateThrottle
+
+from .metrics import THROTTLED_REQUESTS
+
+# add() and incr() of these are a read and a separate write (the dummy
+# cache stores nothing), so two workers can both win a lease or lose a
+# count
+NON_ATOMIC_CACHES = (DatabaseCache, DummyCache, FileBasedCache)
+
+
+def check_cache():
+    backend = caches['default']
+    if isinstance(backend, NON_ATOMIC_CACHES):
+        raise ImproperlyConfigured(
+            f'CACHE_BACKEND {type(backend).__name__} has no atomic add() '
+            f'and incr(); use memcached (PyMemcacheCache).')
+
+
+def client_ip(request):
+    """
+    Address of the client: the header set by the gateway (X-Real-IP in
+    nginx/nginx.conf), REMOTE_ADDR without it.
+    """
+    return ((settings.REAL_IP_HEADER
+             and request.META.get(settings.REAL_IP_HEADER))
+            or request.META.get('REMOTE_ADDR'))
+
+
+def windows_to_wait(previous, current, limit, elapsed):
+    """
+    Windows (mostly a fraction of one) until one more request fits, for
+    `current` requests counted in this window and `previous` in the last.
+    """
+    if current < limit and previous:
+        return 1 - (limit - current - 1) / previous - elapsed
+    # only the next window has room, with this one as its previous
+    return 1 - elapsed + max(0, 1 - (limit - 1) / max(current, 1))
+
+
+def hit(key, limit, duration, now=None):
+    """
+    Count a request under `key` against `limit` per `duration` seconds.
+    Returns 0 when it is allowed, otherwise seconds until it would be.
+    """
+    now = time.time() if now is None else now
+    window, elapsed = divmod(now / duration, 1)
+    current_key = f'{key}:{int(window)}'
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # first request of the window; it lives on as the previous one
+        cache.add(current_key, 0, duration * 2)
+        current = cache.incr(current_key)
+    previous = cache.get(f'{key}:{int(window) - 1}', 0)
+    if previous * (1 - elapsed) + current <= limit:
+        return 0
+    cache.decr(current_key)
+    return windows_to_wait(previous, current - 1, limit, elapsed) * duration
+
+
+class ScopedSlidingWindowThrottle(ScopedRateThrottle):
+    """
+    ScopedRateThrottle on sliding-window counters. The scope is the
+    view's throttle_scope or, for viewsets, the entry of the current
+    action in action_throttle_scopes. Views without one pass.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'action_throttle_scopes', {}).get(
+            getattr(view, 'action', None),
+            getattr(view, self.scope_attr, None))
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.retry_after = hit(self.get_cache_key(request, view),
+                               self.num_requests, self.duration)
+        if self.retry_after:
+            THROTTLED_REQUESTS.inc(self.scope)
+        return not self.retry_after
+
+    def get_ident(self, request):
+        return client_ip(request)
+
+    def wait(self):
+        return self.retry_after
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls')),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns += [path('metrics', metrics_view, name='metrics')]
@@ -0,0 +1,9 @@
+import multiprocessing
+import os
+
+bind = '0.0.0.0:9001'
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# 'uvicorn.workers.UvicornWorker' together with foodgram.asgi:application
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
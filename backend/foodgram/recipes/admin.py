@@ -1,13 +1,24 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, ShoppingListRecipe,
+from . import nutrition, similarity
+from .admin_tools import AutocompleteFilter, LargeTableAdmin
+from .deletion import delete_recipes
+from .models import (Favorite, Ingredient, Recipe, RecipeChange,
+                     RecipeIngredient, ShoppingCart, ShoppingListRecipe,
                      ShoppingListRecipeIngredient, Subscribe, Tag, TagRecipe)
+from .tasks import refresh_nutrition
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        # the title of every row is RecipeIngredient.__str__
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class TagInline(admin.TabularInline):
@@ -16,27 +27,128 @@ class TagInline(admin.TabularInline):
 
 
 class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'measurement_unit')
+    list_display = ('id', 'name', 'measurement_unit', 'calories', 'price')
     search_fields = ('name',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    # also the order of autocomplete results
+    ordering = ('name',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and set(form.changed_data) & {*nutrition.TOTALS.values()}:
+            refresh_nutrition.delay(ingredients=[obj.pk])
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ('name', 'author', 'favorites', 'calories', 'cost')
+    list_select_related = ('author',)
     search_fields = ('name',)
-    list_filter = ('name', 'author', 'tags', 'ingredients',)
+    list_filter = (('author', AutocompleteFilter), 'tags',
+                   ('ingredients', AutocompleteFilter),)
+    autocomplete_fields = ('author',)
+    readonly_fields = (*nutrition.TOTALS,)
 
     inlines = [RecipeIngredientInline]
     inlines_2 = [TagInline]
 
+    def get_queryset(self, request):
+        # a correlated subquery is evaluated for the rows of the page
+        # only, a JOIN with GROUP BY would aggregate the whole table
+        favorites = Favorite.objects.filter(
+            recipes=OuterRef('pk')).order_by().values('recipes').annotate(
+            total=Count('id')).values('total')
+        return super().get_queryset(request).annotate(
+            favorites_total=Coalesce(Subquery(favorites), 0))
+
+    @admin.display(description='favorites', ordering='favorites_total')
+    def favorites(self, obj):
+        return obj.favorites_total
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        nutrition.refresh([form.instance.pk])
+        similarity.refresh([form.instance.pk])
+
+    def delete_model(self, request, obj):
+        delete_recipes(Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset)
+
+
+class FavoriteAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'recipes')
+    list_select_related = ('user', 'recipes')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipes', AutocompleteFilter))
+    autocomplete_fields = ('user', 'recipes')
+
+
+class SubscribeAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'following', 'recipes_count')
+    list_select_related = ('user', 'following')
+    list_filter = (('user', AutocompleteFilter),
+                   ('following', AutocompleteFilter))
+    autocomplete_fields = ('user', 'following', 'recipes')
+
+
+class ShoppingCartAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipe', AutocompleteFilter))
+    autocomplete_fields = ('user', 'recipe')
+
+
+class RecipeIngredientAdmin(LargeTableAdmin):
+    list_display = ('id', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    list_filter = (('recipe', AutocompleteFilter),
+                   ('ingredient', AutocompleteFilter))
+    autocomplete_fields = ('recipe', 'ingredient')
+
+
+class ShoppingListRecipeAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'measurement_unit', 'amount_needed')
+    list_select_related = ('user', 'measurement_unit')
+    list_filter = (('user', AutocompleteFilter),)
+    autocomplete_fields = ('user', 'measurement_unit')
+
+
+class ShoppingListRecipeIngredientAdmin(LargeTableAdmin):
+    list_display = ('id', 'shopping_list_recipe', 'shopping_cart',
+                    'ingredient', 'amount_needed')
+    list_select_related = ('shopping_list_recipe', 'shopping_cart',
+                           'ingredient')
+    autocomplete_fields = ('ingredient', 'measurement_unit')
+    raw_id_fields = ('shopping_list_recipe', 'shopping_cart')
+
+
+class TagRecipeAdmin(LargeTableAdmin):
+    list_display = ('id', 'tags', 'recipe')
+    list_select_related = ('tags', 'recipe')
+    list_filter = ('tags', ('recipe', AutocompleteFilter))
+    autocomplete_fields = ('recipe',)
+
+
+class RecipeChangeAdmin(LargeTableAdmin):
+    list_display = ('recipe', 'version', 'created_at')
+    # the model ordering joins recipes to sort the whole table
+    ordering = ('-id',)
+    list_select_related = ('recipe',)
+    list_filter = (('recipe', AutocompleteFilter),)
+    autocomplete_fields = ('recipe',)
+
 
 admin.site.register(Tag)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Favorite)
-admin.site.register(Subscribe)
-admin.site.register(ShoppingCart)
-admin.site.register(RecipeIngredient)
-admin.site.register(ShoppingListRecipe)
-admin.site.register(ShoppingListRecipeIngredient)
-admin.site.register(TagRecipe)
+admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(Subscribe, SubscribeAdmin)
+admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
+admin.site.register(ShoppingListRecipe, ShoppingListRecipeAdmin)
+admin.site.register(ShoppingListRecipeIngredient,
+                    ShoppingListRecipeIngredientAdmin)
+admin.site.register(TagRecipe, TagRecipeAdmin)
+admin.site.register(RecipeChange, RecipeChangeAdmin)
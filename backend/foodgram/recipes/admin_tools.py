@@ -0,0 +1,95 @@
+"""
+Admin changelists that stay fast on large tables.
+
+Django's related list filters render an option for every row of the
+related table, the changelist counts the whole table twice on every
+load and foreign keys in list_display are fetched one row at a time.
+LargeTableAdmin turns the second count off and takes the row count of
+unfiltered lists from the planner statistics, AutocompleteFilter picks
+the related object with the admin autocomplete widget instead.
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .db import estimated_count
+
+# below this many rows an exact COUNT(*) is cheap enough
+ESTIMATE_ABOVE = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Takes the row count of an unfiltered queryset from the table
+    statistics on PostgreSQL instead of COUNT(*) over the whole table.
+    Filtered lists and small tables are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_count(self.object_list.model,
+                                       self.object_list.db)
+            if estimate is not None and estimate > ESTIMATE_ABOVE:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter by a related object picked with the autocomplete widget, so
+    only the selected object is loaded. The admin of the related model
+    needs search_fields.
+    """
+    template = 'admin/recipes/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        self.form_field = forms.ModelChoiceField(
+            field.remote_field.model._default_manager.all(), required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site))
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'widget': self.form_field.widget.render(
+                self.lookup_kwarg, self.lookup_val,
+                attrs={'onchange': 'this.form.submit()'}),
+            # the form replaces the query string, keep the other filters
+            'hidden': [(name, value)
+                       for name, value in changelist.params.items()
+                       if name != self.lookup_kwarg],
+            'clear_url': changelist.get_query_string(
+                remove=[self.lookup_kwarg]),
+            'selected': self.lookup_val is not None,
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin for tables too large to count or list in full."""
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    @property
+    def media(self):
+        media = super().media
+        for item in self.list_filter:
+            if isinstance(item, tuple) and issubclass(
+                    item[1], AutocompleteFilter):
+                field = get_fields_from_path(self.model, item[0])[-1]
+                return media + AutocompleteSelect(
+                    field, self.admin_site).media
+        return media
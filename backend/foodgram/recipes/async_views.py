@@ -0,0 +1,124 @@
+"""
+Async entry points for the read-heavy endpoints, mounted when
+ASYNC_READ_VIEWS is enabled and the project runs under ASGI.
+
+Django 3.2 has no async ORM, so database work runs in the
+executor thread pool (thread_sensitive=False) instead of the single
+thread shared by sync views; write methods keep going through the
+regular sync viewsets.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from foodgram.throttling import ScopedSlidingWindowThrottle
+from recipes.reference import reference_data
+from recipes.renderers import ORJSONRenderer
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework.request import Request
+
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+def db_to_async(func):
+    @wraps(func)
+    def inner(*args, **kwargs):
+        try:
+            response = func(*args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            # Executor threads never see request_finished, so release
+            # their connections here according to CONN_MAX_AGE.
+            close_old_connections()
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def json_response(data):
+    return HttpResponse(ORJSONRenderer().render(data),
+                        content_type='application/json')
+
+
+def read_async(read_view, write_view):
+    """Serve GET/HEAD with read_view, anything else with write_view."""
+    write_view = sync_to_async(write_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await read_view(request, *args, **kwargs)
+        return await write_view(request, *args, **kwargs)
+    # csrf_exempt() wraps the view in a sync function, so mark it directly.
+    view.csrf_exempt = True
+    return view
+
+
+def error_response(error, status_code):
+    # the body DRF's exception handler would send
+    detail = error.detail
+    response = json_response(
+        detail if isinstance(detail, (list, dict)) else {'detail': detail})
+    response.status_code = status_code
+    return response
+
+
+def throttled(read_view, viewset):
+    """Apply the throttle_scope of `viewset` to an async read view."""
+    async def view(request, *args, **kwargs):
+        throttle = ScopedSlidingWindowThrottle()
+        # authenticated as the viewset would, so token users are
+        # throttled as users and not by the address they share
+        api_request = Request(request, authenticators=[
+            auth() for auth in viewset.authentication_classes])
+        try:
+            # the user is loaded from the database
+            allowed = await db_to_async(throttle.allow_request)(
+                api_request, viewset)
+        except AuthenticationFailed as error:
+            response = error_response(error, status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = (
+                api_request.authenticators[0].authenticate_header(
+                    api_request))
+            return response
+        if not allowed:
+            error = Throttled(throttle.wait())
+            response = error_response(
+                error, status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(error.wait)
+            return response
+        return await read_view(request, *args, **kwargs)
+    return view
+
+
+async def tag_list(request):
+    tags = await db_to_async(reference_data.tags)()
+    return json_response([tag.as_dict() for tag in tags])
+
+
+async def ingredient_list(request):
+    ingredients = await db_to_async(reference_data.ingredients)()
+    name = request.GET.get('name', '').lower()
+    return json_response([
+        {'id': ingredient.id,
+         'name': ingredient.name,
+         'measurement_unit': ingredient.measurement_unit}
+        for ingredient in ingredients
+        if ingredient.name.lower().startswith(name)])
+
+
+tags = read_async(
+    tag_list,
+    TagViewSet.as_view({'get': 'list', 'post': 'create'}))
+ingredients = read_async(
+    throttled(ingredient_list, IngredientViewSet),
+    IngredientViewSet.as_view({'get': 'list'}))
+recipes = read_async(
+    db_to_async(RecipeViewSet.as_view({'get': 'list'})),
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+recipe_detail = read_async(
+    db_to_async(RecipeViewSet.as_view({'get': 'retrieve'})),
+    RecipeViewSet.as_view({'get': 'retrieve', 'put': 'update',
+                           'patch': 'partial_update',
+                           'delete': 'destroy'}))
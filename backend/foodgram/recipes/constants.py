@@ -1 +1,3 @@
 PAGE_SIZE = 6
+# most recipes one /api/recipes/batch/ request may ask for
+BATCH_MAX_IDS = 100
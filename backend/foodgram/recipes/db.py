@@ -0,0 +1,119 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from foodgram.replicas import read_alias
+from rest_framework.permissions import SAFE_METHODS
+
+
+def check_connections(**kwargs):
+    """
+    Drop persistent connections that died between requests.
+    Backport of CONN_HEALTH_CHECKS, which Django 3.2 does not handle.
+    """
+    for conn in connections.all():
+        if (conn.settings_dict.get('CONN_HEALTH_CHECKS')
+                and conn.connection is not None
+                and not conn.is_usable()):
+            conn.close()
+
+
+class StatementTimeoutMixin:
+    """
+    Run safe-method requests in a transaction with SET LOCAL
+    statement_timeout taken from settings.STATEMENT_TIMEOUTS, so a
+    runaway query is cancelled instead of holding a pooled connection.
+    SET LOCAL keeps the timeout from leaking to other clients sharing
+    a server connection through pgbouncer.
+    """
+    statement_timeout = 'read'
+    action_statement_timeouts = {}
+
+    def get_statement_timeout(self, request):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        name = self.action_statement_timeouts.get(
+            action, self.statement_timeout)
+        return settings.STATEMENT_TIMEOUTS.get(name)
+
+    def dispatch(self, request, *args, **kwargs):
+        timeout = self.get_statement_timeout(request)
+        # the database safe-method requests read from, maybe a replica
+        using = read_alias()
+        connection = connections[using]
+        if (not timeout or request.method not in SAFE_METHODS
+                or connection.vendor != 'postgresql'):
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL statement_timeout = %s', [timeout])
+            return super().dispatch(request, *args, **kwargs)
+
+
+def column_defaults(model, fields):
+    """Values the ORM would fill in for the columns missing from `fields`."""
+    defaults = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or {field.name, field.attname} & set(fields):
+            continue
+        if getattr(field, 'auto_now', False) or getattr(
+                field, 'auto_now_add', False):
+            defaults[field.attname] = timezone.now()
+        elif field.has_default():
+            defaults[field.attname] = field.get_default()
+    return defaults
+
+
+def insert_rows(model, fields, rows):
+    """
+    Insert plain tuples in `fields` order without model instances: COPY
+    on PostgreSQL, executemany elsewhere. Columns left out get the
+    defaults the ORM would fill in.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    defaults = column_defaults(model, fields)
+    if defaults:
+        fields = tuple(fields) + tuple(defaults)
+        rows = [tuple(row) + tuple(defaults.values()) for row in rows]
+    model_fields = [model._meta.get_field(field) for field in fields]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column)
+                        for field in model_fields)
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES '
+                f'({", ".join(["%s"] * len(fields))})',
+                [[field.get_db_prep_save(value, connection)
+                  for field, value in zip(model_fields, row)]
+                 for row in rows])
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def raw_delete(queryset):
+    # a single DELETE statement: no collector, no signals
+    return queryset._raw_delete(queryset.db)
+
+
+def estimated_count(model, using='default'):
+    """
+    Row count of the table from PostgreSQL statistics (kept by
+    autovacuum), None on other databases or before the first ANALYZE.
+    """
+    conn = connections[using]
+    if conn.vendor != 'postgresql':
+        return None
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [conn.ops.quote_name(model._meta.db_table)])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] > 0 else None
@@ -0,0 +1,124 @@
+"""
+Set-based deletion of recipes and users.
+
+Model.delete() goes through Django's collector, which loads every
+recipe and cart row into memory and deletes related rows by lists of
+ids. None of these models has delete signals, so they are removed
+here with one DELETE statement per table, leaves first. Image files
+are deleted after commit by a background task.
+"""
+from django.contrib.admin.models import LogEntry
+from django.db import transaction
+from django.db.models import Q
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from users.models import User
+
+from .db import raw_delete
+from .models import (AuthorSuggestion, Favorite, Recipe, RecipeBucket,
+                     RecipeChange, RecipeIngredient, RecipeSignature,
+                     ShoppingCart, ShoppingListRecipe,
+                     ShoppingListRecipeIngredient, Subscribe, TagRecipe)
+from .tasks import remove_unused_images
+
+BATCH_SIZE = 500
+SubscribeRecipe = Subscribe.recipes.through
+# models that reference Recipe, leaves first, with the path to it
+RECIPE_RELATIONS = (
+    (ShoppingListRecipeIngredient, 'shopping_cart__recipe__'),
+    (ShoppingCart, 'recipe__'),
+    (Favorite, 'recipes__'),
+    (TagRecipe, 'recipe__'),
+    (RecipeIngredient, 'recipe__'),
+    (SubscribeRecipe, 'recipe__'),
+    (RecipeChange, 'recipe__'),
+    (RecipeBucket, 'recipe__'),
+    (RecipeSignature, 'recipe__'),
+    (Recipe, ''),
+)
+# paths from the same models to the user who owns the row
+USER_LOOKUPS = {
+    ShoppingListRecipeIngredient: ('shopping_cart__user__',
+                                   'shopping_list_recipe__user__'),
+    ShoppingCart: ('user__',),
+    Favorite: ('user__',),
+    SubscribeRecipe: ('subscribe__user__', 'subscribe__following__'),
+}
+
+
+def delete_querysets(querysets, deleted):
+    for queryset in querysets:
+        label = queryset.model._meta.label
+        deleted[label] = deleted.get(label, 0) + raw_delete(queryset)
+
+
+def remove_images(images):
+    names = sorted(images - {''})
+    if names:
+        transaction.on_commit(
+            lambda: remove_unused_images.delay(names=names))
+
+
+def delete_matching_recipes(deleted, **lookups):
+    """Delete recipes matching `lookups` and the rows that refer to them."""
+    images = set(Recipe.objects.filter(**lookups).values_list(
+        'image', flat=True))
+    delete_querysets([
+        model.objects.filter(**{
+            prefix + lookup: value for lookup, value in lookups.items()})
+        for model, prefix in RECIPE_RELATIONS], deleted)
+    remove_images(images)
+
+
+def delete_recipes(recipes):
+    """
+    Delete a Recipe queryset with everything that references it.
+    Returns (total, {model label: count}) like QuerySet.delete().
+    """
+    deleted = {}
+    with transaction.atomic(savepoint=False):
+        # ids are read up front: the queryset may filter on rows that
+        # are deleted on the way
+        ids = list(recipes.order_by().values_list('pk', flat=True))
+        for offset in range(0, len(ids), BATCH_SIZE):
+            delete_matching_recipes(
+                deleted, pk__in=ids[offset:offset + BATCH_SIZE])
+    return sum(deleted.values()), deleted
+
+
+def delete_users(users):
+    """
+    Delete a User queryset with everything that references it. A table
+    reached both through the users' recipes and through the users, like
+    the cart, is cleared in one statement; without recipes the recipe
+    tables are skipped.
+    """
+    deleted = {}
+    with transaction.atomic(savepoint=False):
+        ids = list(users.order_by().values_list('pk', flat=True))
+        # '' stands for recipes without an image
+        images = set(Recipe.objects.filter(author__in=ids).values_list(
+            'image', flat=True))
+        querysets = []
+        for model, prefix in RECIPE_RELATIONS:
+            condition = Q()
+            if images:
+                condition |= Q(**{prefix + 'author__in': ids})
+            for lookup in USER_LOOKUPS.get(model, ()):
+                condition |= Q(**{lookup + 'in': ids})
+            if condition:
+                querysets.append(model.objects.filter(condition))
+        delete_querysets(querysets + [
+            ShoppingListRecipe.objects.filter(user__in=ids),
+            Subscribe.objects.filter(Q(user__in=ids) | Q(following__in=ids)),
+            AuthorSuggestion.objects.filter(
+                Q(user__in=ids) | Q(author__in=ids)),
+            BlacklistedToken.objects.filter(token__user__in=ids),
+            OutstandingToken.objects.filter(user__in=ids),
+            LogEntry.objects.filter(user__in=ids),
+            User.groups.through.objects.filter(user__in=ids),
+            User.user_permissions.through.objects.filter(user__in=ids),
+            User.objects.filter(pk__in=ids),
+        ], deleted)
+        remove_images(images)
+    return sum(deleted.values()), deleted
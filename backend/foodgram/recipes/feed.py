@@ -0,0 +1,123 @@
+"""
+Read-only rendering of recipes for the feed.
+
+Builds the same structure as RecipeListSerializer straight from
+.values() rows and a handful of batched lookups, without
+instantiating serializers per recipe. With a sparse fieldset only the
+columns and lookups of the requested fields are read.
+"""
+from collections import defaultdict
+from operator import itemgetter
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, TagRecipe)
+from recipes.reference import reference_data
+
+FIELDS = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
+          'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+          'calories', 'proteins', 'fats', 'carbohydrates', 'cost')
+# the fields of CustomRecipeSerializer, for card grids
+PROFILES = {'compact': ('id', 'name', 'image', 'cooking_time')}
+# columns each field reads, the rest come from batched lookups by id
+COLUMNS = {
+    'author': ('author_id', 'author__email', 'author__username',
+               'author__first_name', 'author__last_name'),
+    **{name: (name,) for name in (
+        'name', 'image', 'text', 'cooking_time', 'calories', 'proteins',
+        'fats', 'carbohydrates', 'cost')},
+}
+
+
+def recipe_rows(queryset, fields=FIELDS):
+    columns = ['id']
+    for name in fields:
+        columns.extend(COLUMNS.get(name, ()))
+    return queryset.values(*columns)
+
+
+def image_url(name, request):
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def _tags(recipe_ids):
+    tags = defaultdict(list)
+    rows = TagRecipe.objects.filter(recipe_id__in=recipe_ids).order_by(
+        'id').values_list('recipe_id', 'tags_id')
+    for recipe_id, tag_id in rows:
+        tag = reference_data.tag(tag_id)
+        if tag is not None:
+            tags[recipe_id].append(tag.as_dict())
+    return tags
+
+
+def _ingredients(recipe_ids):
+    rows = list(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'amount'))
+    records = {}
+    for _, ingredient_id, _ in rows:
+        if ingredient_id not in records:
+            records[ingredient_id] = reference_data.ingredient(ingredient_id)
+    missing = [pk for pk, record in records.items() if record is None]
+    if missing:
+        records.update(Ingredient.objects.in_bulk(missing))
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id, amount in rows:
+        record = records[ingredient_id]
+        ingredients[recipe_id].append({
+            'id': record.id,
+            'name': record.name,
+            'measurement_unit': record.measurement_unit,
+            'amount': amount})
+    return ingredients
+
+
+def render_recipes(rows, request=None, fields=FIELDS):
+    rows = list(rows)
+    if not rows:
+        return []
+    recipe_ids = [row['id'] for row in rows]
+    tags = _tags(recipe_ids) if 'tags' in fields else None
+    ingredients = (_ingredients(recipe_ids) if 'ingredients' in fields
+                   else None)
+    favorited = in_shopping_cart = subscribed = frozenset()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        if 'is_favorited' in fields:
+            favorited = set(Favorite.objects.filter(
+                user=user, recipes_id__in=recipe_ids).values_list(
+                'recipes_id', flat=True))
+        if 'is_in_shopping_cart' in fields:
+            in_shopping_cart = set(ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids).values_list(
+                'recipe_id', flat=True))
+        if 'author' in fields:
+            subscribed = set(Subscribe.objects.filter(
+                user=user,
+                following_id__in={row['author_id'] for row in rows}
+            ).values_list('following_id', flat=True))
+    values = {
+        'id': lambda row: row['id'],
+        'tags': lambda row: tags[row['id']],
+        'author': lambda row: {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row['author_id'] in subscribed,
+        },
+        'ingredients': lambda row: ingredients[row['id']],
+        'is_favorited': lambda row: row['id'] in favorited,
+        'is_in_shopping_cart': lambda row: row['id'] in in_shopping_cart,
+        'image': lambda row: image_url(row['image'], request),
+        # DecimalField renders as a string in the serializers
+        'cost': lambda row: None if row['cost'] is None else str(row['cost']),
+    }
+    getters = [(name, values.get(name, itemgetter(name))) for name in fields]
+    return [{name: get(row) for name, get in getters} for row in rows]
@@ -0,0 +1,53 @@
+"""
+Sparse fieldsets.
+
+`?fields=a,b` keeps only the listed fields of every object in a
+response and `?omit=a,b` drops fields; a profile name (the recipe feed
+has "compact") stands for its fields. Views read the selection before
+building the queryset, so relations nobody asked for are neither
+joined, prefetched nor serialized.
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _expand(request, param, available, profiles):
+    names, unknown = set(), []
+    for name in request.query_params.get(param, '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name in profiles:
+            names.update(profiles[name])
+        elif name in available:
+            names.add(name)
+        else:
+            unknown.append(name)
+    if unknown:
+        raise ValidationError(
+            {param: f'Unknown fields: {", ".join(unknown)}.'})
+    return names
+
+
+def requested(request, available, profiles=None):
+    """The fields of `available` the request asks for, in their order."""
+    profiles = profiles or {}
+    selected = set(available)
+    if FIELDS_PARAM in request.query_params:
+        selected = _expand(request, FIELDS_PARAM, available, profiles)
+    selected -= _expand(request, OMIT_PARAM, available, profiles)
+    return tuple(name for name in available if name in selected)
+
+
+class SparseFieldsMixin:
+    """Serializer that keeps only the readable fields in context['fields']."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('fields')
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items()
+                if field.write_only or name in selected}
@@ -1,5 +1,11 @@
+from django.db.models import Exists, F, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
+                            TagRecipe)
+
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+ORDERINGS = ('calories', '-calories', 'cost', '-cost')
 
 
 class IngredientFilter(FilterSet):
@@ -11,23 +17,71 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
+    """
+    Relation filters are EXISTS subqueries rather than joins, so a
+    recipe matching several tags still comes back once and no DISTINCT
+    over the joined rows is needed.
+    """
     tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all(),)
+        queryset=Tag.objects.all(),
+        method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_MODE_ANY, TAGS_MODE_ANY),
+                 (TAGS_MODE_ALL, TAGS_MODE_ALL)),
+        method='filter_tags_mode')
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart')
+    calories_min = filters.NumberFilter(field_name='calories',
+                                        lookup_expr='gte')
+    calories_max = filters.NumberFilter(field_name='calories',
+                                        lookup_expr='lte')
+    cost_min = filters.NumberFilter(field_name='cost', lookup_expr='gte')
+    cost_max = filters.NumberFilter(field_name='cost', lookup_expr='lte')
+    ordering = filters.ChoiceFilter(
+        choices=[(value, value) for value in ORDERINGS],
+        method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('tags', 'tags_mode', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'calories_min', 'calories_max',
+                  'cost_min', 'cost_max', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids = [tag.pk for tag in value]
+        if not tag_ids:
+            return queryset
+        if self.form.cleaned_data.get('tags_mode') != TAGS_MODE_ALL:
+            return queryset.filter(Exists(TagRecipe.objects.filter(
+                recipe=OuterRef('pk'), tags__in=tag_ids)))
+        for tag_id in tag_ids:
+            queryset = queryset.filter(Exists(TagRecipe.objects.filter(
+                recipe=OuterRef('pk'), tags=tag_id)))
+        return queryset
+
+    def filter_tags_mode(self, queryset, name, value):
+        # applied by filter_tags
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorite_recipes__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                recipes=OuterRef('pk'), user=self.request.user)))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_carts__user=self.request.user)
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=self.request.user)))
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        # recipes without the total come last in both directions; the
+        # ascending order walks the (total, id) index, the descending one
+        # the (total DESC NULLS LAST, id DESC) index on PostgreSQL
+        field = value.lstrip('-')
+        if value.startswith('-'):
+            return queryset.order_by(F(field).desc(nulls_last=True), '-id')
+        return queryset.order_by(F(field).asc(nulls_last=True), 'id')
@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes.db import insert_rows
+from recipes.deletion import delete_users
+from recipes.management.commands.generate_data import IMAGE_NAME, next_id
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag, TagRecipe)
+from users.models import User
+
+
+def collector(users):
+    return users.delete()
+
+
+MODES = {'collector': collector, 'fast': delete_users}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark deleting a user with many recipes through the '
+            'Django collector and through the set-based fast path. '
+            'Everything is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=10,
+                            help='ingredients per recipe')
+        parser.add_argument('--fans', type=int, default=50,
+                            help='users who favorite, subscribe to and '
+                                 'add the author\'s recipes to their carts')
+
+    def create_author(self, options):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if not tags or not ingredients:
+            raise CommandError('Load tags and ingredients first')
+        author = User.objects.create(
+            username='bench-author', email='bench-author@example.org',
+            password=make_password(None))
+        start = next_id(Recipe)
+        ids = range(start, start + options['recipes'])
+        insert_rows(Recipe, ('id', 'author_id', 'name', 'image', 'text',
+                             'cooking_time'),
+                    [(pk, author.id, f'Рецепт {pk}', IMAGE_NAME, 'Текст', 10)
+                     for pk in ids])
+        insert_rows(RecipeIngredient, ('recipe_id', 'ingredient_id', 'amount'),
+                    [(pk, ingredient, 100) for pk in ids
+                     for ingredient in random.sample(
+                         ingredients,
+                         min(len(ingredients), options['ingredients']))])
+        insert_rows(TagRecipe, ('tags_id', 'recipe_id'),
+                    [(random.choice(tags), pk) for pk in ids])
+        fans = User.objects.filter(recipes__isnull=True).exclude(
+            pk=author.pk).values_list('id', flat=True)[:options['fans']]
+        for fan in fans:
+            picked = random.sample(ids, min(len(ids), 20))
+            insert_rows(Favorite, ('user_id', 'recipes_id'),
+                        [(fan, pk) for pk in picked])
+            insert_rows(ShoppingCart, ('user_id', 'recipe_id'),
+                        [(fan, pk) for pk in picked[:5]])
+            subscription = Subscribe.objects.create(
+                user_id=fan, following=author)
+            subscription.recipes.add(*picked)
+        return author
+
+    def measure(self, mode, options):
+        sid = transaction.savepoint()
+        try:
+            author = self.create_author(options)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                total, _ = MODES[mode](User.objects.filter(pk=author.pk))
+                elapsed = time.perf_counter() - start
+        finally:
+            transaction.savepoint_rollback(sid)
+        return elapsed, len(context.captured_queries), total
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        results = {}
+        with transaction.atomic():
+            for mode in MODES:
+                results[mode] = self.measure(mode, options)
+                elapsed, queries, total = results[mode]
+                self.stdout.write(
+                    f'{mode}: {elapsed * 1000:.1f} ms, {queries} queries, '
+                    f'{total} rows deleted')
+        if results['collector'][2] != results['fast'][2]:
+            raise CommandError('The fast path deleted a different number '
+                               'of rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: '
+            f'{results["collector"][0] / results["fast"][0]:.1f}x'))
@@ -0,0 +1,158 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import override_settings
+from recipes import feed, fieldsets
+from recipes.models import Recipe, RecipeIngredient, TagRecipe
+from recipes.reference import reference_data
+from recipes.renderers import ORJSONRenderer
+from recipes.serializers import RecipeListSerializer, TagSerializer
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+
+class JoinedIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class JoinedRecipeListSerializer(RecipeListSerializer):
+    """Feed serializer that reads tags and ingredients through joins."""
+    tags = TagSerializer(many=True)
+    ingredients = JoinedIngredientSerializer(
+        many=True, read_only=True, source='recipeingredient_set')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark recipe feed serialization and check that the '
+            'fast path renders the same bytes as the serializers; the '
+            'sparse run renders only --fields')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--user', type=int,
+                            help='render the feed as this user id')
+        parser.add_argument('--verify', action='store_true',
+                            help='only compare the rendered output')
+        parser.add_argument('--fields', default='compact',
+                            help='sparse fieldset of the "sparse" run, as '
+                                 'in ?fields=')
+
+    def page(self, offset):
+        return Recipe.objects.all()[offset:offset + self.page_size]
+
+    def joins(self, offset):
+        page = self.page(offset).select_related('author').prefetch_related(
+            'tags', 'recipeingredient_set__ingredient')
+        return JoinedRecipeListSerializer(
+            page, many=True, context={'request': self.request}).data
+
+    def serializer(self, offset):
+        # the fast path lists tags and ingredients in insertion order
+        page = self.page(offset).select_related('author').prefetch_related(
+            Prefetch('tagrecipe_set', TagRecipe.objects.order_by('id')),
+            Prefetch('recipeingredient_set',
+                     RecipeIngredient.objects.order_by('id')))
+        return RecipeListSerializer(
+            page, many=True, context={'request': self.request}).data
+
+    def fast(self, offset):
+        return feed.render_recipes(
+            feed.recipe_rows(self.page(offset)), self.request)
+
+    def sparse(self, offset):
+        return feed.render_recipes(
+            feed.recipe_rows(self.page(offset), self.fields), self.request,
+            self.fields)
+
+    def count_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def measure(self, render, renderer):
+        best = best_db = None
+        for _ in range(self.repeat):
+            self.queries = size = 0
+            self.db_time = 0.0
+            start = time.perf_counter()
+            with connection.execute_wrapper(self.count_query):
+                for page in range(self.pages):
+                    size += len(renderer.render(
+                        render(page * self.page_size)))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            best_db = (self.db_time if best_db is None
+                       else min(best_db, self.db_time))
+        return (best / self.pages, best_db / self.pages,
+                self.queries / self.pages, size / self.pages)
+
+    def verify(self):
+        for page in range(self.pages):
+            offset = page * self.page_size
+            expected = JSONRenderer().render(self.serializer(offset))
+            actual = ORJSONRenderer().render(self.fast(offset))
+            if expected != actual:
+                raise CommandError(
+                    f'Fast path output differs at offset {offset}:\n'
+                    f'{expected}\n{actual}')
+            full = [{name: recipe[name] for name in self.fields}
+                    for recipe in self.fast(offset)]
+            if full != self.sparse(offset):
+                raise CommandError(
+                    f'Sparse output differs from the full one at offset '
+                    f'{offset}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.pages} pages rendered identically'))
+
+    def handle(self, *args, **options):
+        # image URLs are built on the request factory host
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            self.benchmark(options)
+
+    def benchmark(self, options):
+        self.page_size = options['page_size']
+        self.pages = options['pages']
+        self.repeat = options['repeat']
+        self.request = Request(APIRequestFactory().get('/api/recipes/'))
+        self.request.user = (User.objects.get(pk=options['user'])
+                             if options['user'] else AnonymousUser())
+        self.fields = fieldsets.requested(
+            Request(APIRequestFactory().get(
+                '/api/recipes/', {'fields': options['fields']})),
+            feed.FIELDS, feed.PROFILES)
+        reference_data.load()
+        if options['verify']:
+            return self.verify()
+        recipes = min(Recipe.objects.count(), self.pages * self.page_size)
+        if not recipes:
+            raise CommandError('No recipes to benchmark')
+        for name, render, renderer in (
+                ('joins', self.joins, JSONRenderer()),
+                ('serializer', self.serializer, JSONRenderer()),
+                ('fast', self.fast, ORJSONRenderer()),
+                ('sparse', self.sparse, ORJSONRenderer())):
+            elapsed, db, queries, size = self.measure(render, renderer)
+            per_recipe = elapsed * self.pages / recipes
+            self.stdout.write(
+                f'{name:>10}: {elapsed * 1000:.2f} ms/page, '
+                f'{per_recipe * 1e6:.0f} us/recipe, '
+                f'{queries:.1f} queries/page, {db * 1000:.2f} ms in the '
+                f'database, {size / 1024:.1f} KiB/page')
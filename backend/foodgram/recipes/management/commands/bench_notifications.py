@@ -0,0 +1,139 @@
+import asyncio
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes import sse
+from recipes.notifications import author_channel, get_broker
+
+
+class Client:
+    """Stands in for an ASGI server connection."""
+
+    def __init__(self, counter, blocked=False):
+        self.disconnected = asyncio.get_running_loop().create_future()
+        self.counter = counter
+        self.blocked = blocked
+
+    async def receive(self):
+        await self.disconnected
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if self.blocked and message.get('more_body'):
+            # a client that stopped reading
+            await self.disconnected
+        if message['type'] == 'http.response.body':
+            self.counter.count()
+
+
+class Counter:
+    """Resolves `done` once `expected` bodies were sent."""
+
+    def __init__(self):
+        self.expected = 0
+        self.done = None
+
+    def expect(self, expected):
+        self.expected = expected
+        self.done = asyncio.get_running_loop().create_future()
+
+    def count(self):
+        self.expected -= 1
+        if self.expected == 0 and self.done is not None:
+            self.done.set_result(None)
+
+
+class Command(BaseCommand):
+    help = ('Open many idle notification streams in process and measure '
+            'memory per connection, fan-out latency and the buffer cap '
+            'of a client that stopped reading')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='followed authors per connection')
+
+    def publish(self, author, recipe_id):
+        get_broker().publish(author_channel(author), {
+            'type': 'recipe', 'id': recipe_id, 'name': 'Рецепт',
+            'author': author})
+
+    async def open(self, count, options, blocked=False):
+        clients, tasks = [], []
+        authors = range(1, options['authors'] + 1)
+        for user_id in range(1, count + 1):
+            client = Client(self.counter, blocked)
+            # everybody follows author 1, the rest is random
+            following = {1} | set(random.sample(
+                authors, min(options['follows'], len(authors))))
+            connection = sse.Connection(-user_id, following)
+            tasks.append(asyncio.ensure_future(
+                sse.serve(connection, client.send, client.receive)))
+            clients.append(client)
+        # let every stream send its headers and start waiting
+        await asyncio.sleep(0.1)
+        return clients, tasks
+
+    async def close(self, clients, tasks):
+        for client in clients:
+            client.disconnected.set_result(None)
+        await asyncio.gather(*tasks)
+
+    async def fan_out(self, clients):
+        self.counter.expect(len(clients))
+        start = time.perf_counter()
+        self.publish(1, 1)
+        await self.counter.done
+        return time.perf_counter() - start
+
+    async def slow_client(self, options):
+        clients, tasks = await self.open(1, options, blocked=True)
+        # the first frame blocks in send, the next ones fill the buffer
+        self.publish(1, 0)
+        await asyncio.sleep(0.1)
+        for recipe_id in range(settings.NOTIFICATIONS_QUEUE_SIZE + 1):
+            self.publish(1, recipe_id + 1)
+        await asyncio.sleep(0.1)
+        connection = next(iter(sse.hub.connections[author_channel(1)]))
+        state = connection.overflowed, connection.size, len(connection.frames)
+        await self.close(clients, tasks)
+        return state
+
+    async def run(self, options):
+        count = options['connections']
+        self.counter = Counter()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clients, tasks = await self.open(count, options)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / count
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{count} idle connections, {len(sse.hub.connections)} '
+            f'channels: {per_connection / 1024:.1f} KiB per connection '
+            f'including the stand-in client')
+        latencies = [await self.fan_out(clients) for _ in range(5)]
+        self.stdout.write(
+            f'Fan-out of one recipe to {count} followers: '
+            f'{min(latencies) * 1000:.1f} ms')
+        await self.close(clients, tasks)
+        if sse.hub.connections:
+            raise CommandError('Channels left after all clients left')
+        overflowed, size, frames = await self.slow_client(options)
+        if not overflowed:
+            raise CommandError('A client that stopped reading did not '
+                               'overflow')
+        self.stdout.write(
+            f'Client that stopped reading: overflowed after '
+            f'{settings.NOTIFICATIONS_QUEUE_SIZE} frames, {size} bytes and '
+            f'{frames} frames left buffered')
+
+    def handle(self, *args, **options):
+        if options['connections'] < 1:
+            raise CommandError('--connections must be positive')
+        random.seed(0)
+        asyncio.run(self.run(options))
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,133 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes import similarity
+from recipes.db import insert_rows
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+from .generate_data import IMAGE_NAME, next_id
+
+
+def brute_force(recipe_id, min_similarity):
+    """Exact similarity against every recipe sharing an ingredient."""
+    own = RecipeIngredient.objects.filter(recipe_id=recipe_id)
+    size = own.count()
+    sizes = RecipeIngredient.objects.filter(
+        recipe_id=OuterRef('recipe_id')).order_by().values(
+        'recipe_id').annotate(total=Count('id')).values('total')
+    rows = RecipeIngredient.objects.filter(
+        ingredient_id__in=own.values('ingredient_id')).exclude(
+        recipe_id=recipe_id).order_by().values('recipe_id').annotate(
+        shared=Count('id'), total=Coalesce(Subquery(sizes), 0))
+    scores = {row['recipe_id']: row['shared'] / (
+        size + row['total'] - row['shared']) for row in rows}
+    return {pk: score for pk, score in scores.items()
+            if score >= min_similarity}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark building signatures, similar recipe lookups '
+            'against a brute-force scan, and the duplicate report. '
+            'Planted near-duplicates are rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200,
+                            help='similar lookups to time')
+        parser.add_argument('--brute-force', type=int, default=20,
+                            help='lookups also done by a full scan')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='use the stored signatures')
+
+    def plant(self, count):
+        """Copies of random recipes with one ingredient swapped."""
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        originals = random.sample(list(Recipe.objects.filter(
+            recipeingredient__isnull=False).values_list(
+            'id', flat=True).distinct()[:50000]), count)
+        sets = similarity.ingredient_sets(originals)
+        start = next_id(Recipe)
+        authors = dict(Recipe.objects.filter(pk__in=originals).values_list(
+            'id', 'author_id'))
+        copies, rows = {}, []
+        for offset, original in enumerate(originals):
+            pk = start + offset
+            members = sorted(sets[original])
+            members.remove(random.choice(members))
+            members.append(random.choice(
+                [item for item in ingredients if item not in sets[original]]))
+            copies[pk] = original
+            rows.extend((pk, ingredient, 100) for ingredient in members)
+        insert_rows(Recipe, ('id', 'author_id', 'name', 'image', 'text',
+                             'cooking_time'),
+                    [(pk, authors[original], f'Копия {original}', IMAGE_NAME,
+                      'Текст', 10) for pk, original in copies.items()])
+        insert_rows(RecipeIngredient, ('recipe_id', 'ingredient_id', 'amount'),
+                    rows)
+        similarity.refresh(list(copies))
+        return copies
+
+    def lookups(self, copies, options):
+        queries = list(copies)[:options['queries']]
+        found = 0
+        start = time.perf_counter()
+        for pk in queries:
+            if copies[pk] in dict(similarity.similar(pk)):
+                found += 1
+        elapsed = (time.perf_counter() - start) / len(queries)
+        self.stdout.write(
+            f'similar: {elapsed * 1000:.2f} ms/lookup, planted original '
+            f'found for {found}/{len(queries)}')
+        sample = queries[:options['brute_force']]
+        if not sample:
+            return
+        expected = hits = 0
+        start = time.perf_counter()
+        exact = {pk: brute_force(pk, similarity.MIN_SIMILARITY)
+                 for pk in sample}
+        brute = (time.perf_counter() - start) / len(sample)
+        for pk in sample:
+            lsh = dict(similarity.similar(pk, limit=len(exact[pk]) or 1))
+            expected += len(exact[pk])
+            hits += len(set(exact[pk]) & set(lsh))
+        self.stdout.write(
+            f'brute force: {brute * 1000:.2f} ms/lookup '
+            f'({brute / elapsed:.0f}x slower), recall of recipes above '
+            f'{similarity.MIN_SIMILARITY}: {hits}/{expected}')
+
+    def report(self, copies):
+        start = time.perf_counter()
+        ids, signatures = similarity.load_signatures()
+        loaded = time.perf_counter() - start
+        pairs, _ = similarity.duplicate_pairs(ids, signatures, 0.7)
+        elapsed = time.perf_counter() - start
+        planted = {tuple(sorted(pair)) for pair in copies.items()}
+        found = planted & {(first, second) for first, second, _ in pairs}
+        self.stdout.write(
+            f'duplicates: {elapsed:.2f}s over {len(ids)} recipes '
+            f'({loaded:.2f}s loading), {len(pairs)} pairs above 0.7, '
+            f'planted pairs found {len(found)}/{len(planted)}')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        recipes = Recipe.objects.count()
+        if not recipes:
+            raise CommandError('No recipes to benchmark')
+        if not options['no_rebuild']:
+            start = time.perf_counter()
+            hashed = sum(similarity.rebuild())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'rebuild: {hashed} recipes in {elapsed:.1f}s, '
+                f'{hashed / elapsed:,.0f} recipes/s')
+        with transaction.atomic():
+            sid = transaction.savepoint()
+            try:
+                copies = self.plant(max(options['queries'], 1))
+                self.lookups(copies, options)
+                self.report(copies)
+            finally:
+                transaction.savepoint_rollback(sid)
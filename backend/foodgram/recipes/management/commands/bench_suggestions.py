@@ -0,0 +1,95 @@
+import math
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from recipes import suggestions
+
+from .build_suggestions import peak_rss
+
+
+def synthetic_edges(users, edges, seed=0):
+    """
+    Follow edges with power-law popularity: a few authors gather most
+    followers and a few users follow many authors. Duplicates and self
+    follows are dropped, so slightly fewer edges come back.
+    """
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, users + 1)
+    popularity = 1 / ranks ** 0.9
+    activity = 1 / (ranks + 10) ** 0.5
+    targets = rng.permutation(users)[rng.choice(
+        users, edges, p=popularity / popularity.sum())]
+    sources = rng.permutation(users)[rng.choice(
+        users, edges, p=activity / activity.sum())]
+    keys = np.unique(sources.astype(np.int64) * users + targets)
+    sources, targets = keys // users + 1, keys % users + 1
+    loops = sources == targets
+    return sources[~loops], targets[~loops]
+
+
+def reference(graph, node, limit):
+    """The same suggestions with plain dicts, to check the vectorized code."""
+    follows = set(graph.follows(node).tolist())
+    scores = {}
+    for middle in follows:
+        weight = 1 / math.log2(2 + len(graph.follows(middle)))
+        for candidate in graph.follows(middle).tolist():
+            if candidate != node and candidate not in follows:
+                scores[candidate] = scores.get(candidate, 0) + weight
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[
+        :limit]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark building the follow graph and computing suggested '
+            'authors for every user on a synthetic power-law graph. '
+            'Nothing is written to the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--edges', type=int, default=1000000)
+        parser.add_argument('--limit', type=int, default=suggestions.LIMIT)
+        parser.add_argument('--check', type=int, default=200,
+                            help='users compared against a plain Python '
+                                 'implementation')
+
+    def compare(self, graph, options):
+        nodes = np.flatnonzero(np.diff(graph.indptr))
+        sample = np.random.default_rng(1).choice(
+            nodes, min(options['check'], len(nodes)), replace=False)
+        for node in sample.tolist():
+            candidates, scores, _ = graph.suggest(node, options['limit'])
+            expected = reference(graph, node, options['limit'])
+            if (candidates.tolist() != [item for item, _ in expected]
+                    or not np.allclose(scores, [
+                        score for _, score in expected])):
+                raise CommandError(f'Mismatch for node {node}')
+        self.stdout.write(f'check: {len(sample)} users match the reference')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['edges'] < 1:
+            raise CommandError('Need at least 2 users and 1 edge')
+        sources, targets = synthetic_edges(options['users'], options['edges'])
+        baseline = peak_rss()
+        started = time.perf_counter()
+        graph = suggestions.Graph(sources, targets)
+        built = time.perf_counter()
+        nodes = np.flatnonzero(np.diff(graph.indptr))
+        rows = 0
+        for _ in graph.rows(nodes, options['limit']):
+            rows += 1
+        finished = time.perf_counter()
+        degrees = np.diff(graph.indptr)
+        followers = np.bincount(graph.indices, minlength=len(graph))
+        self.stdout.write(
+            f'graph: {len(graph)} users, {len(graph.indices)} edges, '
+            f'max follows {degrees.max()}, max followers '
+            f'{followers.max()}, {graph.nbytes / 2 ** 20:.1f} MiB CSR')
+        self.stdout.write(
+            f'build {built - started:.2f}s, suggest {finished - built:.1f}s '
+            f'({len(nodes) / (finished - built):,.0f} users/s), '
+            f'{rows} suggestions, peak memory +{peak_rss() - baseline:.0f} '
+            f'MiB')
+        if options['check']:
+            self.compare(graph, options)
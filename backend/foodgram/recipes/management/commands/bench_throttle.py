@@ -0,0 +1,121 @@
+import pickle
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from foodgram import loadshedding, throttling
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class BenchView:
+    throttle_scope = 'bench'
+
+
+class TimestampThrottle(ScopedRateThrottle):
+    """DRF's throttle: a list of timestamps per client."""
+    THROTTLE_RATES = {'bench': None}
+
+
+class SlidingWindowThrottle(throttling.ScopedSlidingWindowThrottle):
+    THROTTLE_RATES = {'bench': None}
+
+
+THROTTLES = {'timestamp list': TimestampThrottle,
+             'sliding window': SlidingWindowThrottle}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the per-request cost of DRF\'s timestamp-list '
+            'throttle against the sliding-window counters, check how '
+            'closely the sliding window holds the limit and time the '
+            'concurrency slots of the load shedder')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', default='1000/min',
+                            help='throttle rate, high enough to pass')
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=100)
+
+    def requests(self, count):
+        factory = RequestFactory()
+        requests = []
+        for number in range(count):
+            request = factory.get(
+                '/api/ingredients/', REMOTE_ADDR=f'10.0.{number // 250}.'
+                                                 f'{number % 250 + 1}')
+            request.user = AnonymousUser()
+            requests.append(request)
+        return requests
+
+    def overhead(self, options):
+        clients = self.requests(options['clients'])
+        view = BenchView()
+        for name, throttle_class in THROTTLES.items():
+            throttle_class.THROTTLE_RATES = {'bench': options['rate']}
+            cache.clear()
+            refused = 0
+            start = time.perf_counter()
+            for number in range(options['requests']):
+                if not throttle_class().allow_request(
+                        clients[number % len(clients)], view):
+                    refused += 1
+            elapsed = time.perf_counter() - start
+            throttle = throttle_class()
+            throttle.allow_request(clients[0], view)
+            stored = sum(
+                len(pickle.dumps(value)) for key, value in cache.get_many(
+                    [throttle.key] if name == 'timestamp list' else
+                    [f'{throttle.get_cache_key(clients[0], view)}:'
+                     f'{int(time.time() // throttle.duration) - offset}'
+                     for offset in (0, 1)]).items())
+            self.stdout.write(
+                f'{name}: {elapsed / options["requests"] * 1e6:.1f} '
+                f'us/check, {stored} bytes stored per client, '
+                f'{refused} refused')
+
+    def accuracy(self):
+        """Steady traffic at twice the limit, as seen by hit()."""
+        cache.clear()
+        limit, duration, step = 100, 60, 0.3
+        allowed = []
+        now = 1000 * duration
+        while now < 1003 * duration:
+            if not throttling.hit('bench-accuracy', limit, duration, now):
+                allowed.append(now)
+            now += step
+        worst = max(
+            sum(1 for moment in allowed if start <= moment < start + duration)
+            for start in allowed)
+        self.stdout.write(
+            f'accuracy: {limit}/{duration}s limit at '
+            f'{duration / step / limit:.0f}x the rate, at most {worst} '
+            f'requests in any {duration}s window')
+
+    def shedding(self, options):
+        limit = 4
+        with override_settings(CONCURRENCY_LIMITS={'bench': limit}):
+            cache.clear()
+            slots = [loadshedding.acquire('bench') for _ in range(limit)]
+            if None in slots or loadshedding.acquire('bench') is not None:
+                raise CommandError('Load shedder did not hold its limit')
+            for slot in slots:
+                loadshedding.release(slot)
+            start = time.perf_counter()
+            for _ in range(options['requests']):
+                loadshedding.release(loadshedding.acquire('bench'))
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'load shedder: {elapsed / options["requests"] * 1e6:.1f} '
+            f'us/request to take and return a slot, request {limit + 1} '
+            f'of {limit} refused')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['clients'] < 1:
+            raise CommandError('--requests and --clients must be positive')
+        self.stdout.write(f'cache: {type(cache).__name__}')
+        self.overhead(options)
+        self.accuracy()
+        self.shedding(options)
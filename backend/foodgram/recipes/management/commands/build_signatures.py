@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = ('Recompute MinHash signatures and LSH buckets of all recipes '
+            'for similar recipe search')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int,
+                            default=similarity.BATCH_SIZE,
+                            help='recipes hashed per batch')
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch must be positive')
+        started = time.perf_counter()
+        recipes = 0
+        for count in similarity.rebuild(options['batch']):
+            recipes += count
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Hashed {recipes} recipes in {elapsed:.1f}s, '
+            f'{recipes / max(elapsed, 1e-9):,.0f} recipes/s'))
@@ -0,0 +1,47 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes import suggestions
+
+
+def peak_rss():
+    """Peak resident memory of the process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the suggested authors of every user from the '
+            'subscription graph, reporting runtime and memory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=suggestions.LIMIT,
+                            help='suggestions stored per user')
+        parser.add_argument('--batch', type=int,
+                            default=suggestions.BATCH_SIZE,
+                            help='users stored per transaction')
+
+    def handle(self, *args, **options):
+        if options['limit'] < 1 or options['batch'] < 1:
+            raise CommandError('--limit and --batch must be positive')
+        baseline = peak_rss()
+        started = time.perf_counter()
+        sources, targets = suggestions.load_edges()
+        loaded = time.perf_counter()
+        graph = suggestions.Graph(sources, targets)
+        del sources, targets
+        built = time.perf_counter()
+        stored = sum(suggestions.rebuild(
+            graph, options['limit'], options['batch']))
+        finished = time.perf_counter()
+        self.stdout.write(
+            f'load {loaded - started:.1f}s, graph {built - loaded:.1f}s, '
+            f'suggest and store {finished - built:.1f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} suggestions for {len(graph)} users from '
+            f'{len(graph.indices)} edges in {finished - started:.1f}s, '
+            f'graph {graph.nbytes / 2 ** 20:.1f} MiB, peak memory '
+            f'+{peak_rss() - baseline:.0f} MiB'))
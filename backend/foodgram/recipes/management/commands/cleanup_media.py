@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.models import Recipe
+from recipes.shopping_list import PDF_DIR
+
+
+def walk(storage, path):
+    """Yield file names under `path`, recursively."""
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}{name}'
+    for directory in directories:
+        yield from walk(storage, f'{path}{directory}/')
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Delete recipe images that no recipe references and stale '
+            'shopping list PDFs')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000,
+                            help='files checked per query')
+        parser.add_argument('--min-age', type=int, default=60,
+                            help='minutes; younger files may belong to a '
+                                 'recipe that is being saved')
+        parser.add_argument('--pdf-max-age', type=int, default=24,
+                            help='hours a rendered shopping list is kept')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def older_than(self, storage, name, cutoff):
+        return storage.get_modified_time(name) < cutoff
+
+    def delete(self, storage, names, options):
+        if not options['dry_run']:
+            for name in names:
+                storage.delete(name)
+        return len(names)
+
+    def images(self, storage, options):
+        field = Recipe._meta.get_field('image')
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        checked = removed = 0
+        if not storage.exists(field.upload_to):
+            return checked, removed
+        for names in batches(walk(storage, field.upload_to),
+                             options['batch']):
+            used = set(Recipe.objects.filter(image__in=names).values_list(
+                'image', flat=True))
+            removed += self.delete(storage, [
+                name for name in names if name not in used
+                and self.older_than(storage, name, cutoff)], options)
+            checked += len(names)
+        return checked, removed
+
+    def pdfs(self, storage, options):
+        cutoff = timezone.now() - timedelta(hours=options['pdf_max_age'])
+        if not storage.exists(PDF_DIR):
+            return 0
+        return self.delete(storage, [
+            name for name in walk(storage, PDF_DIR)
+            if self.older_than(storage, name, cutoff)], options)
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        checked, removed = self.images(storage, options)
+        pdfs = self.pdfs(storage, options)
+        verb = 'would be removed' if options['dry_run'] else 'removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{checked} images checked, {removed} orphaned {verb}; '
+            f'{pdfs} shopping list PDFs {verb}'))
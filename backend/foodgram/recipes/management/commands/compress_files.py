@@ -0,0 +1,32 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from foodgram.storage import COMPRESSIBLE, compress_file
+
+
+class Command(BaseCommand):
+    help = ('Write .gz and .br copies of text files for nginx gzip_static, '
+            'e.g. the API docs outside of collectstatic')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help='files or directories to walk')
+
+    def files(self, path):
+        if os.path.isfile(path):
+            yield path
+            return
+        if not os.path.isdir(path):
+            raise CommandError(f'{path} does not exist')
+        for directory, _, names in os.walk(path):
+            for name in sorted(names):
+                yield os.path.join(directory, name)
+
+    def handle(self, *args, **options):
+        written = 0
+        for path in options['paths']:
+            for name in self.files(path):
+                if name.endswith(COMPRESSIBLE):
+                    written += len(compress_file(name))
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} compressed files'))
@@ -0,0 +1,157 @@
+import io
+import json
+import sys
+import tarfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, TagRecipe
+from users.models import User
+
+FORMAT = 'foodgram-recipes'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+RECORDS_DIR = 'records/'
+IMAGES_DIR = 'images/'
+AUTHOR_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+
+
+def add_member(archive, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def chunks(iterator, size):
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = ('Stream recipes with their ingredients, tags, authors and '
+            'images into a tar archive of newline-delimited JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='archive path, "-" for stdout')
+        parser.add_argument('--chunk', type=int, default=1000,
+                            help='recipes read and written per batch')
+        parser.add_argument('--compress', choices=['gz', 'bz2', 'xz'],
+                            help='compress the tar stream')
+        parser.add_argument('--author', action='append', default=[],
+                            help='export only recipes of this email, '
+                                 'can be repeated')
+        parser.add_argument('--no-images', action='store_true')
+
+    def reference_lines(self, model, fields, ids, kind):
+        """Lines for rows of `model` not written yet, each once."""
+        missing = ids - self.written[kind]
+        self.written[kind] |= missing
+        return [
+            json.dumps({'type': kind, **row}, ensure_ascii=False)
+            for row in model.objects.filter(pk__in=missing).order_by(
+                'pk').values(*fields)]
+
+    def chunk_lines(self, recipes):
+        ids = [recipe['id'] for recipe in recipes]
+        ingredients, tags = {}, {}
+        for recipe_id, ingredient_id, amount in (
+                RecipeIngredient.objects.filter(recipe_id__in=ids).order_by(
+                    'pk').values_list('recipe_id', 'ingredient_id',
+                                      'amount')):
+            ingredients.setdefault(recipe_id, []).append(
+                [ingredient_id, amount])
+        for recipe_id, tag_id in TagRecipe.objects.filter(
+                recipe_id__in=ids).order_by('pk').values_list(
+                'recipe_id', 'tags_id'):
+            tags.setdefault(recipe_id, []).append(tag_id)
+        lines = self.reference_lines(
+            User, AUTHOR_FIELDS,
+            {recipe['author_id'] for recipe in recipes}, 'author')
+        lines += self.reference_lines(
+            Ingredient, ('id', 'name', 'measurement_unit'),
+            {row[0] for rows in ingredients.values() for row in rows},
+            'ingredient')
+        lines += self.reference_lines(
+            Tag, ('id', 'name', 'color', 'slug'),
+            {tag for ids in tags.values() for tag in ids}, 'tag')
+        for recipe in recipes:
+            self.rows += len(ingredients.get(recipe['id'], ()))
+            lines.append(json.dumps({
+                'type': 'recipe', 'id': recipe['id'],
+                'author': recipe['author_id'], 'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'image': recipe['image'],
+                'tags': tags.get(recipe['id'], []),
+                'ingredients': ingredients.get(recipe['id'], [])},
+                ensure_ascii=False))
+        return lines
+
+    def add_images(self, archive, recipes):
+        storage = Recipe._meta.get_field('image').storage
+        for name in sorted({recipe['image'] for recipe in recipes}):
+            if not name or name in self.written['image']:
+                continue
+            self.written['image'].add(name)
+            if not storage.exists(name):
+                self.stderr.write(f'Image {name} is missing, skipped')
+                continue
+            info = tarfile.TarInfo(IMAGES_DIR + name)
+            info.size = storage.size(name)
+            info.mtime = int(time.time())
+            with storage.open(name) as file:
+                archive.addfile(info, file)
+            self.image_bytes += info.size
+
+    def export(self, archive, options):
+        queryset = Recipe.objects.order_by('pk')
+        if options['author']:
+            queryset = queryset.filter(author__email__in=options['author'])
+        add_member(archive, MANIFEST, json.dumps({
+            'format': FORMAT, 'version': FORMAT_VERSION}).encode())
+        recipes = queryset.values(
+            'id', 'author_id', 'name', 'text', 'cooking_time',
+            'image').iterator(chunk_size=options['chunk'])
+        for number, chunk in enumerate(chunks(recipes, options['chunk'])):
+            # images go first, so the importer knows their stored names
+            # by the time it reaches the recipes
+            if not options['no_images']:
+                self.add_images(archive, chunk)
+            add_member(
+                archive, f'{RECORDS_DIR}{number:06}.ndjson',
+                '\n'.join(self.chunk_lines(chunk)).encode() + b'\n')
+            self.recipes += len(chunk)
+
+    def handle(self, *args, **options):
+        if options['chunk'] < 1:
+            raise CommandError('--chunk must be positive')
+        self.written = {'author': set(), 'ingredient': set(), 'tag': set(),
+                        'image': set()}
+        self.recipes = self.rows = self.image_bytes = 0
+        started = time.perf_counter()
+        mode = 'w|' + (options['compress'] or '')
+        if options['output'] == '-':
+            archive = tarfile.open(fileobj=sys.stdout.buffer, mode=mode)
+        else:
+            archive = tarfile.open(options['output'], mode=mode)
+        with archive, transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # every chunk sees the same snapshot
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                                   'REPEATABLE READ READ ONLY')
+            self.export(archive, options)
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {self.recipes} recipes, {self.rows} recipe '
+            f'ingredients and {len(self.written["image"])} images '
+            f'({self.image_bytes / 2 ** 20:.1f} MiB) in {elapsed:.1f}s, '
+            f'{self.rows / max(elapsed, 1e-9):,.0f} recipe ingredients/s'))
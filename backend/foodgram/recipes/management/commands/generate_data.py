@@ -0,0 +1,174 @@
+import csv
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes import nutrition, similarity
+from recipes.db import insert_rows
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag, TagRecipe)
+from users.models import User
+
+PASSWORD = 'synthetic-password'
+IMAGE_NAME = 'recipes/synthetic.png'
+# 1x1 transparent PNG
+IMAGE = bytes.fromhex(
+    '89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489'
+    '0000000d49444154789c6360606060000000050001a5f645400000000049454e44'
+    'ae426082')
+TAGS = (('Завтрак', '#E26C2D', 'breakfast'),
+        ('Обед', '#49B64E', 'lunch'),
+        ('Ужин', '#8775D2', 'dinner'),
+        ('Десерт', '#E2A52D', 'dessert'),
+        ('Перекус', '#2DB4E2', 'snack'))
+
+
+def next_id(model):
+    return (model.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+
+
+def power_law_weights(count, exponent):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, recipes, subscriptions and carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='average subscriptions per user')
+        parser.add_argument('--favorites', type=int, default=10,
+                            help='average favorites per user')
+        parser.add_argument('--carts', type=int, default=3,
+                            help='average shopping cart size per user')
+        parser.add_argument('--exponent', type=float, default=1.1,
+                            help='power-law exponent of author popularity')
+        parser.add_argument('--chunk', type=int, default=2000,
+                            help='recipes generated per batch')
+        parser.add_argument('--seed', type=int)
+
+    def ensure_reference_data(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS)
+        if not Ingredient.objects.exists():
+            path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+            with open(path, encoding='utf-8') as file:
+                Ingredient.objects.bulk_create(
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in csv.reader(file))
+            path = os.path.join(settings.BASE_DIR, 'data', 'nutrition.csv')
+            with open(path, encoding='utf-8') as file:
+                nutrition.load_csv(file)
+        storage = Recipe._meta.get_field('image').storage
+        if not storage.exists(IMAGE_NAME):
+            storage.save(IMAGE_NAME, ContentFile(IMAGE))
+
+    def create_users(self, count):
+        start = next_id(User)
+        password = make_password(PASSWORD)
+        joined = timezone.now()
+        insert_rows(
+            User,
+            ('id', 'username', 'email', 'first_name', 'last_name',
+             'password', 'is_active', 'is_staff', 'is_superuser',
+             'date_joined'),
+            [(pk, f'user{pk}', f'user{pk}@example.org', 'Имя', 'Фамилия',
+              password, True, False, False, joined)
+             for pk in range(start, start + count)])
+        return list(range(start, start + count))
+
+    def create_subscriptions(self, users, authors, weights, average):
+        rows = []
+        for user in users:
+            following = set(random.choices(
+                authors, weights, k=random.randint(0, 2 * average)))
+            following.discard(user)
+            rows.extend((user, author, 0) for author in following)
+        insert_rows(Subscribe, ('user_id', 'following_id', 'recipes_count'),
+                    rows)
+        return len(rows)
+
+    def create_recipes(self, authors, weights, count, chunk):
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        start = next_id(Recipe)
+        recipe_ids = range(start, start + count)
+        ingredient_rows = 0
+        for offset in range(0, count, chunk):
+            ids = recipe_ids[offset:offset + chunk]
+            recipes, ingredients, tags = [], [], []
+            for pk in ids:
+                recipes.append((
+                    pk, random.choices(authors, weights)[0],
+                    f'Рецепт {pk}', IMAGE_NAME,
+                    'Синтетический рецепт. ' * random.randint(1, 40),
+                    random.randint(1, 180)))
+                for ingredient in random.sample(
+                        ingredient_ids,
+                        min(len(ingredient_ids), random.randint(5, 30))):
+                    ingredients.append((pk, ingredient,
+                                        random.randint(1, 500)))
+                for tag in random.sample(
+                        tag_ids, random.randint(1, len(tag_ids))):
+                    tags.append((tag, pk))
+            insert_rows(Recipe, ('id', 'author_id', 'name', 'image', 'text',
+                                 'cooking_time'), recipes)
+            insert_rows(RecipeIngredient,
+                        ('recipe_id', 'ingredient_id', 'amount'), ingredients)
+            insert_rows(TagRecipe, ('tags_id', 'recipe_id'), tags)
+            nutrition.refresh(ids)
+            similarity.refresh(ids)
+            ingredient_rows += len(ingredients)
+        return list(recipe_ids), ingredient_rows
+
+    def create_user_recipes(self, model, fields, users, recipes, average):
+        rows = []
+        for user in users:
+            for recipe in set(random.choices(
+                    recipes, k=random.randint(0, 2 * average))):
+                rows.append((user, recipe))
+        insert_rows(model, fields, rows)
+        return len(rows)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            self.ensure_reference_data()
+            users = self.create_users(options['users'])
+            # a few popular authors get most of the followers and recipes
+            authors = random.sample(users, len(users))
+            weights = power_law_weights(len(authors), options['exponent'])
+            subscriptions = self.create_subscriptions(
+                users, authors, weights, options['follows'])
+            recipes, ingredient_rows = self.create_recipes(
+                authors, weights, options['recipes'], options['chunk'])
+            favorites = self.create_user_recipes(
+                Favorite, ('user_id', 'recipes_id'), users, recipes,
+                options['favorites'])
+            carts = self.create_user_recipes(
+                ShoppingCart, ('user_id', 'recipe_id'), users, recipes,
+                options['carts'])
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Recipe]):
+                    cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} users (ids {users[0]}-{users[-1]}), '
+            f'{subscriptions} subscriptions, '
+            f'{len(recipes)} recipes, {ingredient_rows} recipe ingredients, '
+            f'{favorites} favorites, {carts} cart items in '
+            f'{time.perf_counter() - started:.1f}s '
+            f'(password: {PASSWORD})'))
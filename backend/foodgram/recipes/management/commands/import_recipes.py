@@ -0,0 +1,215 @@
+import io
+import json
+import sys
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from PIL import Image, UnidentifiedImageError
+from recipes import nutrition, similarity
+from recipes.db import insert_rows
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, TagRecipe
+from users.models import User
+
+from .export_recipes import (FORMAT, FORMAT_VERSION, IMAGES_DIR, MANIFEST,
+                             RECORDS_DIR)
+from .generate_data import next_id
+
+
+def reserve_ids(model, count):
+    """Primary keys for `count` rows inserted with explicit ids."""
+    if connection.vendor != 'postgresql':
+        start = next_id(model)
+        return list(range(start, start + count))
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)', [table, column, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def store_image(name, data):
+    """
+    Check that `data` is an image and save it, reusing a file with the
+    same name and content. Returns the stored name.
+    """
+    try:
+        Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise CommandError(f'{name} is not an image')
+    storage = Recipe._meta.get_field('image').storage
+    if storage.exists(name):
+        with storage.open(name) as file:
+            if file.read() == data:
+                return name
+    return storage.save(name, ContentFile(data))
+
+
+class Command(BaseCommand):
+    help = ('Import recipes from an export_recipes archive, creating '
+            'missing authors, ingredients and tags and giving recipes '
+            'new ids')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='archive path, "-" for stdin')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='threads checking and storing images')
+
+    def setup(self):
+        self.authors, self.ingredients, self.tags, self.images = {}, {}, {}, {}
+        self.ingredient_ids = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')}
+        self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        self.pending = {}
+        self.recipes = self.rows = 0
+
+    def collect_images(self):
+        for name, future in self.pending.items():
+            self.images[name] = future.result()
+        self.pending = {}
+
+    def import_authors(self, records):
+        emails = {record['email'] for record in records}
+        existing = dict(User.objects.filter(email__in=emails).values_list(
+            'email', 'id'))
+        missing = [record for record in records
+                   if record['email'] not in existing]
+        taken = set(User.objects.filter(
+            username__in=[record['username'] for record in missing]
+        ).values_list('username', flat=True))
+        # passwords are not exported, imported authors have to reset them
+        password = make_password(None)
+        User.objects.bulk_create(
+            User(email=record['email'],
+                 username=(f'{record["username"]}_{record["id"]}'
+                           if record['username'] in taken
+                           else record['username']),
+                 first_name=record['first_name'],
+                 last_name=record['last_name'], password=password)
+            for record in missing)
+        if missing:
+            existing.update(User.objects.filter(
+                email__in=[record['email'] for record in missing]
+            ).values_list('email', 'id'))
+        for record in records:
+            self.authors[record['id']] = existing[record['email']]
+
+    def import_ingredients(self, records):
+        missing = {(record['name'], record['measurement_unit'])
+                   for record in records} - set(self.ingredient_ids)
+        if missing:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing)
+            self.ingredient_ids = {
+                (name, unit): pk for pk, name, unit in
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit')}
+        for record in records:
+            self.ingredients[record['id']] = self.ingredient_ids[
+                record['name'], record['measurement_unit']]
+
+    def import_tags(self, records):
+        missing = [record for record in records
+                   if record['slug'] not in self.tag_ids]
+        if missing:
+            Tag.objects.bulk_create(
+                Tag(name=record['name'], color=record['color'],
+                    slug=record['slug'])
+                for record in missing)
+            self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        for record in records:
+            self.tags[record['id']] = self.tag_ids[record['slug']]
+
+    def import_recipes(self, records):
+        ids = reserve_ids(Recipe, len(records))
+        recipes, ingredients, tags = [], [], []
+        for pk, record in zip(ids, records):
+            recipes.append((
+                pk, self.authors[record['author']], record['name'],
+                self.images.get(record['image'], record['image']),
+                record['text'], record['cooking_time']))
+            ingredients.extend(
+                (pk, self.ingredients[ingredient], amount)
+                for ingredient, amount in record['ingredients'])
+            tags.extend((self.tags[tag], pk) for tag in record['tags'])
+        insert_rows(Recipe, ('id', 'author_id', 'name', 'image', 'text',
+                             'cooking_time'), recipes)
+        insert_rows(RecipeIngredient,
+                    ('recipe_id', 'ingredient_id', 'amount'), ingredients)
+        insert_rows(TagRecipe, ('tags_id', 'recipe_id'), tags)
+        nutrition.refresh(ids)
+        similarity.refresh(ids)
+        self.recipes += len(recipes)
+        self.rows += len(ingredients)
+
+    def import_records(self, data):
+        # wait for the images of this chunk to learn their stored names
+        self.collect_images()
+        records = {'author': [], 'ingredient': [], 'tag': [], 'recipe': []}
+        for line in data.splitlines():
+            record = json.loads(line)
+            records[record.pop('type')].append(record)
+        self.import_authors(records['author'])
+        self.import_ingredients(records['ingredient'])
+        self.import_tags(records['tag'])
+        self.import_recipes(records['recipe'])
+
+    def check_manifest(self, archive, member):
+        if member.name != MANIFEST:
+            raise CommandError('Not an export_recipes archive')
+        manifest = json.load(archive.extractfile(member))
+        if (manifest.get('format') != FORMAT
+                or manifest.get('version') != FORMAT_VERSION):
+            raise CommandError(
+                f'Unsupported archive format {manifest.get("format")} '
+                f'version {manifest.get("version")}')
+
+    def run(self, archive, pool, workers):
+        for number, member in enumerate(archive):
+            if number == 0:
+                self.check_manifest(archive, member)
+            elif not member.isfile():
+                continue
+            elif member.name.startswith(IMAGES_DIR):
+                name = member.name[len(IMAGES_DIR):]
+                self.pending[name] = pool.submit(
+                    store_image, name, archive.extractfile(member).read())
+                if len(self.pending) >= 4 * workers:
+                    self.collect_images()
+            elif member.name.startswith(RECORDS_DIR):
+                self.import_records(
+                    archive.extractfile(member).read().decode())
+        self.collect_images()
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        self.setup()
+        started = time.perf_counter()
+        if options['input'] == '-':
+            archive = tarfile.open(fileobj=sys.stdin.buffer, mode='r|*')
+        else:
+            archive = tarfile.open(options['input'], mode='r|*')
+        with archive, ThreadPoolExecutor(options['workers']) as pool:
+            # images stored before a failure are left for cleanup_media
+            with transaction.atomic():
+                self.run(archive, pool, options['workers'])
+                if connection.vendor != 'postgresql':
+                    with connection.cursor() as cursor:
+                        for sql in connection.ops.sequence_reset_sql(
+                                no_style(), [Recipe]):
+                            cursor.execute(sql)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.recipes} recipes, {self.rows} recipe '
+            f'ingredients and {len(self.images)} images in {elapsed:.1f}s, '
+            f'{self.rows / max(elapsed, 1e-9):,.0f} recipe ingredients/s'))
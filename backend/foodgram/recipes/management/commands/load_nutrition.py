@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes import nutrition
+
+
+class Command(BaseCommand):
+    help = ('Load calories, proteins, fats, carbohydrates and price per '
+            'measurement unit of ingredients from CSV and refresh the '
+            'totals of the recipes using them')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'nutrition.csv'))
+        parser.add_argument('--all', action='store_true',
+                            help='refresh the totals of every recipe')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with open(options['path'], encoding='utf-8') as file:
+            with transaction.atomic():
+                try:
+                    changed, unknown = nutrition.load_csv(file)
+                except (KeyError, ValueError) as error:
+                    raise CommandError(f'Bad CSV: {error}')
+                if options['all']:
+                    recipes = nutrition.refresh()
+                else:
+                    recipes = nutrition.refresh_ingredients(changed)
+        for row in unknown:
+            self.stderr.write(f'Unknown ingredient {row["name"]} '
+                              f'({row["measurement_unit"]}), skipped')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(changed)} ingredients changed, totals of {recipes} '
+            f'recipes refreshed in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,167 @@
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Ingredient, Recipe, Subscribe, Tag
+from users.models import User
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def default_paths():
+    """
+    Every GET route of recipes/urls.py, filled with existing ids and keyed
+    by its template, so a baseline applies to any dataset.
+    """
+    recipe = Recipe.objects.values_list('id', flat=True).first()
+    tag = Tag.objects.values_list('id', flat=True).first()
+    ingredient = Ingredient.objects.values_list('id', flat=True).first()
+    author = Subscribe.objects.values_list(
+        'following_id', flat=True).first()
+    paths = {path: path for path in (
+        '/api/recipes/', '/api/recipes/?page=2',
+        '/api/recipes/?tags=breakfast&tags=lunch',
+        '/api/tags/', '/api/ingredients/', '/api/ingredients/?name=са',
+        '/api/users/', '/api/users/me/', '/api/users/subscriptions/',
+        '/api/recipes/download_shopping_cart/')}
+    if recipe:
+        paths['/api/recipes/{id}/'] = f'/api/recipes/{recipe}/'
+    if tag:
+        paths['/api/tags/{id}/'] = f'/api/tags/{tag}/'
+    if ingredient:
+        paths['/api/ingredients/{id}/'] = f'/api/ingredients/{ingredient}/'
+    if author:
+        paths['/api/users/{id}/'] = f'/api/users/{author}/'
+    return paths
+
+
+def environment(options):
+    """What the numbers depend on besides the code."""
+    return {
+        'database': connection.vendor,
+        'users': User.objects.count(),
+        'recipes': Recipe.objects.count(),
+        'concurrency': options['concurrency'],
+        'requests': options['requests'],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Send concurrent GET requests to a running server and compare '
+            'latency with the stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='http://127.0.0.1:9001')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='may be repeated, defaults to all routes')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=100,
+                            help='requests per path')
+        parser.add_argument('--token', help='auth token of a user')
+        parser.add_argument('--email', help='log in as this user')
+        parser.add_argument('--password')
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='allowed slowdown against the baseline')
+
+    def login(self, options):
+        response = requests.post(
+            options['host'] + '/api/auth/token/login/',
+            json={'email': options['email'],
+                  'password': options['password']})
+        if response.status_code != 201:
+            raise CommandError(f'Login failed: {response.text}')
+        return response.json()['auth_token']
+
+    def run_path(self, url, options, token):
+        session = requests.Session()
+        if token:
+            session.headers['Authorization'] = f'Token {token}'
+
+        def fetch(_):
+            start = time.perf_counter()
+            response = session.get(url)
+            return time.perf_counter() - start, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        wall = time.perf_counter() - started
+        latencies = [elapsed for elapsed, _ in results]
+        errors = sum(1 for _, code in results if code >= 400)
+        return {
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'mean': statistics.mean(latencies),
+            'rps': len(results) / wall,
+            'errors': errors,
+        }
+
+    def compare(self, results, options):
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f'No baseline at {options["baseline"]}')
+            return
+        with open(options['baseline']) as file:
+            baseline = json.load(file)
+        recorded = baseline['environment']
+        current = environment(options)
+        if recorded != current:
+            self.stdout.write(self.style.WARNING(
+                f'Baseline was recorded with {recorded}, this run has '
+                f'{current}'))
+        regressions = []
+        for name, stats in results.items():
+            reference = baseline['routes'].get(name)
+            if reference is None:
+                continue
+            for key in ('p50', 'p99'):
+                if stats[key] > reference[key] * options['threshold']:
+                    regressions.append(
+                        f'{name} {key}: {stats[key] * 1000:.1f} ms, '
+                        f'baseline {reference[key] * 1000:.1f} ms')
+        if regressions:
+            raise CommandError('Regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        paths = ({path: path for path in options['paths']}
+                 if options['paths'] else default_paths())
+        results = {}
+        token = options['token']
+        for name, path in paths.items():
+            if options['email']:
+                # access tokens outlive a few routes, not the whole run
+                token = self.login(options)
+            stats = self.run_path(options['host'] + path, options, token)
+            results[name] = stats
+            self.stdout.write(
+                f'{name}: p50 {stats["p50"] * 1000:.1f} ms, '
+                f'p99 {stats["p99"] * 1000:.1f} ms, '
+                f'{stats["rps"]:.0f} req/s, {stats["errors"]} errors')
+        if options['save_baseline']:
+            if any(stats['errors'] for stats in results.values()):
+                raise CommandError('Not saving a baseline with errors')
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as file:
+                json.dump({'environment': environment(options),
+                           'routes': results},
+                          file, indent=2, ensure_ascii=False)
+                file.write('\n')
+            self.stdout.write(f'Baseline saved to {options["baseline"]}')
+        else:
+            self.compare(results, options)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from foodgram.replicas import replicas
+
+
+class Command(BaseCommand):
+    help = ('Show the replication lag of every read replica and whether '
+            'requests would read from it')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured, set DB_REPLICA_HOSTS')
+        for alias in settings.DATABASE_REPLICAS:
+            try:
+                lag = replicas.lag(alias)
+            except DatabaseError as error:
+                self.stdout.write(self.style.ERROR(
+                    f'{alias}: unavailable ({error})'))
+                continue
+            if lag > settings.REPLICA_MAX_LAG:
+                self.stdout.write(self.style.WARNING(
+                    f'{alias}: lag {lag:.2f}s, above REPLICA_MAX_LAG '
+                    f'({settings.REPLICA_MAX_LAG}s), skipped'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: lag {lag:.2f}s, in use'))
@@ -0,0 +1,60 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes import similarity
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('List pairs of near-duplicate recipes as CSV, found through '
+            'the LSH buckets and checked on their ingredient sets')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=0.9,
+                            help='minimal Jaccard similarity of the '
+                                 'ingredient sets')
+        parser.add_argument('--same-author', action='store_true',
+                            help='only pairs posted by one author')
+        parser.add_argument('--max-bucket', type=int, default=1000,
+                            help='skip buckets with more recipes, they '
+                                 'come from very common ingredient sets')
+
+    def verify(self, pairs, threshold):
+        """Exact similarity of estimated pairs, chunk by chunk."""
+        for start in range(0, len(pairs), similarity.BATCH_SIZE):
+            chunk = pairs[start:start + similarity.BATCH_SIZE]
+            sets = similarity.ingredient_sets(
+                {pk for first, second, _ in chunk for pk in (first, second)})
+            for first, second, _ in chunk:
+                score = similarity.jaccard(sets[first], sets[second])
+                if score >= threshold:
+                    yield first, second, score
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError('--threshold must be in (0, 1]')
+        started = time.perf_counter()
+        ids, signatures = similarity.load_signatures()
+        # estimates scatter around the true similarity, keep a margin
+        pairs, skipped = similarity.duplicate_pairs(
+            ids, signatures, options['threshold'] - 0.1,
+            options['max_bucket'])
+        found = list(self.verify(pairs, options['threshold']))
+        authors = dict(Recipe.objects.filter(
+            pk__in={pk for pair in found for pk in pair[:2]}).values_list(
+            'id', 'author_id'))
+        writer = csv.writer(self.stdout)
+        writer.writerow(['recipe', 'duplicate', 'author', 'duplicate_author',
+                         'similarity'])
+        reported = 0
+        for first, second, score in found:
+            if options['same_author'] and authors[first] != authors[second]:
+                continue
+            writer.writerow([first, second, authors[first], authors[second],
+                             f'{score:.3f}'])
+            reported += 1
+        self.stderr.write(self.style.SUCCESS(
+            f'{reported} pairs among {len(ids)} recipes, {len(pairs)} '
+            f'candidates, {skipped} oversized buckets skipped, '
+            f'{time.perf_counter() - started:.1f}s'))
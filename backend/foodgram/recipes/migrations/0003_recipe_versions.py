@@ -0,0 +1,41 @@
+# Generated by Django 3.2.3 on 2026-10-19 17:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_tagrecipe_recipe_tags_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('changes', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ('recipe', 'version'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipechange',
+            constraint=models.UniqueConstraint(fields=('recipe', 'version'), name='unique_recipe_version'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-19 17:43
+
+from django.db import migrations, models
+import foodgram.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_nutrition'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=foodgram.storage.ContentHashStorage(), upload_to='recipes/'),
+        ),
+    ]
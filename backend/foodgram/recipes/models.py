@@ -1,4 +1,5 @@
 from django.db import models
+from foodgram.storage import ContentHashStorage
 from users.models import User
 
 
@@ -16,6 +17,13 @@ class Tag(models.Model):
 class Ingredient(models.Model):
     name = models.CharField(max_length=60)
     measurement_unit = models.CharField(max_length=30)
+    # per one measurement unit, empty when unknown
+    calories = models.FloatField(null=True, blank=True, help_text='kcal')
+    proteins = models.FloatField(null=True, blank=True, help_text='g')
+    fats = models.FloatField(null=True, blank=True, help_text='g')
+    carbohydrates = models.FloatField(null=True, blank=True, help_text='g')
+    price = models.DecimalField(max_digits=10, decimal_places=4, null=True,
+                                blank=True)
 
     def __str__(self):
         return f'{self.name} ({self.measurement_unit})'
@@ -27,6 +35,7 @@ class Recipe(models.Model):
     name = models.CharField(max_length=200)
     image = models.ImageField(
         upload_to='recipes/',
+        storage=ContentHashStorage(),
         null=False
     )
     text = models.CharField(max_length=1200)
@@ -37,14 +46,52 @@ class Recipe(models.Model):
                                              'measurement_unit'))
     tags = models.ManyToManyField(Tag, through='TagRecipe')
     cooking_time = models.PositiveIntegerField()
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    # totals over the ingredients kept by recipes.nutrition, empty
+    # when some ingredient lacks the value
+    calories = models.FloatField(null=True, blank=True, editable=False)
+    proteins = models.FloatField(null=True, blank=True, editable=False)
+    fats = models.FloatField(null=True, blank=True, editable=False)
+    carbohydrates = models.FloatField(null=True, blank=True, editable=False)
+    cost = models.DecimalField(max_digits=12, decimal_places=2, null=True,
+                               blank=True, editable=False)
 
     class Meta:
         ordering = ('-id',)
+        indexes = [
+            # filtering and sorting the feed by the totals
+            models.Index(fields=['calories', 'id'],
+                         name='recipe_calories_idx'),
+            models.Index(fields=['cost', 'id'], name='recipe_cost_idx'),
+            # the descending sorts put empty totals last and need
+            # (total DESC NULLS LAST, id DESC), which SQLite cannot
+            # index: created on PostgreSQL by migration 0008
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeChange(models.Model):
+    """What an update of a recipe changed, one row per version."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               related_name='changes')
+    version = models.PositiveIntegerField()
+    changes = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('recipe', 'version')
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'version'],
+                                    name='unique_recipe_version'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} v{self.version}'
+
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
@@ -117,5 +164,53 @@ class TagRecipe(models.Model):
     tags = models.ForeignKey(Tag, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # covers the EXISTS probes of the recipe tag filter
+            models.Index(fields=['recipe', 'tags'],
+                         name='tagrecipe_recipe_tags_idx'),
+        ]
+
     def __str__(self):
         return f'{self.tags} {self.recipe}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of the ingredient set, kept by recipes.similarity."""
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE,
+                                  primary_key=True, related_name='signature')
+    signature = models.BinaryField()
+
+
+class RecipeBucket(models.Model):
+    """LSH bucket of one band of a recipe signature."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               related_name='buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            # candidate lookup reads recipe ids straight from the index
+            models.Index(fields=['band', 'bucket', 'recipe'],
+                         name='recipebucket_band_bucket_idx'),
+        ]
+
+
+class AuthorSuggestion(models.Model):
+    """Author to follow, kept by recipes.suggestions."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='author_suggestions')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='suggested_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    # how many of the authors the user follows follow this one
+    mutual = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # also the index the suggestions of a user are read by
+            models.UniqueConstraint(fields=['user', 'rank'],
+                                    name='unique_user_suggestion_rank'),
+        ]
@@ -0,0 +1,181 @@
+"""
+Pub/sub for push notifications.
+
+Views publish small JSON messages to named channels ("author:<id>"
+when an author publishes a recipe, "user:<id>" when a user follows or
+unfollows someone) and the SSE endpoint (recipes.sse) listens to them.
+The broker is chosen with NOTIFICATIONS_BROKER: LocalBroker delivers
+inside one process, which is enough for a single ASGI worker and for
+development; PostgresBroker carries messages between processes with
+LISTEN/NOTIFY.
+"""
+import json
+import logging
+import secrets
+import select
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('foodgram.notifications')
+
+PG_CHANNEL = 'foodgram_notifications'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def issue_ticket(user_id):
+    """
+    A random ticket that opens one notification stream for the user.
+    EventSource cannot send an Authorization header, so browsers put
+    the ticket in the query string; unlike the JWT it is worthless by
+    the time it reaches an access log.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(f'stream-ticket:{ticket}', user_id,
+              settings.NOTIFICATIONS_TICKET_TTL)
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """The user the ticket was issued to, once; None afterwards."""
+    key = f'stream-ticket:{ticket}'
+    user_id = cache.get(key)
+    # of two requests with the same ticket only one deletes it
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+class LocalBroker:
+    """
+    In-process broker. Listeners are called in the publishing thread
+    with the JSON payload and must not block.
+    """
+
+    def __init__(self):
+        self.listeners = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel, listener):
+        with self.lock:
+            self.listeners[channel].add(listener)
+
+    def unsubscribe(self, channel, listener):
+        with self.lock:
+            listeners = self.listeners.get(channel)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self.listeners[channel]
+
+    def publish(self, channel, message):
+        self.deliver(channel, json.dumps(message, ensure_ascii=False))
+
+    def deliver(self, channel, payload):
+        with self.lock:
+            listeners = list(self.listeners.get(channel, ()))
+        for listener in listeners:
+            try:
+                listener(channel, payload)
+            except Exception:
+                logger.exception('Notification listener failed')
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Publishes with pg_notify and delivers what a dedicated LISTEN
+    connection receives, so every process sees every message. The
+    listening connection needs a session, so NOTIFICATIONS_DB_HOST
+    must not point at pgbouncer in transaction mode.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listener_thread = None
+
+    def subscribe(self, channel, listener):
+        super().subscribe(channel, listener)
+        with self.lock:
+            if self.listener_thread is None:
+                self.listener_thread = threading.Thread(
+                    target=self.listen, name='notifications', daemon=True)
+                self.listener_thread.start()
+
+    def publish(self, channel, message):
+        payload = channel + '\n' + json.dumps(message, ensure_ascii=False)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [PG_CHANNEL, payload])
+
+    def connect(self):
+        import psycopg2
+
+        database = settings.DATABASES['default']
+        listen = psycopg2.connect(
+            dbname=database['NAME'], user=database['USER'],
+            password=database['PASSWORD'],
+            host=settings.NOTIFICATIONS_DB_HOST or database['HOST'],
+            port=database['PORT'])
+        listen.set_isolation_level(
+            psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with listen.cursor() as cursor:
+            cursor.execute(f'LISTEN {PG_CHANNEL}')
+        return listen
+
+    def listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                listen = self.connect()
+                while True:
+                    if select.select([listen], [], [], 60) == ([], [], []):
+                        continue
+                    listen.poll()
+                    while listen.notifies:
+                        channel, _, payload = listen.notifies.pop(
+                            0).payload.partition('\n')
+                        self.deliver(channel, payload)
+            except psycopg2.Error:
+                logger.exception('Notification listener lost its '
+                                 'connection, reconnecting')
+                threading.Event().wait(settings.NOTIFICATIONS_RETRY_DELAY)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.NOTIFICATIONS_BROKER)()
+    return _broker
+
+
+def publish(channel, message):
+    """Publish once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(channel, message))
+
+
+def recipe_published(recipe):
+    publish(author_channel(recipe.author_id), {
+        'type': 'recipe', 'id': recipe.pk, 'name': recipe.name,
+        'author': recipe.author_id})
+
+
+def following_changed(user_id, author_id, following):
+    publish(user_channel(user_id), {
+        'type': 'follow' if following else 'unfollow', 'author': author_id})
@@ -0,0 +1,129 @@
+"""
+Nutrition and cost totals of recipes.
+
+Ingredients carry calories, proteins, fats, carbohydrates and a price
+per measurement unit. Recipes store the totals over their ingredients
+in columns of their own, so the feed filters and sorts by them through
+indexes. refresh() recomputes the totals of many recipes with one
+grouped aggregate and one UPDATE instead of a query per recipe; it runs
+whenever the ingredients of a recipe or the values of an ingredient
+change. A total is empty when any ingredient of the recipe lacks it.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+NUTRIENTS = ('calories', 'proteins', 'fats', 'carbohydrates')
+# recipe column: ingredient column
+TOTALS = {**{name: name for name in NUTRIENTS}, 'cost': 'price'}
+BATCH_SIZE = 500
+
+REFRESH_SQL = '''
+    UPDATE {recipe} SET {assignments}
+    FROM (
+        SELECT r.id AS recipe_id, {totals}
+        FROM {recipe} r
+        LEFT JOIN {recipe_ingredient} ri ON ri.recipe_id = r.id
+        LEFT JOIN {ingredient} i ON i.id = ri.ingredient_id
+        {where}
+        GROUP BY r.id
+    ) totals
+    WHERE {recipe}.id = totals.recipe_id
+'''
+
+
+def _total(recipe_column, ingredient_column):
+    digits = 2 if recipe_column == 'cost' else 1
+    # PostgreSQL rounds to a number of digits only numeric, not float
+    total = (f'ROUND(CAST(SUM(ri.amount * i.{ingredient_column}) '
+             f'AS NUMERIC), {digits})')
+    # COUNT(*) is 1 for a recipe without ingredients, so it stays empty
+    return (f'CASE WHEN COUNT(i.{ingredient_column}) = COUNT(*) '
+            f'THEN {total} END AS {recipe_column}')
+
+
+def _execute(where='', params=()):
+    quote = connection.ops.quote_name
+    tables = {
+        'recipe': quote(Recipe._meta.db_table),
+        'recipe_ingredient': quote(RecipeIngredient._meta.db_table),
+        'ingredient': quote(Ingredient._meta.db_table)}
+    sql = REFRESH_SQL.format(
+        assignments=', '.join(
+            f'{column} = totals.{column}' for column in TOTALS),
+        totals=', '.join(
+            _total(column, source) for column, source in TOTALS.items()),
+        where=where.format(**tables), **tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def refresh(recipe_ids=None):
+    """Recompute the totals of the given recipes, or of all of them."""
+    if recipe_ids is None:
+        return _execute()
+    recipe_ids = list(recipe_ids)
+    updated = 0
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        updated += _execute(
+            'WHERE r.id IN ({})'.format(', '.join(['%s'] * len(batch))),
+            batch)
+    return updated
+
+
+def refresh_ingredients(ingredient_ids):
+    """Recompute the totals of recipes that use the given ingredients."""
+    ingredient_ids = list(ingredient_ids)
+    if not ingredient_ids:
+        return 0
+    if len(ingredient_ids) > BATCH_SIZE:
+        # most recipes are affected anyway, one pass over all is cheaper
+        # than visiting them once per batch
+        return refresh()
+    return _execute(
+        'WHERE r.id IN (SELECT recipe_id FROM {{recipe_ingredient}} '
+        'WHERE ingredient_id IN ({}))'.format(
+            ', '.join(['%s'] * len(ingredient_ids))),
+        ingredient_ids)
+
+
+def _number(value, convert):
+    value = value.strip()
+    return convert(value.replace(',', '.')) if value else None
+
+
+def load_csv(file):
+    """
+    Set ingredient values from CSV rows with the columns name,
+    measurement_unit, calories, proteins, fats, carbohydrates and
+    price. Returns the ids of the ingredients that changed and the
+    rows that matched no ingredient.
+    """
+    ingredients = {
+        (ingredient.name, ingredient.measurement_unit): ingredient
+        for ingredient in Ingredient.objects.only(
+            'id', 'name', 'measurement_unit', 'price', *NUTRIENTS)}
+    changed, unknown = [], []
+    for row in csv.DictReader(file):
+        ingredient = ingredients.get((row['name'], row['measurement_unit']))
+        if ingredient is None:
+            unknown.append(row)
+            continue
+        try:
+            values = {name: _number(row[name], float) for name in NUTRIENTS}
+            values['price'] = _number(row['price'], Decimal)
+        except (ValueError, InvalidOperation):
+            raise ValueError(f'Bad number in the row of {row["name"]}')
+        if any(getattr(ingredient, name) != value
+               for name, value in values.items()):
+            for name, value in values.items():
+                setattr(ingredient, name, value)
+            changed.append(ingredient)
+    Ingredient.objects.bulk_update(changed, [*NUTRIENTS, 'price'],
+                                   batch_size=BATCH_SIZE)
+    return [ingredient.pk for ingredient in changed], unknown
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Ingredient, Tag
+
+VERSION_KEY = 'reference_data_version'
+
+
+class TagRecord:
+    __slots__ = ('id', 'name', 'color', 'slug')
+
+    def __init__(self, id, name, color, slug):
+        self.id = id
+        self.name = name
+        self.color = color
+        self.slug = slug
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name,
+                'color': self.color, 'slug': self.slug}
+
+
+class IngredientRecord:
+    __slots__ = ('id', 'name', 'measurement_unit')
+
+    def __init__(self, id, name, measurement_unit):
+        self.id = id
+        self.name = name
+        self.measurement_unit = measurement_unit
+
+
+class ReferenceData:
+    """
+    Process-local snapshot of tags and ingredients.
+    Workers compare their snapshot against a version key kept
+    in the shared cache and reload it when the key changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tags = {}
+        self._ingredients = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _shared_version():
+        return cache.get(VERSION_KEY, 0)
+
+    def load(self, version=None):
+        if version is None:
+            version = self._shared_version()
+        tags = {
+            row[0]: TagRecord(*row)
+            for row in Tag.objects.values_list(
+                'id', 'name', 'color', 'slug')}
+        ingredients = {
+            row[0]: IngredientRecord(*row)
+            for row in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')}
+        with self._lock:
+            self._tags = tags
+            self._ingredients = ingredients
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        interval = settings.REFERENCE_DATA_CHECK_INTERVAL
+        if self._version is not None and now - self._checked_at < interval:
+            return
+        version = self._shared_version()
+        self._checked_at = now
+        if version != self._version:
+            self.load(version)
+
+    def invalidate(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, timeout=None)
+        self._version = None
+
+    def _lookup(self, attr, pk):
+        self.ensure_fresh()
+        record = getattr(self, attr).get(pk)
+        if record is None:
+            # Row may have been added by another worker before
+            # the version change reached this one.
+            self.load()
+            record = getattr(self, attr).get(pk)
+        return record
+
+    def tag(self, pk):
+        return self._lookup('_tags', pk)
+
+    def ingredient(self, pk):
+        return self._lookup('_ingredients', pk)
+
+    def tags(self):
+        self.ensure_fresh()
+        return list(self._tags.values())
+
+    def ingredients(self):
+        self.ensure_fresh()
+        return list(self._ingredients.values())
+
+
+reference_data = ReferenceData()
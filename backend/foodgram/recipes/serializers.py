@@ -1,11 +1,14 @@
 from drf_base64.fields import Base64ImageField
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Subscribe, Tag, TagRecipe)
+from recipes.reference import reference_data
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import User
 from users.serializers import CustomUserSerializer
 
+from .fieldsets import SparseFieldsMixin
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -48,9 +51,36 @@ class RecipeIngredientDetailSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def to_representation(self, instance):
+        ingredient = reference_data.ingredient(instance.ingredient_id)
+        if ingredient is None:
+            return super().to_representation(instance)
+        return {'id': ingredient.id,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+                'amount': instance.amount}
+
+
+class TagRecipeSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='tags.id')
+    name = serializers.ReadOnlyField(source='tags.name')
+    color = serializers.ReadOnlyField(source='tags.color')
+    slug = serializers.ReadOnlyField(source='tags.slug')
+
+    class Meta:
+        model = TagRecipe
+        fields = ('id', 'name', 'color', 'slug',)
+
+    def to_representation(self, instance):
+        tag = reference_data.tag(instance.tags_id)
+        if tag is None:
+            return super().to_representation(instance)
+        return tag.as_dict()
+
 
 class RecipeListSerializer(serializers.ModelSerializer):
-    tags = TagSerializer(many=True)
+    tags = TagRecipeSerializer(
+        many=True, read_only=True, source='tagrecipe_set')
     author = CustomUserSerializer(
         read_only=True)
     ingredients = RecipeIngredientDetailSerializer(
@@ -62,7 +92,8 @@ class RecipeListSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'text', 'cooking_time', 'calories',
+                  'proteins', 'fats', 'carbohydrates', 'cost')
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
@@ -77,17 +108,6 @@ class RecipeListSerializer(serializers.ModelSerializer):
         return obj.shopping_carts.filter(user=request.user).exists()
 
 
-class TagRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='tags.id')
-    name = serializers.ReadOnlyField(source='tags.name')
-    color = serializers.ReadOnlyField(source='tags.color')
-    slug = serializers.ReadOnlyField(source='tags.slug')
-
-    class Meta:
-        model = TagRecipe
-        fields = ('id', 'name', 'color', 'slug',)
-
-
 class RecipeIngredientDetailCreateSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source='ingredient.id')
     amount = serializers.IntegerField()
@@ -111,7 +131,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time',)
+                  'image', 'text', 'cooking_time', 'calories', 'proteins',
+                  'fats', 'carbohydrates', 'cost')
 
     def validate_image(self, value):
         if not value:
@@ -219,11 +240,13 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return data
 
 
-class SubscribeListSerializer(CustomUserSerializer):
+class SubscribeListSerializer(SparseFieldsMixin, CustomUserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_total'):
+            return obj.recipes_total
         return obj.recipes.count()
 
     def get_recipes(self, obj):
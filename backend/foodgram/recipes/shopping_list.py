@@ -0,0 +1,105 @@
+"""
+Shopping list aggregation and PDF export.
+
+PDFs are stored under a name derived from a hash of the aggregated
+cart, so identical carts share one file and a new render happens
+only when the cart content changes.
+"""
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q, Sum
+from foodgram import singleflight
+from recipes.models import Recipe, RecipeIngredient, ShoppingCart
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_DIR = 'shopping_lists/'
+FONT_NAME = 'ShoppingList'
+MARGIN = 50
+LINE_HEIGHT = 18
+
+
+def aggregate(user):
+    return [
+        (row['ingredient__name'], row['ingredient__measurement_unit'],
+         row['amount'])
+        for row in RecipeIngredient.objects.filter(
+            recipe__shopping_carts__user=user).order_by(
+            'ingredient__name').values(
+            'ingredient__name', 'ingredient__measurement_unit').annotate(
+            amount=Sum('amount'))]
+
+
+def totals(user):
+    """
+    Calories and cost of the cart from the stored recipe totals, None
+    when a recipe in it lacks them.
+    """
+    result = Recipe.objects.filter(shopping_carts__user=user).aggregate(
+        unknown=Count('pk', filter=Q(calories__isnull=True)
+                      | Q(cost__isnull=True)),
+        total_calories=Sum('calories'), total_cost=Sum('cost'))
+    if result['unknown']:
+        return None
+    return {'calories': result['total_calories'],
+            'cost': result['total_cost']}
+
+
+def cart(user):
+    """
+    Aggregated rows and totals of the cart of `user`, cached until a
+    recipe is added, removed or edited.
+    """
+    recipes = list(ShoppingCart.objects.filter(user=user).order_by(
+        'recipe_id').values_list('recipe_id', 'recipe__version'))
+    return singleflight.cached(
+        'shopping_list', f'{user.pk}:{digest(recipes)}',
+        lambda: (aggregate(user), totals(user)))
+
+
+def digest(rows):
+    content = json.dumps(rows, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def pdf_name(cart_digest):
+    return f'{PDF_DIR}{cart_digest}.pdf'
+
+
+def render_pdf(rows):
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(FONT_NAME, settings.SHOPPING_LIST_FONT))
+    buffer = io.BytesIO()
+    # invariant=1 keeps the output byte-stable for the same rows
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+    pdf.setTitle('Shopping list')
+    pdf.setFont(FONT_NAME, 16)
+    pdf.drawString(MARGIN, height - MARGIN, 'Shopping list')
+    pdf.setFont(FONT_NAME, 12)
+    y = height - MARGIN - 2 * LINE_HEIGHT
+    for name, measurement_unit, amount in rows:
+        if y < MARGIN:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, 12)
+            y = height - MARGIN
+        pdf.drawString(MARGIN, y, f'□ {name} ({measurement_unit}) - {amount}')
+        y -= LINE_HEIGHT
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def store_pdf(rows):
+    name = pdf_name(digest(rows))
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(render_pdf(rows)))
+    return name
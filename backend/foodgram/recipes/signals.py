@@ -0,0 +1,16 @@
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.db import check_connections
+from recipes.models import Ingredient, Tag
+from recipes.reference import reference_data
+
+request_started.connect(check_connections)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_reference_data(sender, **kwargs):
+    reference_data.invalidate()
@@ -0,0 +1,194 @@
+"""
+Similar recipes by their ingredient sets.
+
+Every recipe gets a MinHash signature of its ingredient ids: for each
+of PERMUTATIONS hash functions the smallest hash over the ingredients.
+Two recipes agree on a position with probability equal to the Jaccard
+similarity of their ingredient sets. The signature is cut into BANDS
+bands of ROWS values and every band is stored as a bucket key
+(locality-sensitive hashing): recipes sharing a bucket are candidates,
+found through an index instead of comparing against every recipe.
+With 20 bands of 3 rows pairs above 0.5 similarity become candidates
+with probability over 0.9, pairs below 0.1 in 2% of cases. Candidates are
+ranked by their exact Jaccard similarity.
+
+Signatures are computed with numpy for whole batches of recipes and
+refreshed whenever the ingredients of a recipe change.
+"""
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .db import insert_rows
+from .models import RecipeBucket, RecipeIngredient, RecipeSignature
+
+BANDS = 20
+ROWS = 3
+PERMUTATIONS = BANDS * ROWS
+BATCH_SIZE = 2000
+# (a * x + b) mod PRIME, ingredient ids must stay below it
+PRIME = np.uint64(2 ** 31 - 1)
+_random = np.random.default_rng(4242)
+A = _random.integers(1, int(PRIME), PERMUTATIONS, dtype=np.uint64)
+B = _random.integers(0, int(PRIME), PERMUTATIONS, dtype=np.uint64)
+# odd multiplier folding the rows of a band into one 64-bit key
+MIX = np.uint64(0x9E3779B97F4A7C15)
+# candidates sharing the most bands that get an exact comparison
+CANDIDATES = 200
+MIN_SIMILARITY = 0.4
+LIMIT = 6
+
+
+def minhash(recipes, ingredients):
+    """
+    Signatures from (recipe id, ingredient id) pairs given as two arrays
+    sorted by recipe id. Returns the recipe ids and a uint32 array with
+    a row of PERMUTATIONS values per recipe.
+    """
+    ids, starts = np.unique(recipes, return_index=True)
+    hashes = (ingredients.astype(np.uint64)[:, None] * A + B) % PRIME
+    return ids, np.minimum.reduceat(hashes, starts, axis=0).astype(np.uint32)
+
+
+def bucket_keys(signatures):
+    """int64 bucket keys, a row of BANDS per signature."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(
+        np.uint64)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    for row in range(ROWS):
+        # wraps around modulo 2 ** 64 on purpose
+        keys = keys * MIX + bands[:, :, row]
+    return keys.view(np.int64)
+
+
+def signatures_of(recipe_ids):
+    rows = np.array(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).order_by(
+            'recipe_id').values_list('recipe_id', 'ingredient_id'),
+        dtype=np.int64).reshape(-1, 2)
+    if not len(rows):
+        return np.empty(0, np.int64), np.empty((0, PERMUTATIONS), np.uint32)
+    return minhash(rows[:, 0], rows[:, 1])
+
+
+def _store(ids, signatures):
+    ids = ids.tolist()
+    if connection.vendor == 'postgresql':
+        # bytea in its hex text form, for COPY
+        values = [f'\\x{signature.tobytes().hex()}'
+                  for signature in signatures]
+    else:
+        values = [signature.tobytes() for signature in signatures]
+    insert_rows(RecipeSignature, ('recipe', 'signature'),
+                list(zip(ids, values)))
+    insert_rows(RecipeBucket, ('recipe', 'band', 'bucket'), [
+        (pk, band, key)
+        for pk, row in zip(ids, bucket_keys(signatures).tolist())
+        for band, key in enumerate(row)])
+
+
+def refresh(recipe_ids):
+    """Recompute the signatures and buckets of the given recipes."""
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        ids, signatures = signatures_of(batch)
+        with transaction.atomic():
+            RecipeBucket.objects.filter(recipe_id__in=batch).delete()
+            RecipeSignature.objects.filter(recipe_id__in=batch).delete()
+            _store(ids, signatures)
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Recompute everything, yields the number of recipes per batch."""
+    RecipeBucket.objects.all().delete()
+    RecipeSignature.objects.all().delete()
+    last = 0
+    while True:
+        batch = list(RecipeIngredient.objects.filter(
+            recipe_id__gt=last).order_by('recipe_id').values_list(
+            'recipe_id', flat=True).distinct()[:batch_size])
+        if not batch:
+            return
+        ids, signatures = signatures_of(batch)
+        with transaction.atomic():
+            _store(ids, signatures)
+        last = batch[-1]
+        yield len(ids)
+
+
+def ingredient_sets(recipe_ids):
+    sets = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).values_list(
+            'recipe_id', 'ingredient_id'):
+        sets.setdefault(recipe_id, set()).add(ingredient_id)
+    return sets
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+def similar(recipe_id, limit=LIMIT, min_similarity=MIN_SIMILARITY):
+    """[(recipe id, Jaccard similarity)] of the closest recipes."""
+    buckets = Q()
+    for band, bucket in RecipeBucket.objects.filter(
+            recipe_id=recipe_id).values_list('band', 'bucket'):
+        buckets |= Q(band=band, bucket=bucket)
+    if not buckets:
+        return []
+    candidates = list(RecipeBucket.objects.filter(buckets).exclude(
+        recipe_id=recipe_id).values('recipe_id').annotate(
+        shared=Count('id')).order_by('-shared', 'recipe_id').values_list(
+        'recipe_id', flat=True)[:CANDIDATES])
+    sets = ingredient_sets([recipe_id, *candidates])
+    own = sets.get(recipe_id, set())
+    scored = sorted(
+        (-jaccard(own, sets[pk]), pk) for pk in candidates if pk in sets)
+    return [(pk, -score) for score, pk in scored
+            if -score >= min_similarity][:limit]
+
+
+def duplicate_pairs(ids, signatures, threshold, max_bucket=1000):
+    """
+    Candidate pairs sharing a bucket whose signatures agree on at least
+    `threshold` of the positions, as (first id, second id, estimate).
+    Buckets larger than `max_bucket` are skipped. Returns the pairs and
+    the number of skipped buckets.
+    """
+    keys = bucket_keys(signatures)
+    pairs, skipped = set(), 0
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind='stable')
+        column = keys[order, band]
+        starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+        sizes = np.diff(np.r_[starts, len(column)])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            if size > max_bucket:
+                skipped += 1
+                continue
+            members = order[start:start + size]
+            first, second = np.triu_indices(size, 1)
+            pairs.update(zip(members[first].tolist(),
+                             members[second].tolist()))
+    if not pairs:
+        return [], skipped
+    first, second = np.array(sorted(pairs)).T
+    estimates = (signatures[first] == signatures[second]).mean(axis=1)
+    keep = estimates >= threshold
+    return (list(zip(ids[first[keep]].tolist(), ids[second[keep]].tolist(),
+                     estimates[keep].tolist())), skipped)
+
+
+def load_signatures():
+    """All stored signatures as (recipe ids, uint32 array)."""
+    rows = RecipeSignature.objects.order_by('recipe_id').values_list(
+        'recipe_id', 'signature')
+    ids, signatures = [], []
+    for recipe_id, signature in rows.iterator(chunk_size=BATCH_SIZE):
+        ids.append(recipe_id)
+        signatures.append(bytes(signature))
+    return (np.array(ids, dtype=np.int64),
+            np.frombuffer(b''.join(signatures), dtype=np.uint32).reshape(
+                -1, PERMUTATIONS))
@@ -0,0 +1,267 @@
+"""
+Server-sent events about new recipes of followed authors.
+
+This is a plain ASGI application that foodgram.asgi mounts in front
+of Django, because Django 3.2 cannot stream a response from async
+code. One Hub per process subscribes to the broker channels on behalf
+of all open connections and fans messages out inside the event loop,
+so each frame is encoded once however many followers receive it.
+
+Every connection buffers at most NOTIFICATIONS_QUEUE_SIZE frames and
+NOTIFICATIONS_MAX_BYTES bytes. Sending waits for the client socket,
+so a client that falls behind fills its buffer, gets an "overflow"
+event and is disconnected; it catches up by reconnecting with
+Last-Event-ID, which replays the recipes it missed.
+
+Clients authenticate with the Authorization header or, since
+EventSource cannot send one, with a single-use ticket from
+POST /api/notifications/ticket/ in ?ticket=. A browser that lost its
+stream asks for a new ticket and passes ?last_event_id= instead of the
+header.
+"""
+import asyncio
+import json
+from collections import defaultdict, deque
+from functools import partial
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from recipes.models import Recipe, Subscribe
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import notifications
+from .notifications import author_channel, get_broker, user_channel
+
+PATH = '/api/notifications/'
+OVERFLOW = b'event: overflow\ndata: {}\n\n'
+PING = b': ping\n\n'
+
+
+def recipe_frame(recipe_id, payload):
+    return b'id: %d\nevent: recipe\ndata: %s\n\n' % (
+        recipe_id, payload.encode())
+
+
+class Connection:
+    __slots__ = ('user_id', 'channels', 'frames', 'size', 'overflowed',
+                 'closed', 'wakeup')
+
+    def __init__(self, user_id, authors):
+        self.user_id = user_id
+        self.channels = {user_channel(user_id)} | {
+            author_channel(author) for author in authors}
+        self.frames = deque()
+        self.size = 0
+        self.overflowed = False
+        self.closed = False
+        self.wakeup = asyncio.Event()
+
+    def push(self, frame):
+        if self.overflowed:
+            return
+        if (len(self.frames) >= settings.NOTIFICATIONS_QUEUE_SIZE
+                or self.size + len(frame) > settings.NOTIFICATIONS_MAX_BYTES):
+            # drop the backlog instead of letting it grow
+            self.overflowed = True
+            self.frames.clear()
+            self.size = 0
+        else:
+            self.frames.append(frame)
+            self.size += len(frame)
+        self.wakeup.set()
+
+    def take(self):
+        body = b''.join(self.frames)
+        self.frames.clear()
+        self.size = 0
+        return body
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+
+class Hub:
+    def __init__(self):
+        self.connections = defaultdict(set)
+        self.loop = None
+
+    def add(self, connection, channel):
+        connections = self.connections[channel]
+        if not connections:
+            get_broker().subscribe(channel, self.dispatch)
+        connections.add(connection)
+
+    def remove(self, connection, channel):
+        connections = self.connections.get(channel)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.connections[channel]
+            get_broker().unsubscribe(channel, self.dispatch)
+
+    def open(self, connection):
+        self.loop = asyncio.get_running_loop()
+        for channel in connection.channels:
+            self.add(connection, channel)
+
+    def close(self, connection):
+        for channel in connection.channels:
+            self.remove(connection, channel)
+
+    def dispatch(self, channel, payload):
+        # called by the broker, possibly from another thread
+        self.loop.call_soon_threadsafe(self.fan_out, channel, payload)
+
+    def fan_out(self, channel, payload):
+        connections = list(self.connections.get(channel, ()))
+        if not connections:
+            return
+        message = json.loads(payload)
+        if message['type'] == 'recipe':
+            frame = recipe_frame(message['id'], payload)
+            for connection in connections:
+                connection.push(frame)
+            return
+        # a user followed or unfollowed an author
+        channel = author_channel(message['author'])
+        for connection in connections:
+            if message['type'] == 'follow':
+                connection.channels.add(channel)
+                self.add(connection, channel)
+            else:
+                connection.channels.discard(channel)
+                self.remove(connection, channel)
+
+
+hub = Hub()
+
+
+def db_call(func):
+    def inner(*args):
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+@db_call
+def authenticate(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(
+            authentication.get_validated_token(raw_token)).pk
+    except AuthenticationFailed:
+        return None
+
+
+redeem_ticket = sync_to_async(notifications.redeem_ticket,
+                              thread_sensitive=False)
+
+
+@db_call
+def followed_authors(user_id):
+    return list(Subscribe.objects.filter(user=user_id).values_list(
+        'following_id', flat=True))
+
+
+@db_call
+def missed_recipes(authors, last_event_id):
+    return [
+        recipe_frame(recipe['id'], json.dumps({
+            'type': 'recipe', 'id': recipe['id'], 'name': recipe['name'],
+            'author': recipe['author_id']}, ensure_ascii=False))
+        for recipe in Recipe.objects.filter(
+            author__in=authors, pk__gt=last_event_id).order_by('pk').values(
+            'id', 'name', 'author_id')[:settings.NOTIFICATIONS_QUEUE_SIZE]]
+
+
+async def wait_disconnect(receive, connection):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    connection.close()
+
+
+async def serve(connection, send, receive, replay=None):
+    """
+    Stream frames to one client until it disconnects. `replay` returns
+    the frames missed since the last connection; it runs once the
+    connection listens, so nothing published in between is lost.
+    """
+    loop = asyncio.get_running_loop()
+    hub.open(connection)
+    watcher = loop.create_task(wait_disconnect(receive, connection))
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        if replay is not None:
+            await send({'type': 'http.response.body',
+                        'body': b''.join(await replay()),
+                        'more_body': True})
+        while True:
+            if not connection.frames and not connection.overflowed:
+                heartbeat = loop.call_later(
+                    settings.NOTIFICATIONS_HEARTBEAT, connection.wakeup.set)
+                await connection.wakeup.wait()
+                heartbeat.cancel()
+            connection.wakeup.clear()
+            if connection.closed:
+                break
+            if connection.overflowed:
+                await send({'type': 'http.response.body', 'body': OVERFLOW})
+                break
+            await send({'type': 'http.response.body',
+                        'body': connection.take() or PING,
+                        'more_body': True})
+    finally:
+        hub.close(connection)
+        watcher.cancel()
+
+
+async def respond(send, status, detail):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body',
+                'body': json.dumps({'detail': detail}).encode()})
+
+
+def raw_token(scope):
+    headers = dict(scope['headers'])
+    header = headers.get(b'authorization', b'').decode('latin1').split()
+    if len(header) == 2 and header[0] in settings.SIMPLE_JWT[
+            'AUTH_HEADER_TYPES']:
+        return header[1]
+    return None
+
+
+async def application(scope, receive, send):
+    if scope['method'] != 'GET':
+        return await respond(send, 405, 'Method not allowed.')
+    query = parse_qs(scope['query_string'].decode())
+    token = raw_token(scope)
+    # EventSource cannot send headers, so browsers come with a ticket
+    ticket = query.get('ticket', [None])[0]
+    user_id = None
+    if token:
+        user_id = await authenticate(token)
+    elif ticket:
+        user_id = await redeem_ticket(ticket)
+    if user_id is None:
+        return await respond(
+            send, 401, 'Authentication credentials were not provided.')
+    authors = await followed_authors(user_id)
+    # a new EventSource cannot set Last-Event-ID either
+    headers = dict(scope['headers'])
+    last_event_id = (headers.get(b'last-event-id', b'').decode('latin1')
+                     or query.get('last_event_id', [''])[0])
+    replay = None
+    if last_event_id.isdigit() and authors:
+        replay = partial(missed_recipes, authors, int(last_event_id))
+    await serve(Connection(user_id, authors), send, receive, replay)
@@ -0,0 +1,27 @@
+from tasks.queue import task
+
+from . import nutrition
+from .models import Recipe
+from .shopping_list import store_pdf
+
+
+@task()
+def render_shopping_list_pdf(rows):
+    store_pdf(rows)
+
+
+@task()
+def remove_unused_images(names):
+    """Delete image files that no recipe points to any more."""
+    storage = Recipe._meta.get_field('image').storage
+    used = set(Recipe.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+    for name in names:
+        if name not in used:
+            storage.delete(name)
+
+
+@task()
+def refresh_nutrition(ingredients):
+    """Recompute recipe totals after ingredient values changed."""
+    nutrition.refresh_ingredients(ingredients)
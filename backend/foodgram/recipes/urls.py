@@ -1,13 +1,14 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
-from recipes.views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
+from recipes.views import (FavoriteViewSet, IngredientViewSet,
+                           NotificationTicketView, RecipeViewSet,
                            SubscribeListViewSet, SubscribeViewSet, TagViewSet)
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
-from users.views import (CustomTokenObtainPairView, CustomUserMeViewSet,
-                         CustomUserUpdateViewSet, CustomUserViewSet,
-                         ResetTokenAPIView)
+from users.views import (AuthorSuggestionListView, CustomTokenObtainPairView,
+                         CustomUserMeViewSet, CustomUserUpdateViewSet,
+                         CustomUserViewSet, ResetTokenAPIView)
 
 app_name = 'api'
 
@@ -32,15 +33,33 @@ urlpatterns = [
     path('users/subscriptions/',
          SubscribeListViewSet.as_view({'get': 'subscriptions'}),
          name='subscriptions'),
+    path('users/suggestions/', AuthorSuggestionListView.as_view(),
+         name='suggestions'),
     path('users/<int:id>/subscribe/',
          SubscribeViewSet.as_view({'post': 'subscribe',
                                    'delete': 'unsubscribe'}),
          name='subscribe'),
+    path('notifications/ticket/', NotificationTicketView.as_view(),
+         name='notification_ticket'),
     path('recipes/<int:id>/favorite/',
          FavoriteViewSet.as_view({'post': 'add_favorite',
                                   'delete': 'del_favorite'}),
          name='favorite'),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    from recipes import async_views
+
+    urlpatterns += [
+        path('tags/', async_views.tags, name='tags-list'),
+        path('ingredients/', async_views.ingredients,
+             name='ingredients-list'),
+        path('recipes/', async_views.recipes, name='recipes-list'),
+        path('recipes/<int:pk>/', async_views.recipe_detail,
+             name='recipes-detail'),
+    ]
 
+urlpatterns += [
     path('', include(router.urls)),
 ]
 
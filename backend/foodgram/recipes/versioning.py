@@ -0,0 +1,162 @@
+"""
+Recipe writes as minimal diffs.
+
+Ingredients and tags from a request are compared with the stored rows
+and only the rows that differ are inserted, updated or deleted. An
+update that changes anything bumps Recipe.version and appends a
+RecipeChange, so whatever is derived from a recipe can tell by the
+version whether it is stale. Nutrition totals and similarity signatures
+are recomputed only when the ingredients changed.
+"""
+from django.db import transaction
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+
+from . import nutrition, similarity
+from .models import (Ingredient, Recipe, RecipeChange, RecipeIngredient, Tag,
+                     TagRecipe)
+
+
+def ingredient_amounts(data):
+    """{ingredient id: amount} from request data, repeated ids summed."""
+    amounts = {}
+    try:
+        for item in data:
+            pk, amount = int(item['id']), int(item['amount'])
+            if amount < 1:
+                raise ValidationError(
+                    {'ingredients': 'Amount cannot be less than 1.'})
+            amounts[pk] = amounts.get(pk, 0) + amount
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError(
+            {'ingredients': 'Each ingredient needs an id and an amount.'})
+    if Ingredient.objects.filter(pk__in=amounts).count() != len(amounts):
+        raise Http404('No Ingredient matches the given query.')
+    return amounts
+
+
+def tag_ids(data):
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in data))
+    except (TypeError, ValueError):
+        raise ValidationError({'tags': 'Tags must be a list of ids.'})
+    if Tag.objects.filter(pk__in=ids).count() != len(ids):
+        raise Http404('No Tag matches the given query.')
+    return ids
+
+
+def diff_ingredients(recipe, amounts):
+    current = {}
+    stale = []
+    for row in RecipeIngredient.objects.filter(recipe=recipe).order_by('id'):
+        if row.ingredient_id in current:
+            # a repeated ingredient left by older versions
+            stale.append(row.pk)
+            current[row.ingredient_id].amount = None
+        else:
+            current[row.ingredient_id] = row
+    removed = [pk for pk in current if pk not in amounts]
+    updated = [row for pk, row in current.items()
+               if pk in amounts and row.amount != amounts[pk]]
+    added = [pk for pk in amounts if pk not in current]
+    stale.extend(current[pk].pk for pk in removed)
+    if stale:
+        RecipeIngredient.objects.filter(pk__in=stale).delete()
+    for row in updated:
+        row.amount = amounts[row.ingredient_id]
+    RecipeIngredient.objects.bulk_update(updated, ['amount'])
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient_id=pk, amount=amounts[pk])
+        for pk in added)
+    changes = {}
+    if added:
+        changes['added'] = {str(pk): amounts[pk] for pk in added}
+    if updated:
+        changes['updated'] = {str(row.ingredient_id): row.amount
+                              for row in updated}
+    if removed:
+        changes['removed'] = removed
+    return changes
+
+
+def diff_tags(recipe, ids):
+    current = {}
+    stale = []
+    for row in TagRecipe.objects.filter(recipe=recipe).order_by('id'):
+        if row.tags_id in current:
+            stale.append(row.pk)
+        else:
+            current[row.tags_id] = row.pk
+    removed = [pk for pk in current if pk not in ids]
+    added = [pk for pk in ids if pk not in current]
+    stale.extend(current[pk] for pk in removed)
+    if stale:
+        TagRecipe.objects.filter(pk__in=stale).delete()
+    TagRecipe.objects.bulk_create(
+        TagRecipe(recipe=recipe, tags_id=pk) for pk in added)
+    changes = {}
+    if added:
+        changes['added'] = added
+    if removed:
+        changes['removed'] = removed
+    return changes
+
+
+def create_recipe(serializer, data, **kwargs):
+    amounts = ingredient_amounts(data.get('ingredients', []))
+    ids = tag_ids(data.get('tags', []))
+    with transaction.atomic():
+        recipe = serializer.save(**kwargs)
+        diff_ingredients(recipe, amounts)
+        diff_tags(recipe, ids)
+        nutrition.refresh([recipe.pk])
+        similarity.refresh([recipe.pk])
+        recipe.refresh_from_db(fields=nutrition.TOTALS)
+    return recipe
+
+
+def update_recipe(serializer, data):
+    """
+    Apply an update and record it. Returns the RecipeChange, or None
+    when the request matches what is stored.
+    """
+    recipe = serializer.instance
+    amounts = (ingredient_amounts(data['ingredients'])
+               if 'ingredients' in data else None)
+    ids = tag_ids(data['tags']) if 'tags' in data else None
+    with transaction.atomic():
+        # the row lock orders concurrent updates of one recipe
+        current = Recipe.objects.select_for_update().values(
+            'version', *nutrition.TOTALS).get(pk=recipe.pk)
+        version = current.pop('version')
+        # saving the instance writes the totals back, keep them current
+        for name, value in current.items():
+            setattr(recipe, name, value)
+        changes = {}
+        # a new image upload is always a change
+        fields = sorted(
+            name for name, value in serializer.validated_data.items()
+            if name == 'image' or getattr(recipe, name) != value)
+        if fields:
+            changes['fields'] = fields
+        if amounts is not None:
+            ingredients = diff_ingredients(recipe, amounts)
+            if ingredients:
+                changes['ingredients'] = ingredients
+                nutrition.refresh([recipe.pk])
+                similarity.refresh([recipe.pk])
+                recipe.refresh_from_db(fields=nutrition.TOTALS)
+        if ids is not None:
+            tags = diff_tags(recipe, ids)
+            if tags:
+                changes['tags'] = tags
+        if not changes:
+            return None
+        version += 1
+        if fields:
+            serializer.save(version=version)
+        else:
+            recipe.version = version
+            recipe.save(update_fields=['version', 'updated_at'])
+        return RecipeChange.objects.create(
+            recipe=recipe, version=version, changes=changes)
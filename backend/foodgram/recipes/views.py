@@ -1,16 +1,27 @@
-from django.db.models import Sum
+from django.core.files.storage import default_storage
+from django.db.models import Count, Prefetch
 from django.http.response import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Subscribe, Tag, TagRecipe)
+from foodgram import singleflight
+from foodgram.idempotency import IdempotencyMixin
+from foodgram.loadshedding import ConcurrencyLimitMixin
+from foodgram.metrics import timer
+from foodgram.storage import file_response
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            Subscribe, Tag)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.models import User
 
+from . import (constants, deletion, feed, fieldsets, notifications,
+               shopping_list, similarity, versioning)
+from .db import StatementTimeoutMixin
 from .filters import IngredientFilter, RecipeFilter
 from .paginations import CustomPagination
 from .permissions import AdminOrAuthorOrReadOnly
@@ -18,32 +29,55 @@ from .serializers import (FavoriteSerializer, IngredientListSerializer,
                           RecipeListSerializer, RecipeSerializer,
                           ShoppingCartSerializer, SubscribeListSerializer,
                           SubscribeSerializer, TagSerializer)
+from .tasks import render_shopping_list_pdf
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(StatementTimeoutMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class SubscribeListViewSet(viewsets.ModelViewSet):
+class SubscribeListViewSet(ConcurrencyLimitMixin, StatementTimeoutMixin,
+                           viewsets.ModelViewSet):
     serializer_class = SubscribeListSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = CustomPagination
+    statement_timeout = 'aggregate'
+    action_concurrency_limits = {'subscriptions': 'subscriptions'}
 
     @action(detail=False, methods=['GET'],)
     def subscriptions(self, request):
-        queryset = User.objects.filter(
-            following__user=request.user).prefetch_related('follower__recipes')
+        scope = f'subscriptions:{request.user.pk}'
+        key = (f'{request.user.pk}:{singleflight.generation(scope)}:'
+               f'{request.build_absolute_uri()}')
+        return Response(singleflight.cached(
+            'subscriptions', key, lambda: self.subscriptions_page(request)))
+
+    def subscriptions_page(self, request):
+        fields = fieldsets.requested(request, [
+            name for name, field in self.get_serializer().fields.items()
+            if not field.write_only])
+        queryset = User.objects.filter(following__user=request.user)
+        if 'recipes' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipes', Recipe.objects.only(
+                    'id', 'name', 'image', 'cooking_time', 'author_id')))
+        if 'recipes_count' in fields:
+            queryset = queryset.annotate(recipes_total=Count('recipes'))
         pages = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(pages, many=True)
-        return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(pages, many=True, context={
+            **self.get_serializer_context(), 'fields': fields})
+        with timer('serialize'):
+            data = serializer.data
+        return self.get_paginated_response(data).data
 
 
-class SubscribeViewSet(viewsets.GenericViewSet):
+class SubscribeViewSet(IdempotencyMixin, viewsets.GenericViewSet):
     serializer_class = SubscribeSerializer
     permission_classes = [IsAuthenticated]
+    idempotent_actions = ('subscribe', 'unsubscribe')
 
     def get_queryset(self):
         user_id = self.kwargs['id']
@@ -58,6 +92,8 @@ class SubscribeViewSet(viewsets.GenericViewSet):
         serializer = self.serializer_class(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        singleflight.invalidate(f'subscriptions:{user.id}')
+        notifications.following_changed(user.id, int(user_id), True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['DELETE'])
@@ -67,15 +103,23 @@ class SubscribeViewSet(viewsets.GenericViewSet):
         subscription = get_object_or_404(Subscribe, user=user,
                                          following_id=user_id)
         subscription.delete()
+        singleflight.invalidate(f'subscriptions:{user.id}')
+        notifications.following_changed(user.id, int(user_id), False)
         return Response({'message': 'Unsubscribed successfully'})
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(IdempotencyMixin, ConcurrencyLimitMixin,
+                    StatementTimeoutMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [AdminOrAuthorOrReadOnly]
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    action_statement_timeouts = {'download_shopping_cart': 'aggregate'}
+    action_throttle_scopes = {'download_shopping_cart': 'shopping_list'}
+    action_concurrency_limits = {'download_shopping_cart': 'shopping_list'}
+    idempotent_actions = ('create', 'update', 'partial_update', 'destroy',
+                          'shopping_cart', 'destroy_shopping_cart')
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
@@ -83,28 +127,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
         elif self.action in ['create', 'update', 'partial_update']:
             return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        fields = fieldsets.requested(request, feed.FIELDS, feed.PROFILES)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(feed.recipe_rows(queryset, fields))
+        with timer('serialize'):
+            data = feed.render_recipes(page, request, fields)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = fieldsets.requested(request, feed.FIELDS, feed.PROFILES)
+        queryset = self.filter_queryset(self.get_queryset())
+        row = get_object_or_404(feed.recipe_rows(queryset, fields),
+                                pk=self.kwargs['pk'])
+        self.check_object_permissions(request, row)
+        with timer('serialize'):
+            data = feed.render_recipes([row], request, fields)[0]
+        return Response(data)
+
+    @staticmethod
+    def batch_ids(request):
+        ids = []
+        for value in request.query_params.get('ids', '').split(','):
+            value = value.strip()
+            if not value:
+                continue
+            # str.isdigit() is also true for '²' and other non-ASCII
+            # digits, which int() rejects; longer ids overflow bigint
+            if not (value.isascii() and value.isdigit()) or len(value) > 18:
+                raise ValidationError({'ids': f'Invalid id: {value}.'})
+            if int(value) not in ids:
+                ids.append(int(value))
+        if not ids:
+            raise ValidationError({'ids': 'Pass recipe ids separated by '
+                                          'commas.'})
+        if len(ids) > constants.BATCH_MAX_IDS:
+            raise ValidationError({'ids': f'At most '
+                                          f'{constants.BATCH_MAX_IDS} ids.'})
+        return ids
+
+    def render_ids(self, request, ids):
+        """Feed representations of recipes `ids` in that order."""
+        fields = fieldsets.requested(request, feed.FIELDS, feed.PROFILES)
+        rows = {row['id']: row for row in feed.recipe_rows(
+            self.get_queryset().filter(pk__in=ids), fields)}
+        found = [rows[pk] for pk in ids if pk in rows]
+        with timer('serialize'):
+            data = feed.render_recipes(found, request, fields)
+        return data, [pk for pk in ids if pk not in rows]
+
+    @action(detail=False, methods=['GET'])
+    def batch(self, request):
+        data, missing = self.render_ids(request, self.batch_ids(request))
+        return Response({'results': data, 'missing': missing})
+
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        scores = dict(similarity.similar(recipe.pk))
+        data, missing = self.render_ids(request, list(scores))
+        found = [pk for pk in scores if pk not in missing]
+        for item, pk in zip(data, found):
+            item['similarity'] = round(scores[pk], 3)
+        return Response(data)
+
     @staticmethod
-    def send_message(ingredients):
+    def send_message(ingredients, totals=None):
         shopping_list = 'Shopping list:'
-        for ingredient in ingredients:
-            shopping_list += (
-                f"\n{ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']}) - "
-                f"{ingredient['amount']}")
+        for name, measurement_unit, amount in ingredients:
+            shopping_list += f'\n{name} ({measurement_unit}) - {amount}'
+        if totals and totals['calories'] is not None:
+            shopping_list += (f'\n\nCalories: {totals["calories"]:.0f} kcal'
+                              f'\nEstimated cost: {totals["cost"]:.2f}')
         file = 'shopping_list.txt'
         response = HttpResponse(shopping_list,
                                 content_type='text/plain; charset=utf-8')
-        response['Content-Disposition'] = f'attachment; filename="{file}.txt"'
+        response['Content-Disposition'] = f'attachment; filename="{file}"'
         return response
 
+    @staticmethod
+    def send_pdf(ingredients):
+        name = shopping_list.pdf_name(shopping_list.digest(ingredients))
+        if not default_storage.exists(name):
+            # rendered by a worker; identical carts share the file
+            render_shopping_list_pdf.delay(
+                idempotency_key=f'shopping-list:{name}',
+                requeue_finished=True, rows=ingredients)
+        if not default_storage.exists(name):
+            response = Response(
+                {'detail': 'Shopping list is being prepared, retry later'},
+                status=status.HTTP_202_ACCEPTED)
+            response['Retry-After'] = 2
+            return response
+        return file_response(default_storage, name, 'shopping_list.pdf',
+                             'application/pdf')
+
     @action(detail=False, methods=['GET'])
     def download_shopping_cart(self, request):
-        recipes = Recipe.objects.filter(shopping_carts__user=request.user)
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in=recipes).order_by('ingredient__name').values(
-            'ingredient__name', 'ingredient__measurement_unit').annotate(
-            amount=Sum('amount'))
-        return self.send_message(ingredients)
+        ingredients, totals = shopping_list.cart(request.user)
+        if request.query_params.get('file_format') == 'pdf':
+            return self.send_pdf(ingredients)
+        return self.send_message(ingredients, totals)
 
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated])
@@ -129,64 +252,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def perform_create(self, serializer):
-        serializer.is_valid(raise_exception=True)
-        recipe = serializer.save(author=self.request.user)
-        ingredients_data = self.request.data.get('ingredients', [])
-        tags_data = self.request.data.get('tags', [])
-
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.get('id')
-            amount = ingredient_data.get('amount')
-            ingredient = get_object_or_404(Ingredient, id=ingredient_id)
-            RecipeIngredient.objects.create(recipe=recipe,
-                                            ingredient=ingredient,
-                                            amount=amount)
-
-        for tags_id in tags_data:
-            tags = get_object_or_404(Tag, id=tags_id)
-            TagRecipe.objects.create(tags=tags, recipe=recipe)
+        recipe = versioning.create_recipe(serializer, self.request.data,
+                                          author=self.request.user)
+        notifications.recipe_published(recipe)
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def perform_update(self, serializer):
+        versioning.update_recipe(serializer, self.request.data)
 
-    def partial_update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance,
-                                         data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+    def perform_destroy(self, instance):
+        deletion.delete_recipes(Recipe.objects.filter(pk=instance.pk))
 
-        if 'ingredients' in request.data:
-            ingredients_data = request.data.get('ingredients', [])
-            instance.ingredients.clear()
-            for ingredient_data in ingredients_data:
-                ingredient_id = ingredient_data.get('id')
-                amount = ingredient_data.get('amount')
-                ingredient = get_object_or_404(Ingredient, id=ingredient_id)
-                RecipeIngredient.objects.create(recipe=instance,
-                                                ingredient=ingredient,
-                                                amount=amount)
-        if 'tags' in request.data:
-            tags_data = request.data.get('tags', [])
-            instance.tags.clear()
-            for tags_id in tags_data:
-                tag = get_object_or_404(Tag, id=tags_id)
-                instance.tags.add(tag)
-            return Response(serializer.data)
-
-
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(StatementTimeoutMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientListSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    throttle_scope = 'ingredients'
 
 
-class FavoriteViewSet(viewsets.GenericViewSet):
+class FavoriteViewSet(IdempotencyMixin, viewsets.GenericViewSet):
     queryset = Favorite.objects.all()
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated]
+    idempotent_actions = ('add_favorite', 'del_favorite')
 
     @action(detail=False, methods=['POST'])
     def add_favorite(self, request, id=None):
@@ -210,3 +302,13 @@ class FavoriteViewSet(viewsets.GenericViewSet):
                                                recipes=recipes_id)
         favorite_to_delete.delete()
         return Response({'message': 'Recipe removed successfully'})
+
+
+class NotificationTicketView(APIView):
+    """A single-use ticket for GET /api/notifications/?ticket=."""
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        return Response(
+            {'ticket': notifications.issue_ticket(request.user.id)},
+            status=status.HTTP_201_CREATED)
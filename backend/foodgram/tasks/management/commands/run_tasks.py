@@ -0,0 +1,64 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2)
+        parser.add_argument('--batch', type=int, default=10,
+                            help='tasks claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--keep-done', type=float, default=24,
+                            help='hours to keep finished tasks')
+        parser.add_argument('--once', action='store_true',
+                            help='exit when the queue is empty')
+
+    def work(self, options, stop):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    claimed = queue.claim(options['batch'])
+                except DatabaseError as error:
+                    queue.logger.warning('Could not claim tasks: %s', error)
+                    connection.close()
+                    stop.wait(options['poll_interval'])
+                    continue
+                for queued in claimed:
+                    queue.execute(queued)
+                if claimed:
+                    continue
+                if options['once']:
+                    return
+                stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=self.work, args=(options, stop),
+                             daemon=True)
+            for _ in range(options['concurrency'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f'{len(workers)} workers, tasks: {", ".join(queue.registry)}')
+        keep_done = timedelta(hours=options['keep_done'])
+        try:
+            while any(worker.is_alive() for worker in workers):
+                purged = queue.purge(keep_done)
+                if purged:
+                    self.stdout.write(f'Purged {purged} finished tasks')
+                time.sleep(60 if not options['once'] else 0.1)
+        except KeyboardInterrupt:
+            stop.set()
+        for worker in workers:
+            worker.join()
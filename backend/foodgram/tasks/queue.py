@@ -0,0 +1,120 @@
+"""
+Database-backed task queue.
+
+Functions decorated with @task are registered by name and can be
+queued with ``func.delay(**payload)``. A worker (``manage.py
+run_tasks``) claims due tasks with SELECT ... FOR UPDATE SKIP LOCKED,
+so several workers never pick the same row, and retries failures with
+exponential backoff. With TASKS_EAGER the task runs inline instead.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger('foodgram.tasks')
+
+registry = {}
+
+
+def task(name=None, max_attempts=5):
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = func
+
+        def delay(idempotency_key=None, requeue_finished=False, **payload):
+            return enqueue(task_name, payload,
+                           idempotency_key=idempotency_key,
+                           requeue_finished=requeue_finished,
+                           max_attempts=max_attempts)
+        func.task_name = task_name
+        func.delay = delay
+        return func
+    return decorator
+
+
+def enqueue(name, payload, idempotency_key=None, requeue_finished=False,
+            max_attempts=5, run_at=None):
+    """
+    Queue a task, or run it right away in eager mode.
+    A task whose idempotency_key was already used is not added again;
+    with requeue_finished a done or failed one is scheduled once more.
+    """
+    if settings.TASKS_EAGER:
+        registry[name](**payload)
+        return None
+    fields = {'name': name, 'payload': payload,
+              'max_attempts': max_attempts,
+              'run_at': run_at or timezone.now()}
+    if idempotency_key is None:
+        return Task.objects.create(**fields)
+    queued, created = Task.objects.get_or_create(
+        idempotency_key=idempotency_key, defaults=fields)
+    if (not created and requeue_finished
+            and queued.status in (Task.DONE, Task.FAILED)):
+        Task.objects.filter(
+            id=queued.id, status__in=(Task.DONE, Task.FAILED)).update(
+            status=Task.PENDING, attempts=0, payload=payload,
+            run_at=fields['run_at'], updated_at=timezone.now())
+    return queued
+
+
+def backoff(attempts):
+    delay = settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+    delay = min(delay, settings.TASKS_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(limit):
+    """Lock up to `limit` due tasks for this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Task.objects.filter(
+            Q(status=Task.PENDING, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('id', flat=True)[:limit])
+        Task.objects.filter(id__in=ids).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+            updated_at=now)
+    return list(Task.objects.filter(id__in=ids))
+
+
+def execute(queued):
+    func = registry.get(queued.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {queued.name}')
+        func(**queued.payload)
+    except Exception:
+        queued.last_error = traceback.format_exc()
+        if queued.attempts < queued.max_attempts:
+            queued.status = Task.PENDING
+            queued.run_at = timezone.now() + backoff(queued.attempts)
+        else:
+            queued.status = Task.FAILED
+        logger.exception('Task %s #%s failed (attempt %s/%s)',
+                         queued.name, queued.id, queued.attempts,
+                         queued.max_attempts)
+    else:
+        queued.status = Task.DONE
+        queued.last_error = ''
+    queued.locked_until = None
+    queued.save(update_fields=['status', 'run_at', 'locked_until',
+                               'last_error', 'updated_at'])
+
+
+def purge(older_than):
+    return Task.objects.filter(
+        status=Task.DONE,
+        updated_at__lt=timezone.now() - older_than).delete()[0]
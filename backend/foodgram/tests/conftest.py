@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Subscribe, Tag, TagRecipe)
+from recipes.reference import reference_data
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+# SQL queries allowed per request in the tests; a request over it raises
+# QueryBudgetExceeded in PerformanceMiddleware and fails the test
+QUERY_BUDGET = 12
+
+
+def pytest_collection_modifyitems(items):
+    if connection.vendor == 'postgresql':
+        return
+    skip = pytest.mark.skip(reason='needs PostgreSQL')
+    for item in items:
+        if item.get_closest_marker('postgresql'):
+            item.add_marker(skip)
+
+
+def pytest_benchmark_update_machine_info(machine_info):
+    machine_info['database'] = connection.vendor
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budget(settings):
+    settings.QUERY_BUDGET = QUERY_BUDGET
+    settings.QUERY_BUDGET_STRICT = True
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='author', email='author@example.org', first_name='Anna',
+        last_name='Authorova', password='author-password')
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='reader', email='reader@example.org', first_name='Ivan',
+        last_name='Readerov', password='reader-password')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {AccessToken.for_user(user)}')
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+            ('Десерт', '#FFC0CB', 'dessert'),
+            ('Суп', '#1E90FF', 'soup'))]
+
+
+@pytest.fixture
+def ingredients():
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (('мука', 'г'), ('молоко', 'мл'), ('яйца', 'шт'),
+                           ('сахар', 'г'), ('соль', 'по вкусу'))]
+
+
+@pytest.fixture
+def recipes(author, tags, ingredients):
+    """
+    Eight recipes whose tags and ingredients were not added in id order,
+    half of them with nutrition totals.
+    """
+    recipes = [
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {number}',
+            image=f'recipes/{number:02d}.png', text='Смешать и испечь.',
+            cooking_time=10 + number)
+        for number in range(8)]
+    for number, recipe in enumerate(recipes):
+        for tag in reversed(tags[number % 3:number % 3 + 3]):
+            TagRecipe.objects.create(recipe=recipe, tags=tag)
+        for ingredient in (ingredients[number % 5], ingredients[0]):
+            if ingredient not in recipe.ingredients.all():
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=50 * (number + 1))
+        if number % 2:
+            Recipe.objects.filter(pk=recipe.pk).update(
+                calories=120.5 * number, proteins=3.25, fats=1.0,
+                carbohydrates=20.0, cost=Decimal('12.5') * number)
+    reference_data.load()
+    return recipes
+
+
+@pytest.fixture
+def marked(user, author, recipes):
+    """The user follows the author and marked some of the recipes."""
+    Subscribe.objects.create(user=user, following=author)
+    for recipe in recipes[::3]:
+        Favorite.objects.create(user=user, recipes=recipe)
+    for recipe in recipes[1::3]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    return recipes
@@ -0,0 +1,87 @@
+import pytest
+from django.urls import reverse
+from recipes.models import (RecipeChange, ShoppingCart, ShoppingListRecipe,
+                            ShoppingListRecipeIngredient, Subscribe)
+
+pytestmark = pytest.mark.django_db
+
+# queries allowed per page, whatever the number of rows: session, user,
+# the page itself, its count (on PostgreSQL the row estimate first) and
+# the few objects of filters and forms
+BUDGETS = {
+    'recipe': 6,
+    'ingredient': 6,
+    'favorite': 5,
+    'subscribe': 5,
+    'shoppingcart': 5,
+    'recipeingredient': 5,
+    'shoppinglistrecipe': 5,
+    'shoppinglistrecipeingredient': 5,
+    'tagrecipe': 6,
+    'recipechange': 5,
+}
+FILTER_BUDGET = 6
+# plus the label of every ingredient row
+CHANGE_FORM_BUDGET = 8
+
+
+@pytest.fixture(autouse=True)
+def plain_static(settings):
+    # static names need no manifest
+    settings.STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.StaticFilesStorage')
+
+
+@pytest.fixture
+def admin_rows(user, author, marked, ingredients):
+    """Several rows in every table the recipes admin lists."""
+    Subscribe.objects.create(user=author, following=user)
+    for cart in ShoppingCart.objects.filter(user=user):
+        shopping_list = ShoppingListRecipe.objects.create(
+            user=user, amount_needed=100, measurement_unit=ingredients[0])
+        ShoppingListRecipeIngredient.objects.create(
+            shopping_list_recipe=shopping_list, shopping_cart=cart,
+            ingredient=ingredients[1], amount_needed=100,
+            measurement_unit=ingredients[1])
+    for recipe in marked:
+        RecipeChange.objects.create(recipe=recipe, version=2,
+                                    changes={'name': ['Старое', 'Новое']})
+    return marked
+
+
+@pytest.mark.parametrize('name', BUDGETS)
+def test_changelist_query_budget(admin_client, admin_rows, name,
+                                 django_assert_max_num_queries):
+    with django_assert_max_num_queries(BUDGETS[name]):
+        response = admin_client.get(
+            reverse(f'admin:recipes_{name}_changelist'))
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('lookup', ['author__id__exact',
+                                    'ingredients__id__exact'])
+def test_recipe_filter_query_budget(admin_client, admin_rows, author,
+                                    ingredients, lookup,
+                                    django_assert_max_num_queries):
+    value = author.pk if lookup.startswith('author') else ingredients[0].pk
+    url = reverse('admin:recipes_recipe_changelist')
+
+    with django_assert_max_num_queries(FILTER_BUDGET):
+        response = admin_client.get(url, {lookup: value})
+
+    assert response.status_code == 200
+    assert response.context['cl'].result_count
+
+
+def test_recipe_change_form_query_budget(admin_client, admin_rows,
+                                         django_assert_max_num_queries):
+    recipe = admin_rows[1]
+    rows = recipe.recipeingredient_set.count()
+    assert rows > 1
+
+    with django_assert_max_num_queries(CHANGE_FORM_BUDGET + rows):
+        response = admin_client.get(
+            reverse('admin:recipes_recipe_change', args=[recipe.pk]))
+
+    assert response.status_code == 200
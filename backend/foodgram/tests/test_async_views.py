@@ -0,0 +1,44 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import RequestFactory
+from foodgram.throttling import ScopedSlidingWindowThrottle
+from recipes import async_views
+from rest_framework_simplejwt.tokens import AccessToken
+
+# the views read the database from executor threads
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture(autouse=True)
+def one_per_minute(monkeypatch):
+    monkeypatch.setattr(ScopedSlidingWindowThrottle, 'THROTTLE_RATES',
+                        {'ingredients': '1/min'})
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def list_ingredients(token=None):
+    headers = {'HTTP_X_REAL_IP': '10.0.0.1'}
+    if token is not None:
+        headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+    return async_to_sync(async_views.ingredients)(
+        RequestFactory().get('/api/ingredients/', **headers))
+
+
+def test_token_users_behind_one_address_are_throttled_apart(user, author):
+    assert list_ingredients(AccessToken.for_user(user)).status_code == 200
+    assert list_ingredients(AccessToken.for_user(author)).status_code == 200
+    assert list_ingredients().status_code == 200
+
+    response = list_ingredients(AccessToken.for_user(user))
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+
+
+def test_invalid_token_is_refused():
+    response = list_ingredients('not-a-token')
+
+    assert response.status_code == 401
+    assert 'WWW-Authenticate' in response
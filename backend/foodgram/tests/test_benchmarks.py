@@ -0,0 +1,85 @@
+"""
+Timings of the routes in recipes/urls.py with pytest-benchmark. In a
+plain pytest run every benchmark runs once, as a test; measure and
+compare with the committed run with
+
+    pytest tests/test_benchmarks.py --benchmark-enable \
+        '--benchmark-compare=*/0001' --benchmark-compare-fail=mean:25%
+"""
+import itertools
+
+import pytest
+from foodgram.throttling import ScopedSlidingWindowThrottle
+
+from .test_query_budget import USER_URLS
+
+pytestmark = pytest.mark.django_db
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+         'AAAADUlEQVR4nGNgYGBgAAAABQABpfZFQAAAAABJRU5ErkJggg==')
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    monkeypatch.setattr(
+        ScopedSlidingWindowThrottle, 'THROTTLE_RATES',
+        {scope: '1000000/min'
+         for scope in ScopedSlidingWindowThrottle.THROTTLE_RATES})
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.mark.parametrize('url', USER_URLS)
+def test_read(benchmark, user_client, marked, author, url):
+    url = url.format(recipe=marked[1].pk, author=author.pk)
+
+    response = benchmark(user_client.get, url)
+
+    assert response.status_code == 200
+
+
+def toggle(client, url):
+    return client.post(url).status_code, client.delete(url).status_code
+
+
+@pytest.mark.parametrize('route', ('favorite', 'shopping_cart'))
+def test_mark_recipe(benchmark, user_client, recipes, route):
+    codes = benchmark(
+        toggle, user_client, f'/api/recipes/{recipes[2].pk}/{route}/')
+
+    assert all(code < 300 for code in codes)
+
+
+def test_subscribe(benchmark, user_client, author):
+    codes = benchmark(
+        toggle, user_client, f'/api/users/{author.pk}/subscribe/')
+
+    assert all(code < 300 for code in codes)
+
+
+def test_create_recipe(benchmark, user_client, tags, ingredients, media,
+                       settings):
+    # saving also refreshes the nutrition totals and similar recipes
+    settings.QUERY_BUDGET = 30
+    names = (f'Рецепт {number}' for number in itertools.count())
+
+    def create():
+        response = user_client.post('/api/recipes/', {
+            'name': next(names), 'text': 'Смешать.', 'cooking_time': 10,
+            'image': IMAGE, 'tags': [tags[0].pk],
+            'ingredients': [{'id': ingredients[0].pk, 'amount': 100}],
+        }, format='json')
+        user_client.delete(f'/api/recipes/{response.json()["id"]}/')
+        return response.status_code
+
+    assert benchmark(create) == 201
+
+
+def test_login(benchmark, client, user):
+    response = benchmark(client.post, '/api/auth/token/login/', {
+        'email': user.email, 'password': 'reader-password'})
+
+    assert response.status_code == 201
@@ -0,0 +1,92 @@
+import pytest
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes import deletion
+from recipes.models import (AuthorSuggestion, Recipe, ShoppingCart,
+                            ShoppingListRecipe, ShoppingListRecipeIngredient,
+                            Subscribe)
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+# tables that reference users; delete_users clears each of them itself
+USER_TABLES = {
+    'admin.LogEntry', 'token_blacklist.OutstandingToken', 'recipes.Recipe',
+    'recipes.Favorite', 'recipes.Subscribe', 'recipes.ShoppingCart',
+    'recipes.ShoppingListRecipe', 'recipes.AuthorSuggestion',
+    'users.User_groups', 'users.User_user_permissions'}
+
+
+def collector(queryset):
+    return queryset.delete()
+
+
+def run(delete, queryset):
+    """Rows deleted per table and the queries it took, rolled back."""
+    sid = transaction.savepoint()
+    with CaptureQueriesContext(connection) as context:
+        _, deleted = delete(queryset)
+    transaction.savepoint_rollback(sid)
+    return ({label: count for label, count in deleted.items() if count},
+            len(context))
+
+
+@pytest.fixture
+def everything(user, author, marked, ingredients):
+    """The user and the author have rows in every table that can."""
+    for person in (user, author):
+        cart = ShoppingCart.objects.create(user=person, recipe=marked[4])
+        shopping_list = ShoppingListRecipe.objects.create(
+            user=person, amount_needed=1, measurement_unit=ingredients[0])
+        ShoppingListRecipeIngredient.objects.create(
+            shopping_list_recipe=shopping_list, shopping_cart=cart,
+            ingredient=ingredients[0], amount_needed=1,
+            measurement_unit=ingredients[0])
+        token = OutstandingToken.objects.create(
+            user=person, jti=f'jti-{person.pk}', token='token',
+            expires_at='2030-01-01T00:00:00Z')
+        BlacklistedToken.objects.create(token=token)
+        LogEntry.objects.log_action(
+            person.pk, ContentType.objects.get_for_model(Recipe).pk,
+            marked[0].pk, 'recipe', ADDITION)
+        person.groups.add(Group.objects.get_or_create(name='authors')[0])
+    AuthorSuggestion.objects.create(
+        user=user, author=author, rank=1, score=1.0, mutual=1)
+    Subscribe.objects.get(user=user, following=author).recipes.add(marked[0])
+    return marked
+
+
+def test_every_relation_of_user_is_deleted():
+    relations = {relation.related_model._meta.label
+                 for relation in User._meta.related_objects}
+    relations |= {field.remote_field.through._meta.label
+                  for field in User._meta.many_to_many}
+
+    assert relations == USER_TABLES
+
+
+@pytest.mark.parametrize('username', ('author', 'reader'))
+def test_delete_users_matches_collector(everything, username):
+    users = User.objects.filter(username=username)
+
+    expected, collector_queries = run(collector, users)
+    deleted, queries = run(deletion.delete_users, users)
+
+    assert deleted == expected
+    assert queries <= collector_queries
+
+
+def test_delete_recipes_matches_collector(everything):
+    recipes = Recipe.objects.filter(pk__in=[
+        recipe.pk for recipe in everything[::2]])
+
+    expected, collector_queries = run(collector, recipes)
+    deleted, queries = run(deletion.delete_recipes, recipes)
+
+    assert deleted == expected
+    assert queries <= collector_queries
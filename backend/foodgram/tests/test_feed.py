@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Prefetch
+from django.utils.translation import gettext_lazy
+from recipes import feed
+from recipes.models import Recipe, RecipeIngredient, TagRecipe
+from recipes.renderers import ORJSONRenderer
+from recipes.serializers import RecipeListSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+pytestmark = pytest.mark.django_db
+
+
+def feed_request(user):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    return request
+
+
+def serializer_output(request):
+    # the fast path lists tags and ingredients in insertion order
+    page = Recipe.objects.select_related('author').prefetch_related(
+        Prefetch('tagrecipe_set', TagRecipe.objects.order_by('id')),
+        Prefetch('recipeingredient_set',
+                 RecipeIngredient.objects.order_by('id')))
+    return JSONRenderer().render(RecipeListSerializer(
+        page, many=True, context={'request': request}).data)
+
+
+def fast_output(request, fields=feed.FIELDS):
+    return feed.render_recipes(
+        feed.recipe_rows(Recipe.objects.all(), fields), request, fields)
+
+
+def test_fast_feed_matches_serializer_for_anonymous(recipes):
+    request = feed_request(AnonymousUser())
+
+    assert (ORJSONRenderer().render(fast_output(request))
+            == serializer_output(request))
+
+
+def test_fast_feed_matches_serializer_for_user(user, marked):
+    request = feed_request(user)
+    output = fast_output(request)
+
+    assert ORJSONRenderer().render(output) == serializer_output(request)
+    # the flags the user set are actually rendered
+    assert any(recipe['is_favorited'] for recipe in output)
+    assert any(recipe['is_in_shopping_cart'] for recipe in output)
+    assert all(recipe['author']['is_subscribed'] for recipe in output)
+
+
+@pytest.mark.parametrize('fields', [
+    feed.PROFILES['compact'],
+    ('id', 'tags', 'is_favorited', 'cost'),
+])
+def test_sparse_feed_is_part_of_full_feed(user, marked, fields):
+    request = feed_request(user)
+
+    assert fast_output(request, fields) == [
+        {name: recipe[name] for name in fields}
+        for recipe in fast_output(request)]
+
+
+def test_batch_keeps_order_and_lists_missing(client, recipes):
+    ids = [recipes[5].pk, 0, recipes[1].pk, recipes[5].pk, recipes[3].pk]
+
+    response = client.get(
+        '/api/recipes/batch/', {'ids': ','.join(map(str, ids))})
+
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        recipes[5].pk, recipes[1].pk, recipes[3].pk]
+    assert response.json()['missing'] == [0]
+
+
+@pytest.mark.parametrize('ids', ('', '1,x', '²', '1,٣', '-1',
+                                 '9' * 19, ','.join(map(str, range(101)))))
+def test_batch_rejects_invalid_ids(client, ids):
+    response = client.get('/api/recipes/batch/', {'ids': ids})
+
+    assert response.status_code == 400
+    assert 'ids' in response.json()
+
+
+def test_orjson_matches_drf_encoding():
+    moment = datetime(2026, 10, 19, 19, 18, 1, 203670, tzinfo=timezone.utc)
+    data = {
+        'datetime': moment, 'naive': moment.replace(tzinfo=None),
+        'date': moment.date(), 'time': moment.time().replace(tzinfo=None),
+        'duration': timedelta(minutes=90), 'cost': Decimal('12.50'),
+        'uuid': uuid.UUID(int=1), 'ids': {1: [1.5, None, True]},
+        'text': 'строка ', 'lazy': gettext_lazy('Recipes'),
+        'tuple': (1, 2), 'set': {3},
+    }
+
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_endpoint_dates_render_as_in_drf():
+    moment = datetime(2026, 10, 19, 19, 18, 1, 203670, tzinfo=timezone.utc)
+
+    class Changes(APIView):
+        permission_classes = ()
+
+        def get(self, request):
+            return Response([{'version': 2, 'created_at': moment}])
+
+    response = Changes.as_view()(APIRequestFactory().get('/api/changes/'))
+    response.render()
+
+    assert response.content == (
+        b'[{"version":2,"created_at":"2026-10-19T19:18:01.203670Z"}]')
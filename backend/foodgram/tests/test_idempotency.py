@@ -0,0 +1,78 @@
+import hashlib
+
+import pytest
+from django.core.cache import cache
+from foodgram import idempotency
+from recipes.models import Subscribe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def subscribe(client, author, key):
+    return client.post(f'/api/users/{author.pk}/subscribe/',
+                       HTTP_IDEMPOTENCY_KEY=key)
+
+
+def cache_key(user, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'{idempotency.PREFIX}{user.pk}:{digest}'
+
+
+def test_response_is_stored_and_replayed(user_client, user, author):
+    first = subscribe(user_client, author, 'retry-1')
+    second = subscribe(user_client, author, 'retry-1')
+
+    assert first.status_code == second.status_code == 201
+    assert idempotency.REPLAYED_HEADER not in first
+    assert second[idempotency.REPLAYED_HEADER] == 'true'
+    assert second.json() == first.json()
+    assert Subscribe.objects.filter(user=user, following=author).count() == 1
+
+
+def test_key_of_a_running_request_is_refused(user_client, user, author):
+    cache.add(f'{cache_key(user, "retry-1")}:lease', 1)
+
+    response = subscribe(user_client, author, 'retry-1')
+
+    assert response.status_code == 409
+    assert not Subscribe.objects.filter(user=user).exists()
+
+
+def test_key_reused_for_another_request(user_client, user, author,
+                                        django_user_model):
+    other = django_user_model.objects.create_user(
+        username='other', email='other@example.org', password='password')
+    subscribe(user_client, author, 'retry-1')
+
+    response = subscribe(user_client, other, 'retry-1')
+
+    assert response.status_code == 422
+    assert not Subscribe.objects.filter(user=user, following=other).exists()
+
+
+def test_response_stored_before_the_lease_is_replayed(
+        user_client, user, author, monkeypatch):
+    stored = subscribe(user_client, author, 'retry-1')
+    entry = cache.get(cache_key(user, 'retry-1'))
+    cache.clear()
+    add = cache.add
+
+    def add_after_first_request(key, *args, **kwargs):
+        # the first request stores its response and releases the lease
+        # between the get() of the retry and its add()
+        cache.set(cache_key(user, 'retry-1'), entry)
+        return add(key, *args, **kwargs)
+
+    monkeypatch.setattr(cache, 'add', add_after_first_request)
+    response = subscribe(user_client, author, 'retry-1')
+
+    assert response.status_code == 201
+    assert response[idempotency.REPLAYED_HEADER] == 'true'
+    assert response.json() == stored.json()
@@ -0,0 +1,57 @@
+import pytest
+from asgiref.sync import async_to_sync
+from recipes import sse
+from rest_framework_simplejwt.tokens import AccessToken
+
+# the stream reads the database from other threads
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def open_stream(query_string='', headers=()):
+    """What GET /api/notifications/ sends a client that disconnects."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    async_to_sync(sse.application)(
+        {'type': 'http', 'method': 'GET', 'path': sse.PATH,
+         'query_string': query_string.encode(), 'headers': list(headers)},
+        receive, send)
+    return messages
+
+
+def test_ticket_opens_one_stream(user_client):
+    ticket = user_client.post('/api/notifications/ticket/').json()['ticket']
+
+    assert open_stream(f'ticket={ticket}')[0]['status'] == 200
+    assert open_stream(f'ticket={ticket}')[0]['status'] == 401
+
+
+def test_ticket_needs_authentication(client):
+    assert client.post('/api/notifications/ticket/').status_code == 401
+
+
+def test_token_in_query_string_is_refused(user):
+    assert open_stream(
+        f'token={AccessToken.for_user(user)}')[0]['status'] == 401
+
+
+def test_token_in_header_opens_stream(user):
+    header = f'Token {AccessToken.for_user(user)}'.encode()
+
+    assert open_stream(
+        headers=[(b'authorization', header)])[0]['status'] == 200
+
+
+def test_ticket_stream_replays_from_last_event_id(user_client, marked):
+    ticket = user_client.post('/api/notifications/ticket/').json()['ticket']
+
+    messages = open_stream(
+        f'ticket={ticket}&last_event_id={marked[5].pk}')
+
+    assert messages[1]['body'].count(b'event: recipe') == 2
+    assert b'id: %d\n' % marked[7].pk in messages[1]['body']
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import pytest
+from recipes import nutrition
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def priced(ingredients):
+    """Flour and milk have values per unit, eggs have none."""
+    Ingredient.objects.filter(pk=ingredients[0].pk).update(
+        calories=3.333, proteins=0.1, fats=0.01, carbohydrates=0.7,
+        price=Decimal('0.055'))
+    Ingredient.objects.filter(pk=ingredients[1].pk).update(
+        calories=0.64, proteins=0.03, fats=0.036, carbohydrates=0.047,
+        price=Decimal('0.09'))
+    return ingredients
+
+
+def recipe_with(author, amounts):
+    recipe = Recipe.objects.create(
+        author=author, name='Блины', image='recipes/01.png',
+        text='Смешать и испечь.', cooking_time=20)
+    for ingredient, amount in amounts:
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=amount)
+    return recipe
+
+
+def test_refresh_sums_and_rounds_totals(author, priced):
+    recipe = recipe_with(author, [(priced[0], 250), (priced[1], 500)])
+
+    assert nutrition.refresh([recipe.pk]) == 1
+
+    recipe.refresh_from_db()
+    assert recipe.calories == 1153.3
+    assert recipe.proteins == 40.0
+    assert recipe.fats == 20.5
+    assert recipe.carbohydrates == 198.5
+    assert recipe.cost == Decimal('58.75')
+
+
+def test_total_is_empty_when_an_ingredient_lacks_it(author, priced):
+    partial = recipe_with(author, [(priced[0], 250), (priced[2], 2)])
+    empty = recipe_with(author, [])
+
+    nutrition.refresh()
+
+    for recipe in (partial, empty):
+        recipe.refresh_from_db()
+        assert recipe.calories is None
+        assert recipe.cost is None
+
+
+def test_refresh_ingredients_updates_recipes_using_them(author, priced):
+    recipe = recipe_with(author, [(priced[1], 100)])
+    nutrition.refresh([recipe.pk])
+    Ingredient.objects.filter(pk=priced[1].pk).update(calories=0.6)
+
+    nutrition.refresh_ingredients([priced[1].pk])
+
+    recipe.refresh_from_db()
+    assert recipe.calories == 60.0
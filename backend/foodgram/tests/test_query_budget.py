@@ -0,0 +1,48 @@
+import pytest
+from foodgram.metrics import QUERY_BUCKETS, Histogram, QueryBudgetExceeded
+
+pytestmark = pytest.mark.django_db
+
+ANONYMOUS_URLS = ('/api/recipes/', '/api/recipes/?tags=breakfast&tags=lunch',
+                  '/api/recipes/{recipe}/', '/api/tags/',
+                  '/api/ingredients/?name=м')
+USER_URLS = ANONYMOUS_URLS + (
+    '/api/recipes/?is_favorited=1', '/api/recipes/?ordering=-calories',
+    '/api/recipes/{recipe}/similar/', '/api/recipes/download_shopping_cart/',
+    '/api/users/', '/api/users/me/', '/api/users/{author}/',
+    '/api/users/subscriptions/', '/api/users/suggestions/')
+
+
+@pytest.mark.parametrize('url', ANONYMOUS_URLS)
+def test_anonymous_pages_within_query_budget(client, marked, author, url):
+    response = client.get(url.format(recipe=marked[1].pk, author=author.pk))
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('url', USER_URLS)
+def test_user_pages_within_query_budget(user_client, marked, author, url):
+    response = user_client.get(
+        url.format(recipe=marked[1].pk, author=author.pk))
+
+    assert response.status_code == 200
+
+
+def test_request_over_budget_fails(client, recipes, settings):
+    settings.QUERY_BUDGET = 1
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/api/recipes/')
+
+
+def test_query_count_histogram_has_count_buckets():
+    histogram = Histogram('queries', 'SQL queries per request.',
+                          QUERY_BUCKETS)
+    histogram.observe('GET api:recipes-list', 37)
+
+    lines = histogram.expose()
+
+    assert ('queries_bucket{endpoint="GET api:recipes-list",le="20"} 0'
+            in lines)
+    assert ('queries_bucket{endpoint="GET api:recipes-list",le="50"} 1'
+            in lines)
@@ -0,0 +1,103 @@
+import pytest
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import RequestFactory
+from foodgram import replicas
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def add_alias(monkeypatch):
+    """Adds SQLite databases standing in for replicas."""
+    added = []
+
+    def add(alias, name):
+        monkeypatch.setitem(connections.databases, alias, {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(name)})
+        connections.ensure_defaults(alias)
+        connections.prepare_test_settings(alias)
+        added.append(alias)
+    yield add
+    for alias in added:
+        connections[alias].close()
+        delattr(connections._connections, alias)
+
+
+@pytest.fixture
+def replica(settings, monkeypatch, tmp_path, add_alias):
+    add_alias('replica1', tmp_path / 'replica.sqlite3')
+    settings.DATABASE_REPLICAS = ['replica1']
+    settings.REPLICA_CHECK_INTERVAL = 60
+    settings.REPLICA_STICKY_SECONDS = 60
+    monkeypatch.setattr(replicas, 'replicas', replicas.ReplicaSet())
+    cache.clear()
+    yield 'replica1'
+    cache.clear()
+
+
+def request(method, ip, token=None):
+    """The alias a request to the middleware reads from."""
+    headers = {'HTTP_X_REAL_IP': ip}
+    if token:
+        headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+    aliases = []
+
+    def view(request):
+        aliases.append(replicas.read_alias())
+        # the router sends reads of the request there
+        assert Recipe.objects.all().db == aliases[0]
+
+    replicas.ReplicaMiddleware(view)(
+        RequestFactory().generic(method, '/api/recipes/', **headers))
+    return aliases[0]
+
+
+def test_safe_requests_read_from_replica(replica):
+    assert request('GET', '10.0.0.1') == replica
+    assert request('HEAD', '10.0.0.1', 'reader') == replica
+
+
+def test_writes_use_primary(replica):
+    assert request('POST', '10.0.0.1') == DEFAULT_DB_ALIAS
+    assert request('DELETE', '10.0.0.1', 'reader') == DEFAULT_DB_ALIAS
+
+
+def test_client_reads_primary_after_writing(replica):
+    request('POST', '10.0.0.1', 'reader')
+
+    # the same address with another token or none, then another client
+    assert request('GET', '10.0.0.1') == DEFAULT_DB_ALIAS
+    assert request('GET', '10.0.0.1', 'other') == DEFAULT_DB_ALIAS
+    assert request('GET', '10.0.0.2', 'reader') == replica
+
+
+def test_unavailable_replica_is_skipped(settings, tmp_path, add_alias,
+                                        replica):
+    add_alias('replica2', tmp_path / 'missing' / 'db.sqlite3')
+    settings.DATABASE_REPLICAS = ['replica2', 'replica1']
+
+    assert request('GET', '10.0.0.1') == replica
+    assert replicas.replicas.healthy == [replica]
+
+
+def test_lagging_replica_is_skipped(monkeypatch, replica):
+    monkeypatch.setattr(replicas.ReplicaSet, 'lag', lambda self, alias: 10.0)
+
+    assert request('GET', '10.0.0.1') == DEFAULT_DB_ALIAS
+
+
+def test_without_replicas_everything_uses_primary(settings):
+    settings.DATABASE_REPLICAS = []
+
+    assert request('GET', '10.0.0.1') == DEFAULT_DB_ALIAS
+
+
+def test_router():
+    router = replicas.ReplicaRouter()
+
+    assert router.db_for_read(Recipe) == DEFAULT_DB_ALIAS
+    assert router.db_for_write(Recipe) == DEFAULT_DB_ALIAS
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, 'recipes')
+    assert not router.allow_migrate('replica1', 'recipes')
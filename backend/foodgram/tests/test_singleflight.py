@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+from django.core.cache import cache
+from foodgram import singleflight
+from foodgram.metrics import CACHE_REQUESTS
+
+KEY = f'{singleflight.PREFIX}subscriptions:key'
+LEASE_KEY = f'{KEY}:lease'
+
+
+@pytest.fixture(autouse=True)
+def short_ttls(settings, monkeypatch):
+    settings.SINGLE_FLIGHT_TTL = {'subscriptions': (60, 120)}
+    settings.SINGLE_FLIGHT_LEASE = 0.5
+    monkeypatch.setattr(singleflight, 'POLL_INTERVAL', 0.01)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def outcomes():
+    """Outcomes counted for the subscriptions cache during the test."""
+    before = dict(CACHE_REQUESTS._values)
+
+    def counted():
+        # unary + drops the outcomes that did not change
+        return +Counter({
+            outcome: count - before.get((name, outcome), 0)
+            for (name, outcome), count in CACHE_REQUESTS._values.items()
+            if name == 'subscriptions'})
+    return counted
+
+
+def counting(value):
+    calls = []
+
+    def compute():
+        calls.append(value)
+        return value
+    return compute, calls
+
+
+def cached(compute):
+    return singleflight.cached('subscriptions', 'key', compute)
+
+
+def test_fresh_value_is_a_hit(outcomes):
+    compute, calls = counting('value')
+
+    assert cached(compute) == cached(compute) == 'value'
+    assert calls == ['value']
+    assert outcomes() == {'miss': 1, 'hit': 1}
+
+
+def test_stale_value_is_refreshed(settings, outcomes):
+    settings.SINGLE_FLIGHT_TTL = {'subscriptions': (0, 120)}
+    cached(lambda: 'old')
+
+    assert cached(lambda: 'new') == 'new'
+    assert outcomes() == {'miss': 1, 'refresh': 1}
+
+
+def test_stale_value_is_served_while_another_process_refreshes(
+        settings, outcomes):
+    settings.SINGLE_FLIGHT_TTL = {'subscriptions': (0, 120)}
+    cached(lambda: 'old')
+    cache.add(LEASE_KEY, 'other process')
+    compute, calls = counting('new')
+
+    assert cached(compute) == 'old'
+    assert calls == []
+    assert outcomes() == {'miss': 1, 'stale': 1}
+
+
+def test_callers_in_one_process_coalesce(outcomes):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append('slow')
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    leader = threading.Thread(target=cached, args=(slow,))
+    leader.start()
+    started.wait(5)
+    results = []
+    follower = threading.Thread(
+        target=lambda: results.append(cached(slow)))
+    follower.start()
+    # the follower is waiting on the leader's flight
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert results == ['value']
+    assert calls == ['slow']
+    assert outcomes() == {'miss': 1, 'coalesced': 1}
+
+
+def test_caller_waits_for_another_process(outcomes):
+    cache.add(LEASE_KEY, 'other process')
+    compute, calls = counting('here')
+    other = threading.Timer(0.05, cache.set, args=(
+        KEY, ('there', time.time() + 60), 120))
+    other.start()
+
+    assert cached(compute) == 'there'
+    other.join()
+    assert calls == []
+    assert outcomes() == {'coalesced': 1}
+
+
+def test_caller_computes_when_another_process_times_out(outcomes):
+    cache.add(LEASE_KEY, 'other process')
+    compute, calls = counting('here')
+
+    assert cached(compute) == 'here'
+    assert calls == ['here']
+    assert outcomes() == {'timeout': 1}
+    # the lease of the other process is left to expire
+    assert cache.get(LEASE_KEY) == 'other process'
@@ -0,0 +1,88 @@
+import random
+from itertools import combinations
+
+import pytest
+from django.db import connection
+from django.http import QueryDict
+from django.utils import timezone
+from recipes.db import insert_rows
+from recipes.filters import TAGS_MODE_ALL, TAGS_MODE_ANY, RecipeFilter
+from recipes.models import Recipe, TagRecipe
+
+pytestmark = pytest.mark.django_db
+
+MODES = (TAGS_MODE_ANY, TAGS_MODE_ALL)
+PAGE_SIZE = 3
+PLAN_RECIPES = 100000
+# plan nodes that mean duplicates are removed or the whole set is sorted
+BAD_PLAN_NODES = ('Unique', 'HashAggregate', 'GroupAggregate', 'Sort')
+
+
+def filtered(tags, mode):
+    data = QueryDict(mutable=True)
+    data.setlist('tags', [tag.slug for tag in tags])
+    data['tags_mode'] = mode
+    filterset = RecipeFilter(data, queryset=Recipe.objects.all())
+    assert filterset.is_valid(), filterset.errors
+    return filterset.qs
+
+
+def expected(tags, mode):
+    """The recipe ids as a set computation, newest first."""
+    sets = [set(TagRecipe.objects.filter(tags=tag).values_list(
+        'recipe_id', flat=True)) for tag in tags]
+    if mode == TAGS_MODE_ANY:
+        recipes = set().union(*sets)
+    else:
+        recipes = set.intersection(*sets)
+    return sorted(recipes, reverse=True)
+
+
+def tag_combinations(tags):
+    for size in range(1, len(tags) + 1):
+        yield from combinations(tags, size)
+
+
+@pytest.fixture
+def many_recipes(author, tags):
+    """PLAN_RECIPES recipes with one to three tags each, analyzed."""
+    rng = random.Random(1)
+    now = timezone.now()
+    insert_rows(Recipe, ('id', 'author', 'name', 'image', 'text',
+                         'cooking_time', 'version', 'updated_at'),
+                ((pk, author.pk, f'Рецепт {pk}', 'recipes/plan.png', 'Текст',
+                  10, 1, now) for pk in range(1, PLAN_RECIPES + 1)))
+    insert_rows(TagRecipe, ('recipe', 'tags'), (
+        (pk, tag.pk) for pk in range(1, PLAN_RECIPES + 1)
+        for tag in rng.sample(tags, rng.randint(1, 3))))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE recipes_recipe, recipes_tagrecipe')
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_pages_match_set_computation(recipes, tags, mode):
+    matched = 0
+    for combination in tag_combinations(tags):
+        queryset = filtered(combination, mode)
+        want = expected(combination, mode)
+        ids = []
+        for offset in range(0, len(want) + PAGE_SIZE, PAGE_SIZE):
+            ids.extend(queryset.values_list('id', flat=True)[
+                offset:offset + PAGE_SIZE])
+
+        assert len(ids) == len(set(ids)), combination
+        assert ids == want, combination
+        assert queryset.count() == len(want), combination
+        matched += bool(want)
+    # recipes have three tags each, so several tags match in both modes
+    assert matched > len(tags)
+
+
+@pytest.mark.postgresql
+def test_plans_have_no_distinct_or_sort(many_recipes, tags):
+    for mode in MODES:
+        for combination in tag_combinations(tags):
+            plan = filtered(combination, mode)[:PAGE_SIZE].explain()
+
+            nodes = [node for node in BAD_PLAN_NODES if node in plan]
+            assert not nodes, f'{mode} {combination}:\n{plan}'
@@ -0,0 +1,72 @@
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from foodgram.throttling import check_cache, hit, windows_to_wait
+
+MINUTE = 60
+# start of window 10 of a minute
+NOW = 10 * MINUTE
+
+
+@pytest.fixture
+def empty_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.parametrize('previous, current, elapsed, expected', (
+    # 10 * 0.4 + 5 + 1 fits at 0.6 of the window
+    (10, 5, 0.5, 0.1),
+    # this window is full: the next one, once 10 * (1 - 0.1) + 1 fits
+    (0, 10, 0.25, 0.85),
+    (10, 10, 0.0, 1.1),
+))
+def test_windows_to_wait(previous, current, elapsed, expected):
+    assert windows_to_wait(previous, current, 10, elapsed) == pytest.approx(
+        expected)
+
+
+def test_hit_refuses_over_limit_without_counting(empty_cache):
+    assert hit('client', 2, MINUTE, now=NOW) == 0
+    assert hit('client', 2, MINUTE, now=NOW + 1) == 0
+
+    # the next window, with 2 * 0.5 + 1 at its middle
+    assert hit('client', 2, MINUTE, now=NOW + 2) == pytest.approx(88)
+    assert cache.get('client:10') == 2
+
+
+def test_hit_weights_previous_window(empty_cache):
+    for second in range(2):
+        hit('client', 2, MINUTE, now=NOW + second)
+
+    assert hit('client', 2, MINUTE, now=NOW + MINUTE + 20) == pytest.approx(
+        10)
+    assert hit('client', 2, MINUTE, now=NOW + MINUTE + 30) == 0
+    assert hit('client', 2, MINUTE, now=NOW + MINUTE + 31) > 0
+
+
+def test_hit_keeps_clients_apart(empty_cache):
+    hit('client', 1, MINUTE, now=NOW)
+
+    assert hit('other', 1, MINUTE, now=NOW) == 0
+    assert hit('client', 1, MINUTE, now=NOW) > 0
+
+
+@pytest.mark.parametrize('backend', ('filebased.FileBasedCache',
+                                     'dummy.DummyCache', 'db.DatabaseCache'))
+def test_cache_without_atomic_add_is_refused(settings, tmp_path, backend):
+    settings.CACHES = {'default': {
+        'BACKEND': f'django.core.cache.backends.{backend}',
+        'LOCATION': str(tmp_path)}}
+
+    with pytest.raises(ImproperlyConfigured):
+        check_cache()
+
+
+def test_atomic_cache_is_accepted(settings):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': '127.0.0.1:11211'}}
+
+    check_cache()
@@ -0,0 +1,89 @@
+import pytest
+from recipes.models import Recipe, RecipeChange, RecipeIngredient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def query_budget(settings):
+    # an update also refreshes the nutrition totals and similar recipes
+    settings.QUERY_BUDGET = 30
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {AccessToken.for_user(author)}')
+    return client
+
+
+def update(client, recipe, ingredients, tags=None):
+    data = {'ingredients': [{'id': ingredient.pk, 'amount': amount}
+                            for ingredient, amount in ingredients]}
+    if tags is not None:
+        data['tags'] = [tag.pk for tag in tags]
+    return client.patch(f'/api/recipes/{recipe.pk}/', data, format='json')
+
+
+def amounts(recipe):
+    return dict(RecipeIngredient.objects.filter(recipe=recipe).values_list(
+        'ingredient_id', 'amount'))
+
+
+def test_update_records_added_updated_and_removed(author_client, recipes,
+                                                  ingredients, tags):
+    recipe = recipes[1]
+    # recipe 1 has 100 of ingredients 1 and 0 and tags 1 to 3
+    response = update(author_client, recipe, [
+        (ingredients[1], 100), (ingredients[0], 80), (ingredients[3], 5)],
+        tags[1:3])
+
+    assert response.status_code == 200
+    assert amounts(recipe) == {
+        ingredients[1].pk: 100, ingredients[0].pk: 80, ingredients[3].pk: 5}
+    change = RecipeChange.objects.get(recipe=recipe)
+    assert change.version == Recipe.objects.get(pk=recipe.pk).version == 2
+    assert change.changes == {
+        'ingredients': {'added': {str(ingredients[3].pk): 5},
+                        'updated': {str(ingredients[0].pk): 80}},
+        'tags': {'removed': [tags[3].pk]}}
+
+    update(author_client, recipe, [(ingredients[3], 5)])
+
+    change = RecipeChange.objects.get(recipe=recipe, version=3)
+    assert change.changes == {'ingredients': {
+        'removed': [ingredients[1].pk, ingredients[0].pk]}}
+    assert amounts(recipe) == {ingredients[3].pk: 5}
+
+
+def test_repeated_ingredient_is_summed(author_client, recipes, ingredients):
+    update(author_client, recipes[0], [
+        (ingredients[0], 20), (ingredients[0], 30)])
+
+    # recipe 0 already has 50 of ingredient 0
+    assert amounts(recipes[0]) == {ingredients[0].pk: 50}
+    assert not RecipeChange.objects.exists()
+
+
+def test_unchanged_update_is_not_recorded(author_client, recipes,
+                                          ingredients):
+    response = update(author_client, recipes[0], [(ingredients[0], 50)])
+
+    assert response.status_code == 200
+    assert not RecipeChange.objects.exists()
+    assert Recipe.objects.get(pk=recipes[0].pk).version == 1
+
+
+@pytest.mark.parametrize('amount', (0, -5))
+def test_amount_below_one_is_refused(author_client, recipes, ingredients,
+                                     amount):
+    response = update(author_client, recipes[0], [
+        (ingredients[0], 50), (ingredients[2], amount)])
+
+    assert response.status_code == 400
+    assert 'ingredients' in response.json()
+    assert amounts(recipes[0]) == {ingredients[0].pk: 50}
+    assert not RecipeChange.objects.exists()
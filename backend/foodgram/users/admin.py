@@ -1,4 +1,5 @@
 from django.contrib import admin
+from recipes.deletion import delete_users
 
 from .models import User
 
@@ -8,5 +9,11 @@ class UserAdmin(admin.ModelAdmin):
     search_fields = ('email',)
     list_filter = ('email', 'first_name',)
 
+    def delete_model(self, request, obj):
+        delete_users(User.objects.filter(pk=obj.pk))
 
-admin.site.register(User)
+    def delete_queryset(self, request, queryset):
+        delete_users(queryset)
+
+
+admin.site.register(User, UserAdmin)
@@ -0,0 +1,105 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import aware_utcnow
+from users import tokens
+from users.models import User
+
+
+def get_or_create_each(user):
+    """Logout as it was: every token ever issued, one at a time."""
+    for token in OutstandingToken.objects.filter(user=user):
+        BlacklistedToken.objects.get_or_create(token=token)
+
+
+def set_based(user):
+    tokens.blacklist_user(user.id)
+
+
+def endpoint(user):
+    """The whole request: authentication, blacklisting and response."""
+    client = Client(HTTP_AUTHORIZATION=f'Token {AccessToken.for_user(user)}')
+    response = client.post(reverse('api:logout'))
+    if response.status_code != status.HTTP_205_RESET_CONTENT:
+        raise CommandError(f'Logout answered {response.status_code}')
+
+
+MODES = {'get_or_create': get_or_create_each,
+         'set-based': set_based,
+         'endpoint': endpoint}
+
+
+class Command(BaseCommand):
+    help = ('Benchmark logout of a user with many historical tokens, '
+            'one by one, with one INSERT ... SELECT and through the '
+            'logout endpoint, which must leave no valid token behind '
+            'when it answers. Everything is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10000)
+        parser.add_argument('--valid', type=int, default=5,
+                            help='how many of the tokens are not expired')
+
+    def create_user(self, options):
+        user = User.objects.create(
+            username='bench-logout', email='bench-logout@example.org',
+            password=make_password(None))
+        now = aware_utcnow()
+        OutstandingToken.objects.bulk_create(
+            OutstandingToken(
+                user=user, jti=uuid.uuid4().hex, token='',
+                created_at=now - timedelta(days=60),
+                expires_at=(now + timedelta(days=1)
+                            if number < options['valid']
+                            else now - timedelta(days=30)))
+            for number in range(options['tokens']))
+        return user
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def measure(self, mode, options):
+        sid = transaction.savepoint()
+        try:
+            user = self.create_user(options)
+            self.queries = 0
+            with connection.execute_wrapper(self.count_query):
+                start = time.perf_counter()
+                MODES[mode](user)
+                elapsed = time.perf_counter() - start
+            valid = OutstandingToken.objects.filter(
+                user=user, expires_at__gt=aware_utcnow(),
+                blacklistedtoken__isnull=True).count()
+        finally:
+            transaction.savepoint_rollback(sid)
+        return elapsed, self.queries, valid
+
+    def handle(self, *args, **options):
+        if options['valid'] > options['tokens']:
+            raise CommandError('--valid cannot exceed --tokens')
+        results = {}
+        # the test client host is allowed
+        with override_settings(ALLOWED_HOSTS=['testserver']), \
+                transaction.atomic():
+            for mode in MODES:
+                results[mode] = elapsed, queries, valid = self.measure(
+                    mode, options)
+                if valid:
+                    raise CommandError(f'{mode} left {valid} valid tokens')
+                self.stdout.write(
+                    f'{mode}: {elapsed * 1000:.1f} ms, {queries} queries')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: '
+            f'{results["get_or_create"][0] / results["set-based"][0]:.0f}x'))
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.utils import aware_utcnow
+from users import tokens
+
+
+class Command(BaseCommand):
+    help = ('Delete expired JWT tokens and their blacklist entries in '
+            'short batches (run from cron)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=tokens.BATCH_SIZE,
+                            help='tokens deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='seconds to pause between batches')
+        parser.add_argument('--grace', type=int, default=0,
+                            help='keep tokens expired less than this many '
+                                 'hours ago')
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch must be positive')
+        started = time.perf_counter()
+        deleted = batches = 0
+        for count in tokens.prune_expired(
+                aware_utcnow() - timedelta(hours=options['grace']),
+                options['batch']):
+            deleted += count
+            batches += 1
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired tokens in {batches} batches, '
+            f'{time.perf_counter() - started:.1f}s'))
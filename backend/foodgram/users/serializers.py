@@ -1,5 +1,5 @@
 from djoser.serializers import UserSerializer
-from recipes.models import Subscribe
+from recipes.models import AuthorSuggestion, Subscribe
 from rest_framework import serializers
 from users.models import User
 
@@ -41,6 +41,24 @@ class CustomUserSerializer(UserSerializer):
         }
 
 
+class AuthorSuggestionSerializer(serializers.ModelSerializer):
+    email = serializers.ReadOnlyField(source='author.email')
+    id = serializers.ReadOnlyField(source='author.id')
+    username = serializers.ReadOnlyField(source='author.username')
+    first_name = serializers.ReadOnlyField(source='author.first_name')
+    last_name = serializers.ReadOnlyField(source='author.last_name')
+    is_subscribed = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuthorSuggestion
+        fields = ('email', 'id', 'username', 'first_name', 'last_name',
+                  'is_subscribed', 'score', 'mutual')
+
+    def get_is_subscribed(self, obj):
+        # followed authors are filtered out by the view
+        return False
+
+
 class CustomTokenObtainSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
@@ -0,0 +1,57 @@
+"""
+Set-based maintenance of simplejwt's token tables.
+
+Every login adds an OutstandingToken and nothing ever removes them.
+blacklist_user() blacklists the still valid tokens of a user with one
+INSERT ... SELECT, so logout does not depend on how many expired
+tokens the user has piled up. prune_expired() deletes expired tokens,
+and the blacklist entries pointing at them, in short batches walked by
+primary key, so no statement holds locks for long.
+"""
+from django.db import connection, transaction
+from recipes.db import raw_delete
+from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
+                                                             OutstandingToken)
+from rest_framework_simplejwt.utils import aware_utcnow
+
+BATCH_SIZE = 1000
+
+BLACKLIST_SQL = '''
+    INSERT INTO {blacklisted} (token_id, blacklisted_at)
+    SELECT o.id, %s FROM {outstanding} o
+    WHERE o.user_id = %s AND o.expires_at > %s
+        AND NOT EXISTS (
+            SELECT 1 FROM {blacklisted} b WHERE b.token_id = o.id)
+'''
+
+
+def blacklist_user(user_id):
+    """Blacklist the unexpired tokens of a user, returns how many."""
+    quote = connection.ops.quote_name
+    sql = BLACKLIST_SQL.format(
+        blacklisted=quote(BlacklistedToken._meta.db_table),
+        outstanding=quote(OutstandingToken._meta.db_table))
+    now = aware_utcnow()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [now, user_id, now])
+        return cursor.rowcount
+
+
+def prune_expired(before=None, batch_size=BATCH_SIZE):
+    """
+    Delete tokens that expired before `before` (now by default), one
+    transaction per batch. Yields the number of tokens deleted by each.
+    """
+    before = before or aware_utcnow()
+    last = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(
+            pk__gt=last, expires_at__lt=before).order_by('pk').values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            raw_delete(BlacklistedToken.objects.filter(token_id__in=ids))
+            deleted = raw_delete(OutstandingToken.objects.filter(pk__in=ids))
+        last = ids[-1]
+        yield deleted
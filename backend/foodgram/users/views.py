@@ -1,16 +1,19 @@
+from recipes.deletion import delete_users
+from recipes.models import AuthorSuggestion
+from recipes.paginations import CustomPagination
 from recipes.permissions import AdminOrAuthorOrReadOnly
 from rest_framework import generics, status, viewsets
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.token_blacklist.models import (BlacklistedToken,
-                                                             OutstandingToken)
 from rest_framework_simplejwt.tokens import AccessToken
 from users.models import User
 
-from .serializers import (CustomTokenObtainSerializer, CustomUserSerializer,
+from .serializers import (AuthorSuggestionSerializer,
+                          CustomTokenObtainSerializer, CustomUserSerializer,
                           CustomUserUpdateSerializer)
+from .tokens import blacklist_user
 
 
 class CustomUserViewSet(viewsets.ModelViewSet):
@@ -27,6 +30,9 @@ class CustomUserViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def perform_destroy(self, instance):
+        delete_users(User.objects.filter(pk=instance.pk))
+
     def list(self, request, *args, **kwargs):
         users = self.get_queryset()
         user = request.user
@@ -58,6 +64,7 @@ class CustomTokenObtainPairView(generics.CreateAPIView):
     serializer_class = CustomTokenObtainSerializer
     queryset = User.objects.all()
     permission_classes = [AllowAny]
+    throttle_scope = 'login'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -78,6 +85,22 @@ class CustomUserMeViewSet(generics.RetrieveAPIView):
         return self.request.user
 
 
+class AuthorSuggestionListView(generics.ListAPIView):
+    """
+    Authors suggested by the build_suggestions job, best first. Authors
+    followed since the job ran are left out.
+    """
+    serializer_class = AuthorSuggestionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return AuthorSuggestion.objects.filter(user=user).exclude(
+            author__following__user=user).select_related(
+            'author').order_by('rank')
+
+
 class CustomUserUpdateViewSet(generics.CreateAPIView):
     serializer_class = CustomUserUpdateSerializer
     permission_classes = (AdminOrAuthorOrReadOnly,)
@@ -86,11 +109,11 @@ class CustomUserUpdateViewSet(generics.CreateAPIView):
 class ResetTokenAPIView(APIView):
     permission_classes = (IsAuthenticated,)
     """
-    Adding all refresh tokens in black list
+    Adding unexpired refresh tokens in black list
     """
     def post(self, request):
-        tokens = OutstandingToken.objects.filter(user_id=request.user.id)
-        for token in tokens:
-            t, _ = BlacklistedToken.objects.get_or_create(token=token)
+        # one INSERT ... SELECT, done before the response so no token
+        # stays valid after logout
+        blacklist_user(request.user.id)
         return Response('Successful Logout',
                         status=status.HTTP_205_RESET_CONTENT)
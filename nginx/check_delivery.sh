@@ -0,0 +1,59 @@
+#!/bin/sh
+# Smoke test of static, media and API delivery through the gateway:
+#   docker compose up -d --build
+#   docker compose exec backend python manage.py collectstatic --noinput
+#   docker compose run --rm -v "$PWD/docs:/docs" backend \
+#       python manage.py compress_files /docs
+#   sh nginx/check_delivery.sh http://localhost:9001
+# With TOKEN set to an access token of a user with a non-empty cart the
+# X-Accel-Redirect download of the PDF shopping list is checked too.
+set -eu
+
+BASE_URL=${1:-http://localhost:9001}
+failed=0
+
+check() {
+    # check <description> <header regexp> <curl arguments...>
+    description=$1
+    pattern=$2
+    shift 2
+    if curl -s -o /dev/null -D - "$@" | tr -d '\r' | grep -qiE "$pattern"
+    then
+        echo "ok     $description"
+    else
+        echo "FAILED $description"
+        failed=1
+    fi
+}
+
+css=$(curl -s "$BASE_URL/admin/login/" \
+    | grep -oE '/backend_static/admin/css/base\.[0-9a-f]{12}\.css' | head -1)
+if [ -z "$css" ]; then
+    echo "FAILED hashed static name in /admin/login/"
+    exit 1
+fi
+
+check "hashed static is cached forever" 'cache-control: .*immutable' \
+    "$BASE_URL$css"
+check "static is sent precompressed" '^content-encoding: gzip' \
+    -H 'Accept-Encoding: gzip' "$BASE_URL$css"
+check "api docs are sent compressed" '^content-encoding: gzip' \
+    -H 'Accept-Encoding: gzip' "$BASE_URL/api/docs/openapi-schema.yml"
+check "api json is compressed" '^content-encoding: gzip' \
+    -H 'Accept-Encoding: gzip' "$BASE_URL/api/tags/"
+check "shopping lists are not public" '^HTTP/[0-9.]+ 404' \
+    "$BASE_URL/backend_media/shopping_lists/missing.pdf"
+check "protected media is internal" '^HTTP/[0-9.]+ 404' \
+    "$BASE_URL/protected_media/shopping_lists/missing.pdf"
+
+if [ -n "${TOKEN:-}" ]; then
+    url="$BASE_URL/api/recipes/download_shopping_cart/?file_format=pdf"
+    # the first request may only start rendering
+    curl -s -o /dev/null -H "Authorization: Token $TOKEN" "$url"
+    sleep 3
+    check "shopping list pdf is sent by nginx" \
+        '^content-type: application/pdf' \
+        -H "Authorization: Token $TOKEN" "$url"
+fi
+
+exit $failed